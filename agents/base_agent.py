@@ -1,6 +1,78 @@
-from openai import OpenAI
+from concurrent.futures import Executor, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import TYPE_CHECKING
+from agents.tool_registry import ToolRegistry
+from memory.message import Message
 from utils.logger import log_debug, log_error
+from utils.tracing import record_usage, span
+import asyncio
+import contextvars
+import functools
 import json
+import threading
+import time
+
+if TYPE_CHECKING:
+    from openai import OpenAI
+
+_shared_tool_pool = None
+_shared_tool_pool_lock = threading.Lock()
+
+
+def shared_tool_pool() -> ThreadPoolExecutor:
+    """Process-wide pool that runs tool calls for agents not given their own."""
+    global _shared_tool_pool
+    with _shared_tool_pool_lock:
+        if _shared_tool_pool is None:
+            _shared_tool_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="agent-tool")
+        return _shared_tool_pool
+
+
+class _ToolRun:
+    """When a pooled tool call was submitted and when a thread started it."""
+
+    __slots__ = ("submitted_at", "started_at", "started")
+
+    def __init__(self):
+        self.submitted_at = time.monotonic()
+        self.started_at = None
+        self.started = threading.Event()
+
+
+class _PoolWait:
+    """
+    Time an async tool call has spent waiting for a pool thread, which is not
+    charged to its timeout. leave() is called on the pool thread.
+    """
+
+    __slots__ = ("waited", "since")
+
+    def __init__(self):
+        self.waited = 0.0
+        self.since = None  # When the current wait began, if waiting
+
+    def enter(self):
+        self.since = time.monotonic()
+
+    def leave(self):
+        since, self.since = self.since, None
+        if since is not None:
+            self.waited += time.monotonic() - since
+
+    def current(self, now: float) -> float:
+        since = self.since
+        return now - since if since is not None else 0.0
+
+
+# The _PoolWait of the async tool call running in this context, if any
+_pool_wait = contextvars.ContextVar("pool_wait", default=None)
+
+
+def _run_when_started(wait, fn, args):
+    if wait is not None:
+        wait.leave()
+    return fn(*args)
+
 
 # Hold shared OpenAI client
 # Own its own memory
@@ -10,24 +82,68 @@ class BaseAgent:
     def __init__(
         self,
         name: str,
-        client: OpenAI,
+        client: "OpenAI",
         memory,
         system_prompt: str,
         model: str = "gpt-4o-mini",
-        tools: list | None = None
+        tools: list | ToolRegistry | None = None,
+        tool_pool: Executor | None = None,
+        tool_timeout: float | None = 30.0,
+        tool_limit: int | None = None,
     ):
+        """
+        tools: ToolRegistry, or tool descriptors with executors to build one from
+        tool_pool: executor that runs the tool calls of one turn concurrently
+                   (defaults to a shared 8-thread pool)
+        tool_timeout: seconds each tool call may run before its output becomes an
+                      error, counted from when it starts. A call still queued for a
+                      pool thread that long is cancelled instead. Threads can't be
+                      stopped: a call that timed out keeps running in the background
+                      and holds its pool thread until it returns. Async agents get
+                      the same accounting for work run with _run_blocking().
+        tool_limit: send only this many tools, those most relevant to the latest
+                    user message (all tools when None)
+        """
         self.name = name
         self.client = client
         self.memory = memory
         self.system_prompt = system_prompt
         self.model = model
-        self.tools = tools or []
+        self.tools = tools if isinstance(tools, ToolRegistry) else ToolRegistry(tools or [])
+        self.tool_pool = tool_pool
+        self.tool_timeout = tool_timeout
+        self.tool_limit = tool_limit
+
+    def _tool_schemas(self, history=()):
+        """
+        Tool schemas for the LLM API, prepared once by the registry. With a
+        tool_limit, only the tools most relevant to the latest user message.
+        """
+        if self.tool_limit is None:
+            return self.tools.schemas()
+        query = next((m.content for m in reversed(history) if m.role == "user"), "")
+        return self.tools.schemas(self.tools.select(query, self.tool_limit))
 
-    def _tool_schemas(self):
+    def _build_request(self, use_tools: bool = True) -> dict:
         """
-        Return tool descriptors without executors for the LLM API.
+        Build the chat.completions.create kwargs from current memory and tools.
         """
-        return [{k: v for k, v in tool.items() if k != "executor"} for tool in self.tools]
+        history = self.memory.get_history()
+        tools = self._tool_schemas(history) if self.tools and use_tools else None
+        tool_choice = "required" if tools else None
+        # Evicted turns relevant to the current question, if memory has a long-term tier
+        recalled = self.memory.recall()
+        return {
+            "model": self.model,
+            "messages": [
+                {"role": "system", "content": self.system_prompt},
+                *([recalled.to_dict()] if recalled is not None else []),
+                # History holds compact Message records; the API shape is built only here
+                *(message.to_dict() for message in history)
+            ],
+            "tools": tools,
+            "tool_choice": tool_choice,
+        }
 
     def call_llm(self, use_tools: bool = True):
         """
@@ -35,22 +151,13 @@ class BaseAgent:
         Returns the assistant message.
         """
         try:
-            tools = self._tool_schemas() if self.tools and use_tools else None
-            tool_choice = "required" if tools else None
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": self.system_prompt},
-                    *self.memory.get_history()
-                ],
-                tools=tools,
-                tool_choice=tool_choice
-            )
-
+            with span("call_llm", agent=self.name):
+                response = self.client.chat.completions.create(**self._build_request(use_tools))
+            record_usage(response, "routing" if use_tools and self.tools else "reply")
             return response.choices[0].message
 
         except Exception as e:
-            log_error(f"[{self.name}] LLM call failed: {e}")
+            log_error("[%s] LLM call failed: %s", self.name, e)
             raise
 
     def handle_tool_calls(self, message):
@@ -77,29 +184,174 @@ class BaseAgent:
         # Testability: You can mock tool functions in tests.
         # Replacability: You can swap out tool implementations without changing the LLM logic.
         # Descriptors describe intent. Functions execute reality.
-        for tool_call in message.tool_calls:
-            tool_name = tool_call.function.name
-            raw_args = tool_call.function.arguments
+        with span("handle_tool_calls", agent=self.name):
+            tool_calls = list(message.tool_calls)
+            # All calls of the turn run concurrently; a slow or failing one only costs its own output
+            pool = self.tool_pool or shared_tool_pool()
+            runs = [_ToolRun() for _ in tool_calls]
+            # Each task runs in a copy of this context so its tool span nests under this one
+            futures = [
+                pool.submit(contextvars.copy_context().run, self._run_pooled_tool, run, tool_call)
+                for run, tool_call in zip(runs, tool_calls)
+            ]
 
-            try:
-                args = json.loads(raw_args) if isinstance(raw_args, str) else raw_args
-            except Exception:
-                args = {}
+            for tool_call, future, run in zip(tool_calls, futures, runs):
+                tool_name = tool_call.function.name
+                try:
+                    output = self._await_pooled_tool(future, run, tool_name)
+                except FutureTimeoutError:
+                    output = f"Tool error: {tool_name} timed out after {self.tool_timeout}s"
+                    log_error("[%s] %s", self.name, output)
+                except Exception as e:
+                    output = f"Tool error: {tool_name} failed: {e}"
+                    log_error("[%s] %s", self.name, output)
 
-            tool = next((t for t in self.tools if t["function"]["name"] == tool_name), None)
+                # Record in the original tool_call_id order so the transcript stays valid
+                self._record_tool_output(tool_call, output)
+                tool_outputs.append(output)
 
-            if not tool:
-                output = f"Unknown tool: {tool_name}"
-            else:
-                output = tool["executor"](**args)
+        return tool_outputs
+
+    def _run_pooled_tool(self, run, tool_call):
+        run.started_at = time.monotonic()
+        run.started.set()
+        return self._execute_tool(tool_call)
 
-            # Store tool response
-            self.memory.chat_history.append({
-                "role": "tool",
-                "tool_call_id": tool_call.id,
-                "content": output
-            })
+    def _await_pooled_tool(self, future, run, tool_name):
+        """
+        The call's output once it returns. Its timeout starts when a pool thread
+        picks it up, so time queued behind other sessions' tools isn't charged
+        to it; waiting for a thread gets a separate allowance of the same length.
+        """
+        if self.tool_timeout is None:
+            return future.result()
+        queue_deadline = run.submitted_at + self.tool_timeout
+        if not run.started.wait(max(0.0, queue_deadline - time.monotonic())) and future.cancel():
+            output = f"Tool error: {tool_name} did not start within {self.tool_timeout}s, tool pool busy"
+            log_error("[%s] %s", self.name, output)
+            return output
+        run.started.wait()  # Lost the race with cancel(): it is starting now
+        return future.result(timeout=max(0.0, run.started_at + self.tool_timeout - time.monotonic()))
 
+    def _execute_tool(self, tool_call):
+        tool_name = tool_call.function.name
+        args = self._parse_tool_args(tool_call.function.arguments)
+        tool = self._find_tool(tool_name)
+
+        if not tool:
+            return f"Unknown tool: {tool_name}"
+        with span("tool", tool=tool_name):
+            return tool.run(args)
+
+    @staticmethod
+    def _parse_tool_args(raw_args) -> dict:
+        try:
+            return (json.loads(raw_args) if isinstance(raw_args, str) else raw_args) or {}
+        except Exception:
+            return {}
+
+    def _find_tool(self, tool_name: str):
+        return self.tools.get(tool_name)
+
+    def _record_tool_output(self, tool_call, output):
+        # Store tool response
+        self.memory.append(Message("tool", output, tool_call_id=tool_call.id))
+
+
+class AsyncBaseAgent(BaseAgent):
+    """
+    BaseAgent for an AsyncOpenAI client.
+    LLM calls are awaited, and tool executors may be sync functions or coroutines.
+    """
+
+    async def call_llm(self, use_tools: bool = True):
+        try:
+            with span("call_llm", agent=self.name):
+                response = await self.client.chat.completions.create(**self._build_request(use_tools))
+            record_usage(response, "routing" if use_tools and self.tools else "reply")
+            return response.choices[0].message
+
+        except Exception as e:
+            log_error("[%s] LLM call failed: %s", self.name, e)
+            raise
+
+    async def handle_tool_calls(self, message):
+        tool_calls = list(message.tool_calls)
+        with span("handle_tool_calls", agent=self.name):
+            results = await asyncio.gather(
+                *(self._execute_tool_with_timeout(tool_call) for tool_call in tool_calls),
+                return_exceptions=True,
+            )
+
+        tool_outputs = []
+        for tool_call, output in zip(tool_calls, results):
+            tool_name = tool_call.function.name
+            if isinstance(output, asyncio.TimeoutError):
+                output = f"Tool error: {tool_name} timed out after {self.tool_timeout}s"
+                log_error("[%s] %s", self.name, output)
+            elif isinstance(output, Exception):
+                output = f"Tool error: {tool_name} failed: {output}"
+                log_error("[%s] %s", self.name, output)
+
+            self._record_tool_output(tool_call, output)
             tool_outputs.append(output)
 
         return tool_outputs
+
+    async def _run_blocking(self, fn, *args):
+        """
+        Run blocking tool work on the tool pool rather than the loop's default
+        executor, so the call's timeout doesn't count time queued for a thread.
+        """
+        wait = _pool_wait.get()
+        if wait is not None:
+            wait.enter()
+        pool = self.tool_pool or shared_tool_pool()
+        # A copy of this context, so the tool span still nests under the turn
+        task = functools.partial(contextvars.copy_context().run, _run_when_started, wait, fn, args)
+        return await asyncio.get_running_loop().run_in_executor(pool, task)
+
+    async def _execute_tool_with_timeout(self, tool_call):
+        """
+        Like asyncio.wait_for(), but the deadline moves out by the time the call
+        spends waiting for a pool thread; a wait of tool_timeout cancels it instead.
+        """
+        if self.tool_timeout is None:
+            return await self._aexecute_tool(tool_call)
+        wait = _PoolWait()
+        token = _pool_wait.set(wait)
+        try:
+            task = asyncio.ensure_future(self._aexecute_tool(tool_call))
+        finally:
+            _pool_wait.reset(token)
+
+        start = time.monotonic()
+        try:
+            while not task.done():
+                now = time.monotonic()
+                queued = wait.current(now)
+                if queued >= self.tool_timeout:
+                    task.cancel()
+                    tool_name = tool_call.function.name
+                    output = f"Tool error: {tool_name} did not start within {self.tool_timeout}s, tool pool busy"
+                    log_error("[%s] %s", self.name, output)
+                    return output
+                remaining = start + self.tool_timeout + wait.waited + queued - now
+                if remaining <= 0:
+                    task.cancel()
+                    raise asyncio.TimeoutError
+                await asyncio.wait({task}, timeout=min(remaining, self.tool_timeout - queued) if queued else remaining)
+        except BaseException:
+            task.cancel()
+            raise
+        return task.result()
+
+    async def _aexecute_tool(self, tool_call):
+        tool_name = tool_call.function.name
+        args = self._parse_tool_args(tool_call.function.arguments)
+        tool = self._find_tool(tool_name)
+
+        if not tool:
+            return f"Unknown tool: {tool_name}"
+        with span("tool", tool=tool_name):
+            return await tool.arun(args)
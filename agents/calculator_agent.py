@@ -19,13 +19,156 @@ calculator_descriptor = {
     }
 }
 
+calculator_batch_descriptor = {
+    "type": "function",
+    "function": {
+        "name": "calculator_batch",
+        "description": (
+            "Evaluate one formula for many sets of values in a single call. "
+            "Write the formula with variable names and give each variable a list of values; "
+            "row i of the results uses the i-th value of every list. A single number is used for every row."
+        ),
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "expression": {
+                    "type": "string",
+                    "description": "Math expression with variables like price * qty * (1 - discount)"
+                },
+                "variables": {
+                    "type": "object",
+                    "description": 'Values per variable, e.g. {"price": [10, 12.5], "qty": [3, 4], "discount": 0.1}',
+                    "additionalProperties": {
+                        "type": ["array", "number"],
+                        "items": {"type": "number"}
+                    }
+                }
+            },
+            "required": ["expression", "variables"]
+        }
+    }
+}
+
 import ast
+import json
+import math
+import multiprocessing
 import operator
+import threading
+from collections import OrderedDict
+
+from utils.tracing import count, span
+
+# CPython stores ints in 30-bit digits; costs are estimated in digit operations
+_DIGIT_BITS = 30
+# Any float beyond this many bits overflows, and fails fast
+_FLOAT_BITS = 1024
+
+
+def _mul_cost(a_bits: float, b_bits: float) -> float:
+    """Digit operations to multiply ints of these sizes (Karatsuba-ish)."""
+    small, large = sorted((a_bits / _DIGIT_BITS + 1, b_bits / _DIGIT_BITS + 1))
+    return large * small ** 0.585
+
+
+def _serve(conn):
+    """Worker process loop: evaluate expressions sent over conn until it closes."""
+    calculator = CalculatorAgent()
+    while True:
+        try:
+            expression = conn.recv()
+        except EOFError:
+            return
+        try:
+            conn.send((True, calculator.compile(expression).evaluate({})))
+        except Exception as e:
+            conn.send((False, str(e)))
+
+
+class _Worker:
+    def __init__(self, context):
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(target=_serve, args=(child_conn,), name="calculator-worker", daemon=True)
+        self.process.start()
+        child_conn.close()
+
+    def kill(self):
+        self.process.kill()
+        self.process.join()
+        self.conn.close()
+
+
+class EvaluationPool:
+    """
+    A few worker processes for expressions too expensive to evaluate inline.
+    A worker that overruns the timeout is killed, which is the only way to stop
+    a long big-int computation, and replaced on next use. Workers start lazily.
+    """
+
+    def __init__(self, size: int = 2, timeout: float = 2.0, start_method: str | None = None):
+        """
+        start_method: multiprocessing start method. Defaults to fork where available:
+                      it is fast, and spawn would re-run main.py in every worker
+        """
+        self.timeout = timeout
+        if start_method is None:
+            start_method = "fork" if "fork" in multiprocessing.get_all_start_methods() else "spawn"
+        self._context = multiprocessing.get_context(start_method)
+        self._slots = threading.BoundedSemaphore(size)
+        self._lock = threading.Lock()
+        self._idle = []
+        self.killed = 0
+
+    def evaluate(self, expression: str):
+        """Value of expression, computed in a worker. Raises TimeoutError past the timeout."""
+        with self._slots:
+            with self._lock:
+                worker = self._idle.pop() if self._idle else None
+            if worker is None:
+                worker = _Worker(self._context)
+            try:
+                worker.conn.send(expression)
+                if not worker.conn.poll(self.timeout):
+                    raise TimeoutError(f"Evaluation timed out after {self.timeout:g}s")
+                ok, value = worker.conn.recv()
+            except BaseException:
+                worker.kill()
+                with self._lock:
+                    self.killed += 1
+                raise
+            with self._lock:
+                self._idle.append(worker)
+        if not ok:
+            raise ValueError(value)
+        return value
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for worker in idle:
+            worker.kill()
+
+
+class CompiledExpression:
+    """A parsed expression turned into nested closures, ready to evaluate many times."""
+
+    __slots__ = ("evaluate", "names", "cost", "is_operation")
+
+    def __init__(self, evaluate, names, cost, is_operation):
+        self.evaluate = evaluate  # evaluate(bindings) -> value; works on NumPy arrays too
+        self.names = names  # Variables the expression reads
+        self.cost = cost  # Estimated digit operations, counting variables as floats
+        self.is_operation = is_operation  # False for a bare number or name
+
 
 class CalculatorAgent:
     """
     Executes deterministic mathematical calculations.
     No LLM. No reasoning. Pure execution.
+
+    Each expression's cost is estimated from its shape and operand sizes before
+    it runs: cheap ones are evaluated inline, costlier ones in a worker process
+    that is killed at the timeout, and anything over max_cost is refused.
     """
 
     SAFE_OPERATORS = {
@@ -37,24 +180,224 @@ class CalculatorAgent:
         ast.Mod: operator.mod,
     }
 
-    def _safe_eval(self, node):
-        if isinstance(node, ast.Num):
-            return node.n
+    def __init__(
+        self,
+        inline_cost: float = 1e5,
+        max_cost: float = 1e9,
+        timeout: float = 2.0,
+        max_nodes: int = 500,
+        max_depth: int = 50,
+        pool: EvaluationPool | None = None,
+        cache_size: int = 256,
+        max_batch_rows: int = 10_000,
+    ):
+        """
+        inline_cost: estimated digit operations (~1e8 per second) up to which an
+                     expression is evaluated on the calling thread
+        max_cost: estimate above which an expression is refused
+        timeout: seconds a worker process gets before it is killed
+        max_nodes, max_depth: limits on the expression's syntax tree
+        pool: EvaluationPool to share between calculators; created on first use
+        cache_size: compiled expressions kept, least recently used evicted first
+        max_batch_rows: most rows run_batch() evaluates in one call
+        """
+        self.inline_cost = inline_cost
+        self.max_cost = max_cost
+        self.timeout = timeout
+        self.max_nodes = max_nodes
+        self.max_depth = max_depth
+        self._pool = pool
+        self._pool_lock = threading.Lock()
+        self.cache_size = cache_size
+        self.max_batch_rows = max_batch_rows
+        self._cache = OrderedDict()  # expression text -> CompiledExpression
+        self._cache_lock = threading.Lock()
+        self.cache_hits = 0
+        self.cache_misses = 0
 
-        if isinstance(node, ast.BinOp):
-            left = self._safe_eval(node.left)
-            right = self._safe_eval(node.right)
-            op_type = type(node.op)
-
-            if op_type in self.SAFE_OPERATORS:
-                return self.SAFE_OPERATORS[op_type](left, right)
+    @staticmethod
+    def _is_number(node) -> bool:
+        return isinstance(node, ast.Constant) and isinstance(node.value, (int, float)) and not isinstance(node.value, bool)
 
+    def _compile_node(self, node, names, depth=0):
+        """Closure evaluating node against a bindings dict; collects variable names."""
+        if depth > self.max_depth:
+            raise ValueError("Expression is nested too deeply")
+        if self._is_number(node):
+            value = node.value
+            return lambda bindings: value
+        if isinstance(node, ast.Name):
+            name = node.id
+            names.add(name)
+            return lambda bindings: bindings[name]
+        if isinstance(node, ast.BinOp) and type(node.op) in self.SAFE_OPERATORS:
+            op = self.SAFE_OPERATORS[type(node.op)]
+            left = self._compile_node(node.left, names, depth + 1)
+            right = self._compile_node(node.right, names, depth + 1)
+            return lambda bindings: op(left(bindings), right(bindings))
         raise ValueError("Unsupported expression")
 
-    def run(self, expression: str) -> str:
+    def compile(self, expression: str) -> CompiledExpression:
+        """
+        Parse, check and compile expression, or reuse the cached result for the
+        same text. Raises SyntaxError or ValueError for what can't be evaluated.
+        """
+        with self._cache_lock:
+            compiled = self._cache.get(expression)
+            if compiled is not None:
+                self._cache.move_to_end(expression)
+                self.cache_hits += 1
+                return compiled
+            self.cache_misses += 1
+
         try:
             tree = ast.parse(expression, mode="eval")
-            result = self._safe_eval(tree.body)
+        except (RecursionError, MemoryError):
+            # CPython's parser gives up this way on long operator chains and deep nesting
+            raise ValueError("Expression is too long") from None
+        if sum(1 for _ in ast.walk(tree)) > self.max_nodes:
+            raise ValueError("Expression is too long")
+        names = set()
+        evaluate = self._compile_node(tree.body, names)
+        compiled = CompiledExpression(
+            evaluate,
+            frozenset(names),
+            self._estimate(tree.body)[2],
+            isinstance(tree.body, ast.BinOp),
+        )
+
+        with self._cache_lock:
+            self._cache[expression] = compiled
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return compiled
+
+    def _estimate(self, node, depth=0):
+        """(log2 bound on |value|, is float, cost in digit operations) of a node."""
+        if depth > self.max_depth:
+            raise ValueError("Expression is nested too deeply")
+        if self._is_number(node):
+            if isinstance(node.value, float):
+                return _FLOAT_BITS, True, 1.0
+            return (math.log2(abs(node.value)) if abs(node.value) > 1 else 0.0), False, 1.0
+        if isinstance(node, ast.Name):
+            # Variables only get values in run_batch(), as float64
+            return _FLOAT_BITS, True, 1.0
+        if not (isinstance(node, ast.BinOp) and type(node.op) in self.SAFE_OPERATORS):
+            raise ValueError("Unsupported expression")
+
+        left_bits, left_float, left_cost = self._estimate(node.left, depth + 1)
+        right_bits, right_float, right_cost = self._estimate(node.right, depth + 1)
+        cost = left_cost + right_cost
+        op_type = type(node.op)
+        if left_float or right_float or op_type is ast.Div:
+            # Float arithmetic is constant time; converting an int operand is linear in its size
+            int_bits = (0 if left_float else left_bits) + (0 if right_float else right_bits)
+            return _FLOAT_BITS, True, cost + int_bits / _DIGIT_BITS + 1
+        if op_type in (ast.Add, ast.Sub):
+            return max(left_bits, right_bits) + 1, False, cost + max(left_bits, right_bits) / _DIGIT_BITS + 1
+        if op_type is ast.Mult:
+            return left_bits + right_bits, False, cost + _mul_cost(left_bits, right_bits)
+        if op_type is ast.Mod:
+            return right_bits, False, cost + (left_bits / _DIGIT_BITS + 1) * (right_bits / _DIGIT_BITS + 1)
+        # Pow: the result has about left_bits * exponent bits and costs a few squarings of that size
+        if left_bits == 0:
+            return 0.0, False, cost + right_bits + 1
+        if right_bits > 1000:
+            return math.inf, False, math.inf
+        result_bits = left_bits * 2 ** right_bits
+        return result_bits, False, cost + _mul_cost(result_bits, result_bits)
+
+    def estimate_cost(self, tree) -> float:
+        """
+        Upper-bound estimate of the digit operations needed to evaluate a parsed
+        expression. Raises ValueError for unsupported or oversized expressions.
+        """
+        if sum(1 for _ in ast.walk(tree)) > self.max_nodes:
+            raise ValueError("Expression is too long")
+        body = tree.body if isinstance(tree, ast.Expression) else tree
+        return self._estimate(body)[2]
+
+    def _get_pool(self) -> EvaluationPool:
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = EvaluationPool(timeout=self.timeout)
+            return self._pool
+
+    def can_evaluate(self, text: str) -> bool:
+        """
+        True if text is a complete arithmetic expression this agent can evaluate
+        inline, e.g. "2 + 3 * 4", exactly as run() would parse it (so no leading
+        whitespace). Bare numbers don't count: there's nothing to compute.
+        """
+        try:
+            compiled = self.compile(text)
+        except (SyntaxError, ValueError):
+            return False
+        return compiled.is_operation and not compiled.names and compiled.cost <= self.inline_cost
+
+    def run(self, expression: str) -> str:
+        try:
+            compiled = self.compile(expression)
+            if compiled.names:
+                raise ValueError(f"Unknown variable: {min(compiled.names)}")
+            cost = compiled.cost
+            if cost > self.max_cost:
+                count("agent_calculator_evaluations_total", mode="rejected")
+                raise ValueError(
+                    f"Expression is too expensive to evaluate (estimated cost {cost:.3g}, budget {self.max_cost:.3g})"
+                )
+            if cost <= self.inline_cost:
+                count("agent_calculator_evaluations_total", mode="inline")
+                result = compiled.evaluate({})
+            else:
+                count("agent_calculator_evaluations_total", mode="process")
+                with span("calculator_process"):
+                    result = self._get_pool().evaluate(expression)
             return f"Result: {result}"
         except Exception as e:
             return f"Calculator error: {e}"
+
+    def run_batch(self, expression: str, variables: dict) -> str:
+        """
+        Evaluate expression once per row of variable values, vectorized with
+        NumPy in float64. Returns JSON {"result": [...]} with null for rows that
+        overflow or divide by zero, or {"error": "..."}.
+        """
+        import numpy as np
+
+        try:
+            compiled = self.compile(expression)
+            missing = compiled.names - variables.keys()
+            if missing:
+                raise ValueError(f"No values for: {', '.join(sorted(missing))}")
+            columns = {name: np.asarray(variables[name], dtype=np.float64) for name in compiled.names}
+            lengths = {column.size for column in columns.values() if column.ndim == 1}
+            if any(column.ndim > 1 for column in columns.values()) or len(lengths) > 1:
+                raise ValueError("Every variable needs a single number or a list of the same length")
+            rows = lengths.pop() if lengths else 1
+            if rows > self.max_batch_rows:
+                raise ValueError(f"Too many rows ({rows}); the limit is {self.max_batch_rows}")
+            if compiled.cost > self.inline_cost:
+                # Integer parts like 9**9**9 would still run in Python, once, on this thread
+                raise ValueError(f"Expression is too expensive to evaluate (estimated cost {compiled.cost:.3g})")
+
+            count("agent_calculator_evaluations_total", mode="batch")
+            # Float overflow and division by zero give inf/nan for that row instead of raising
+            with np.errstate(all="ignore"):
+                value = compiled.evaluate(columns)
+            try:
+                # Constant-only expressions come back as Python ints and floats
+                value = np.asarray(value, dtype=np.float64)
+            except OverflowError:
+                value = np.float64(math.inf)  # An int beyond float64's range overflows like a row would
+            values = np.broadcast_to(value, (rows,))
+            result = [value if math.isfinite(value) else None for value in values.tolist()]
+            return json.dumps({"result": result})
+        except Exception as e:
+            return json.dumps({"error": f"Calculator error: {e}"})
+
+    def close(self):
+        """Stop the worker processes, if any were started."""
+        if self._pool is not None:
+            self._pool.close()
@@ -1,9 +1,27 @@
+import itertools
 import json
+import time
 
-from agents.base_agent import BaseAgent
-from agents.calculator_agent import CalculatorAgent, calculator_descriptor
+from agents.base_agent import AsyncBaseAgent, BaseAgent
+from agents.calculator_agent import CalculatorAgent, calculator_batch_descriptor, calculator_descriptor
 from agents.search_agent import SearchAgent, search_schema
+from agents.search_cache import SearchCache
+from memory.message import Message, ToolCall
+from utils.llm_cache import request_key
 from utils.logger import log_info, log_error
+from utils.single_flight import flight_group
+from utils.tracing import record_usage, span
+
+
+SUMMARIZE_POLICIES = ("always", "never", "auto")
+
+# What ask() answers when a turn fails
+ERROR_REPLY = "Oops! Something went wrong."
+
+# Streamed completions are timed under the span of the call they replace
+_STREAM_SPANS = {"reply": "call_llm", "summarize": "summarize_tool_outputs"}
+# Ask for a final chunk with token counts, for record_usage()
+_STREAM_USAGE = {"include_usage": True}
 
 
 class OrchestratorAgent(BaseAgent):
@@ -13,19 +31,57 @@ class OrchestratorAgent(BaseAgent):
         memory,
         model: str = "gpt-4o-mini",
         search_api_key: str = "",
-        search_provider: str = "serpapi",
+        search_provider: str = "mock",
+        tool_pool=None,
+        tool_timeout: float | None = 30.0,
+        fast_path: bool = True,
+        summarize: str = "auto",
+        summarize_token_threshold: int = 200,
+        search_cache=None,
+        calculator: CalculatorAgent | None = None,
+        search: SearchAgent | None = None,
+        coalesce: bool = True,
+        tool_limit: int | None = None,
     ):
-        self.calculator = CalculatorAgent()
-        self.search = SearchAgent(api_key=search_api_key, provider=search_provider)
+        """
+        fast_path: answer input the calculator can fully parse (e.g. "2+2")
+                   directly, without any LLM call
+        summarize: when to send tool outputs to the LLM for a final answer:
+                   "always", "never", or "auto" (several outputs, or one longer
+                   than summarize_token_threshold tokens)
+        search_cache: optional SearchCache consulted before calling the search provider
+        calculator, search: tool agents to share between orchestrators (e.g. one per
+                   session); built from search_api_key/search_provider when omitted
+        coalesce: identical searches and tool-output summaries running at the same
+                  time, in any orchestrator of the process, share one execution
+        tool_limit: send only this many tools per request, picked by relevance
+        """
+        if summarize not in SUMMARIZE_POLICIES:
+            raise ValueError(f"summarize must be one of {SUMMARIZE_POLICIES}, got {summarize!r}")
+        self.summarize = summarize
+        self.summarize_token_threshold = summarize_token_threshold
+        self.summaries_requested = 0  # Tool turns answered through the summarization LLM call
+        self.summaries_skipped = 0  # Tool turns answered with the formatted tool output
+        self.calculator = calculator or CalculatorAgent()
+        self.fast_path = fast_path
+        self.fast_path_turns = 0  # Turns answered without calling the LLM
+        self._fast_path_ids = itertools.count(1)
+        self.last_ttft = None  # Seconds to the first streamed token of the last ask_stream() turn
+        self.search = search or SearchAgent(api_key=search_api_key, provider=search_provider)
+        self.search_cache = search_cache
+        self.search_flights = flight_group("search") if coalesce else None
+        self.summary_flights = flight_group("tool_summary") if coalesce else None
 
         tools = [
             {**calculator_descriptor, "executor": self._run_calculator},
+            {**calculator_batch_descriptor, "executor": self._run_calculator_batch},
             {**search_schema, "executor": self._run_search},
         ]
 
         system_prompt = (
             "You are an orchestrator agent. "
             "Route math to the calculator tool and factual questions to the search tool. "
+            "When one formula must be evaluated for many sets of values, make a single calculator_batch call. "
             "Always use tools when applicable and do not answer from memory."
         )
 
@@ -36,74 +92,284 @@ class OrchestratorAgent(BaseAgent):
             system_prompt=system_prompt,
             model=model,
             tools=tools,
+            tool_pool=tool_pool,
+            tool_timeout=tool_timeout,
+            tool_limit=tool_limit,
         )
 
     def _run_calculator(self, expression: str) -> str:
         return self.calculator.run(expression)
 
+    def _run_calculator_batch(self, expression: str, variables: dict) -> str:
+        return self.calculator.run_batch(expression, variables)
+
     def _run_search(self, query: str) -> str:
+        return json.dumps(self._cached_search(query))
+
+    def _cached_search(self, query: str) -> dict:
+        if not isinstance(query, str):
+            return self.search.run(query)
+        if self.search_cache is not None:
+            result = self.search_cache.get(self.search.provider, query)
+            if result is not None:
+                return result
+        if self.search_flights is None:
+            return self._search_and_store(query)
+        # Same normalization as the cache, so queries that would share an entry share a call
+        key = (id(self.search), SearchCache.normalize(query))
+        return self.search_flights.do(key, self._search_and_store, query)
+
+    def _search_and_store(self, query: str) -> dict:
         result = self.search.run(query)
-        return json.dumps(result)
+        if self.search_cache is not None:
+            self.search_cache.set(self.search.provider, query, result)
+        return result
 
     def ask(self, user_input: str) -> str:
+        with span("turn", agent=self.name):
+            try:
+                expression = self._fast_path_expression(user_input)
+                if expression is not None:
+                    return self._answer_directly(user_input, expression)
+
+                log_info("User: %s", user_input)
+                self.memory.add_message("user", user_input)
+
+                message = self.call_llm()
+
+                reply = ""
+                if message.tool_calls:
+                    self._record_tool_calls(message)
+                    tool_outputs = self.handle_tool_calls(message)
+                    for output in tool_outputs:
+                        log_info("🛠 Tool output: %s", output)
+                    reply = self._summarize_tool_outputs(tool_outputs)
+                else:
+                    message = self.call_llm(use_tools=False)
+                    reply = message.content or ""
+                self.memory.add_message("assistant", reply)
+                log_info("Agent: %s", reply)
+                return reply
+            except Exception as e:
+                log_error("[orchestrator] Error in ask: %s", e)
+                return ERROR_REPLY
+
+    def ask_stream(self, user_input: str):
+        """
+        Streaming variant of ask(). Yields dict chunks as the turn progresses:
+          {"type": "tool_call", "id", "name", "arguments"}
+          {"type": "tool_output", "id", "name", "output"}
+          {"type": "token", "content"}          reply text, as it arrives
+          {"type": "done", "reply", "ttft"}     ttft: seconds until the first token
+          {"type": "error", "reply", "error"}   ends the stream instead of "done"
+        The assembled reply is added to Memory once the stream completes.
+        """
+        start = time.perf_counter()
+        with span("turn", agent=self.name):
+            try:
+                expression = self._fast_path_expression(user_input)
+                if expression is not None:
+                    reply = self._answer_directly(user_input, expression)
+                    self.last_ttft = time.perf_counter() - start
+                    yield {"type": "token", "content": reply}
+                    yield {"type": "done", "reply": reply, "ttft": self.last_ttft}
+                    return
+
+                log_info("User: %s", user_input)
+                self.memory.add_message("user", user_input)
+
+                message = self.call_llm()
+
+                if message.tool_calls:
+                    self._record_tool_calls(message)
+                    yield from self._tool_call_chunks(message)
+                    tool_outputs = self.handle_tool_calls(message)
+                    yield from self._tool_output_chunks(message, tool_outputs)
+                    deltas = self._stream_tool_summary(tool_outputs)
+                else:
+                    deltas = self._stream_completion(self._build_request(use_tools=False), "reply")
+
+                parts = []
+                ttft = None
+                for delta in deltas:
+                    if ttft is None:
+                        ttft = time.perf_counter() - start
+                    parts.append(delta)
+                    yield {"type": "token", "content": delta}
+
+                reply = "".join(parts)
+                self.memory.add_message("assistant", reply)
+                self.last_ttft = ttft
+                log_info("Agent: %s", reply)
+                if ttft is not None:
+                    log_info("[orchestrator] Time to first token: %.3fs", ttft)
+                yield {"type": "done", "reply": reply, "ttft": ttft}
+            except Exception as e:
+                log_error("[orchestrator] Error in ask_stream: %s", e)
+                yield {"type": "error", "reply": ERROR_REPLY, "error": str(e)}
+
+    def _tool_call_chunks(self, message):
+        for tool_call in message.tool_calls:
+            yield {
+                "type": "tool_call",
+                "id": tool_call.id,
+                "name": tool_call.function.name,
+                "arguments": self._parse_tool_args(tool_call.function.arguments),
+            }
+
+    @staticmethod
+    def _tool_output_chunks(message, tool_outputs):
+        for tool_call, output in zip(message.tool_calls, tool_outputs):
+            log_info("🛠 Tool output: %s", output)
+            yield {"type": "tool_output", "id": tool_call.id, "name": tool_call.function.name, "output": output}
+
+    def _stream_completion(self, request: dict, stage: str):
+        """
+        Yield content deltas of a streamed completion, timed under the same span
+        as the unstreamed call and counted with record_usage() as stage.
+        """
+        usage_chunk = None  # The last chunk reports token usage when asked to
+        with span(_STREAM_SPANS[stage], agent=self.name):
+            stream = self.client.chat.completions.create(**request, stream=True, stream_options=_STREAM_USAGE)
+            for chunk in stream:
+                if getattr(chunk, "usage", None) is not None:
+                    usage_chunk = chunk
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+        record_usage(usage_chunk, stage)
+
+    def _stream_tool_summary(self, outputs: list[str]):
+        formatted = [self._format_tool_output(o) for o in outputs]
+        if not formatted:
+            return
+        if not self._needs_summary(formatted):
+            yield self._summary_fallback(formatted)
+            return
+
+        streamed = False
         try:
-            log_info(f"User: {user_input}")
-            self.memory.add_message("user", user_input)
-
-            message = self.call_llm()
-
-            reply = ""
-            if message.tool_calls:
-                self.memory.chat_history.append(
-                    {"role": "assistant", "tool_calls": message.tool_calls, "content": None}
-                )
-                for tool_call in message.tool_calls:
-                    tool_name = tool_call.function.name
-                    raw_args = tool_call.function.arguments
-                    try:
-                        tool_args = json.loads(raw_args) if isinstance(raw_args, str) else raw_args or {}
-                    except Exception:
-                        tool_args = {}
-                    print(f"🛠 Tool called: {tool_name} with args {tool_args}")
-                    log_info(f"🛠 Tool called: {tool_name} with args {tool_args}")
-                tool_outputs = self.handle_tool_calls(message)
-                for output in tool_outputs:
-                    log_info(f"🛠 Tool output: {output}")
-                reply = self._summarize_tool_outputs(tool_outputs)
-            else:
-                message = self.call_llm(use_tools=False)
-                reply = message.content or ""
-            self.memory.add_message("assistant", reply)
-            log_info(f"Agent: {reply}")
-            return reply
+            for delta in self._stream_completion(self._summary_request(formatted), "summarize"):
+                streamed = True
+                yield delta
         except Exception as e:
-            log_error(f"[orchestrator] Error in ask: {e}")
-            return "Oops! Something went wrong."
+            log_error("[orchestrator] Summarization failed: %s", e)
+            if streamed:
+                raise
+            yield self._summary_fallback(formatted)
+
+    def _fast_path_expression(self, user_input: str) -> str | None:
+        """The expression to answer directly, or None if the turn needs the LLM."""
+        if not self.fast_path:
+            return None
+        expression = user_input.strip()
+        return expression if self.calculator.can_evaluate(expression) else None
+
+    def _answer_directly(self, user_input: str, expression: str) -> str:
+        """
+        Pre-routing fast path: run the calculator ourselves and record the turn
+        in the same shape as an LLM-routed tool turn. expression is what
+        _fast_path_expression() checked, so it is also what gets evaluated.
+        """
+        log_info("User: %s", user_input)
+        self.memory.add_message("user", user_input)
+
+        tool_call = ToolCall(
+            f"fastpath_{next(self._fast_path_ids)}", "calculator", json.dumps({"expression": expression})
+        )
+        self.memory.append(Message("assistant", tool_calls=(tool_call,)))
+        log_info("🛠 Fast path: calculator(%r)", expression)
+
+        # Only expressions cheap enough to evaluate inline take the fast path
+        output = self.calculator.run(expression)
+        self._record_tool_output(tool_call, output)
+        log_info("🛠 Tool output: %s", output)
+
+        reply = self._format_tool_output(output)
+        self.memory.add_message("assistant", reply)
+        self.fast_path_turns += 1
+        log_info("Agent: %s", reply)
+        return reply
+
+    def _record_tool_calls(self, message):
+        # Keep only id/name/arguments, not the SDK objects
+        self.memory.append(
+            Message("assistant", tool_calls=tuple(ToolCall.from_any(call) for call in message.tool_calls))
+        )
+        for tool_call in message.tool_calls:
+            tool_name = tool_call.function.name
+            tool_args = self._parse_tool_args(tool_call.function.arguments)
+            log_info("🛠 Tool called: %s with args %s", tool_name, tool_args)
 
     def _summarize_tool_outputs(self, outputs: list[str]) -> str:
         formatted = [self._format_tool_output(o) for o in outputs]
         if not formatted:
             return ""
+        if not self._needs_summary(formatted):
+            return self._summary_fallback(formatted)
+
+        try:
+            request = self._summary_request(formatted)
+            if self.summary_flights is None:
+                return self._request_summary(request)
+            return self.summary_flights.do(self._summary_key(request), self._request_summary, request)
+        except Exception as e:
+            log_error("[orchestrator] Summarization failed: %s", e)
+            return self._summary_fallback(formatted)
+
+    def _request_summary(self, request: dict) -> str:
+        with span("summarize_tool_outputs", agent=self.name):
+            response = self.client.chat.completions.create(**request)
+        record_usage(response, "summarize")
+        return response.choices[0].message.content or ""
+
+    def _summary_key(self, request: dict):
+        # The summary is a function of the request alone, so equal requests
+        # through the same client can share one completion
+        return id(self.client), request_key(request)
 
+    def _needs_summary(self, formatted: list[str]) -> bool:
+        """Apply the summarize policy and log which path the turn took."""
+        if self.summarize == "always":
+            needed = True
+        elif self.summarize == "never":
+            needed = False
+        else:
+            needed = len(formatted) > 1 or self._is_long(formatted[0])
+
+        if needed:
+            self.summaries_requested += 1
+            log_info("[orchestrator] Summarizing %s tool output(s) with the LLM (policy=%s)", len(formatted), self.summarize)
+        else:
+            self.summaries_skipped += 1
+            log_info("[orchestrator] Summarization skipped, returning tool output directly (policy=%s)", self.summarize)
+        return needed
+
+    def _is_long(self, text: str) -> bool:
+        # A token is at least one character, so short strings never need the tokenizer
+        if len(text) <= self.summarize_token_threshold:
+            return False
+        from utils.token_monitor import count_text_tokens
+        return count_text_tokens(text) > self.summarize_token_threshold
+
+    def _summary_request(self, formatted: list[str]) -> dict:
         prompt = (
             "Summarize the tool results below in one concise response. "
             "Use only the provided tool results. Do not add external knowledge.\n\n"
             + "\n".join(f"- {item}" for item in formatted)
         )
-        try:
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": "You summarize tool outputs only."},
-                    {"role": "user", "content": prompt},
-                ],
-            )
-            return response.choices[0].message.content or ""
-        except Exception as e:
-            log_error(f"[orchestrator] Summarization failed: {e}")
-            if len(formatted) == 1:
-                return formatted[0]
-            return "; ".join(formatted)
+        return {
+            "model": self.model,
+            "messages": [
+                {"role": "system", "content": "You summarize tool outputs only."},
+                {"role": "user", "content": prompt},
+            ],
+        }
+
+    @staticmethod
+    def _summary_fallback(formatted: list[str]) -> str:
+        if len(formatted) == 1:
+            return formatted[0]
+        return "; ".join(formatted)
 
     def _format_tool_output(self, output: str) -> str:
         try:
@@ -116,3 +382,151 @@ class OrchestratorAgent(BaseAgent):
         except Exception:
             pass
         return str(output)
+
+
+class AsyncOrchestratorAgent(AsyncBaseAgent, OrchestratorAgent):
+    """
+    OrchestratorAgent for an AsyncOpenAI client, so one event loop can serve many
+    conversations. Uses the same tools, prompts and routing; pair it with AsyncMemory.
+    """
+
+    async def _run_calculator(self, expression: str) -> str:
+        # Expensive expressions wait on a worker process; keep that off the event loop
+        return await self._run_blocking(self.calculator.run, expression)
+
+    async def _run_calculator_batch(self, expression: str, variables: dict) -> str:
+        return await self._run_blocking(self.calculator.run_batch, expression, variables)
+
+    async def _run_search(self, query: str) -> str:
+        # SearchAgent and the persistent cache tier are blocking I/O; keep them off the event loop
+        result = await self._run_blocking(self._cached_search, query)
+        return json.dumps(result)
+
+    async def ask(self, user_input: str) -> str:
+        with span("turn", agent=self.name):
+            try:
+                expression = self._fast_path_expression(user_input)
+                if expression is not None:
+                    return self._answer_directly(user_input, expression)
+
+                log_info("User: %s", user_input)
+                self.memory.add_message("user", user_input)
+
+                message = await self.call_llm()
+
+                reply = ""
+                if message.tool_calls:
+                    self._record_tool_calls(message)
+                    tool_outputs = await self.handle_tool_calls(message)
+                    for output in tool_outputs:
+                        log_info("🛠 Tool output: %s", output)
+                    reply = await self._summarize_tool_outputs(tool_outputs)
+                else:
+                    message = await self.call_llm(use_tools=False)
+                    reply = message.content or ""
+                self.memory.add_message("assistant", reply)
+                log_info("Agent: %s", reply)
+                return reply
+            except Exception as e:
+                log_error("[orchestrator] Error in ask: %s", e)
+                return ERROR_REPLY
+
+    async def _summarize_tool_outputs(self, outputs: list[str]) -> str:
+        formatted = [self._format_tool_output(o) for o in outputs]
+        if not formatted:
+            return ""
+        if not self._needs_summary(formatted):
+            return self._summary_fallback(formatted)
+
+        try:
+            request = self._summary_request(formatted)
+            if self.summary_flights is None:
+                return await self._arequest_summary(request)
+            return await self.summary_flights.ado(self._summary_key(request), self._arequest_summary, request)
+        except Exception as e:
+            log_error("[orchestrator] Summarization failed: %s", e)
+            return self._summary_fallback(formatted)
+
+    async def _arequest_summary(self, request: dict) -> str:
+        with span("summarize_tool_outputs", agent=self.name):
+            response = await self.client.chat.completions.create(**request)
+        record_usage(response, "summarize")
+        return response.choices[0].message.content or ""
+
+    async def ask_stream(self, user_input: str):
+        """Async iterator variant of OrchestratorAgent.ask_stream(), same chunks."""
+        start = time.perf_counter()
+        with span("turn", agent=self.name):
+            try:
+                expression = self._fast_path_expression(user_input)
+                if expression is not None:
+                    reply = self._answer_directly(user_input, expression)
+                    self.last_ttft = time.perf_counter() - start
+                    yield {"type": "token", "content": reply}
+                    yield {"type": "done", "reply": reply, "ttft": self.last_ttft}
+                    return
+
+                log_info("User: %s", user_input)
+                self.memory.add_message("user", user_input)
+
+                message = await self.call_llm()
+
+                if message.tool_calls:
+                    self._record_tool_calls(message)
+                    for chunk in self._tool_call_chunks(message):
+                        yield chunk
+                    tool_outputs = await self.handle_tool_calls(message)
+                    for chunk in self._tool_output_chunks(message, tool_outputs):
+                        yield chunk
+                    deltas = self._astream_tool_summary(tool_outputs)
+                else:
+                    deltas = self._astream_completion(self._build_request(use_tools=False), "reply")
+
+                parts = []
+                ttft = None
+                async for delta in deltas:
+                    if ttft is None:
+                        ttft = time.perf_counter() - start
+                    parts.append(delta)
+                    yield {"type": "token", "content": delta}
+
+                reply = "".join(parts)
+                self.memory.add_message("assistant", reply)
+                self.last_ttft = ttft
+                log_info("Agent: %s", reply)
+                if ttft is not None:
+                    log_info("[orchestrator] Time to first token: %.3fs", ttft)
+                yield {"type": "done", "reply": reply, "ttft": ttft}
+            except Exception as e:
+                log_error("[orchestrator] Error in ask_stream: %s", e)
+                yield {"type": "error", "reply": ERROR_REPLY, "error": str(e)}
+
+    async def _astream_completion(self, request: dict, stage: str):
+        usage_chunk = None
+        with span(_STREAM_SPANS[stage], agent=self.name):
+            stream = await self.client.chat.completions.create(**request, stream=True, stream_options=_STREAM_USAGE)
+            async for chunk in stream:
+                if getattr(chunk, "usage", None) is not None:
+                    usage_chunk = chunk
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+        record_usage(usage_chunk, stage)
+
+    async def _astream_tool_summary(self, outputs: list[str]):
+        formatted = [self._format_tool_output(o) for o in outputs]
+        if not formatted:
+            return
+        if not self._needs_summary(formatted):
+            yield self._summary_fallback(formatted)
+            return
+
+        streamed = False
+        try:
+            async for delta in self._astream_completion(self._summary_request(formatted), "summarize"):
+                streamed = True
+                yield delta
+        except Exception as e:
+            log_error("[orchestrator] Summarization failed: %s", e)
+            if streamed:
+                raise
+            yield self._summary_fallback(formatted)
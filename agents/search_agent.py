@@ -17,7 +17,163 @@ search_schema = {
 }
 
 
-from typing import Dict, Any
+import random
+import threading
+import time
+from typing import TYPE_CHECKING, Dict, Any
+
+from utils.logger import log_debug
+
+if TYPE_CHECKING:
+    import httpx
+
+# Provider name -> provider class. Add a backend with @register_provider("name").
+PROVIDERS: Dict[str, type] = {}
+
+
+def register_provider(name: str):
+    def decorator(cls):
+        PROVIDERS[name] = cls
+        return cls
+    return decorator
+
+
+class SearchProvider:
+    """
+    A search backend. search() returns {"result": ...} or {"error": ...}
+    and may raise; SearchAgent turns exceptions into error results.
+    """
+
+    def __init__(self, api_key: str = "", **_options):
+        self.api_key = api_key
+
+    def search(self, query: str) -> Dict[str, Any]:
+        raise NotImplementedError
+
+
+@register_provider("mock")
+class MockSearchProvider(SearchProvider):
+    """Canned response for demos and offline tests."""
+
+    def search(self, query: str) -> Dict[str, Any]:
+        return {"result": "Bathinda is the capital of France."}
+
+
+_http_client = None
+_http_client_lock = threading.Lock()
+
+
+def shared_http_client() -> "httpx.Client":
+    """
+    One pooled keep-alive client for every HTTP provider in the process,
+    so searches reuse TLS connections instead of opening one per call.
+    """
+    global _http_client
+    with _http_client_lock:
+        if _http_client is None:
+            import httpx
+
+            _http_client = httpx.Client(
+                limits=httpx.Limits(max_connections=20, max_keepalive_connections=10, keepalive_expiry=30),
+                headers={"Accept": "application/json"},
+            )
+        return _http_client
+
+
+@register_provider("serpapi")
+class SerpAPIProvider(SearchProvider):
+    """
+    Google results through SerpAPI (https://serpapi.com/search-api).
+    Transient failures (connection errors, 429, 5xx) are retried with jittered
+    exponential backoff; the response is trimmed to the top_k snippets.
+    """
+
+    DEFAULT_BASE_URL = "https://serpapi.com"
+    RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+    def __init__(
+        self,
+        api_key: str = "",
+        base_url: str | None = None,
+        top_k: int = 3,
+        connect_timeout: float = 3.0,
+        read_timeout: float = 10.0,
+        max_retries: int = 2,
+        backoff: float = 0.5,
+        http_client: "httpx.Client | None" = None,
+        **options,
+    ):
+        """
+        base_url: API root, overridable to point at a local stand-in server
+        top_k: number of organic result snippets to keep
+        max_retries: retries after the first attempt for transient failures
+        backoff: base delay in seconds, doubled per retry and jittered
+        """
+        import httpx  # Deferred so the mock provider never loads it
+
+        super().__init__(api_key=api_key, **options)
+        self.base_url = (base_url or self.DEFAULT_BASE_URL).rstrip("/")
+        self.top_k = top_k
+        self.timeout = httpx.Timeout(read_timeout, connect=connect_timeout)
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.http_client = http_client
+
+    def search(self, query: str) -> Dict[str, Any]:
+        if not self.api_key:
+            return {"error": "SerpAPI key not configured"}
+
+        import httpx
+
+        client = self.http_client or shared_http_client()
+        params = {"engine": "google", "q": query, "api_key": self.api_key, "num": self.top_k}
+        attempt = 0
+        while True:
+            retry_after = None
+            try:
+                response = client.get(f"{self.base_url}/search.json", params=params, timeout=self.timeout)
+                if response.status_code not in self.RETRY_STATUSES:
+                    response.raise_for_status()
+                    return self._trim(response.json())
+                error = f"HTTP {response.status_code}"
+                retry_after = response.headers.get("retry-after")
+            except httpx.TransportError as e:
+                error = f"{type(e).__name__}: {e}"
+
+            if attempt >= self.max_retries:
+                return {"error": f"Search tool error: {error}"}
+            delay = self._retry_delay(attempt, retry_after)
+            log_debug("[search] serpapi attempt %s failed (%s), retrying in %.2fs", attempt + 1, error, delay)
+            time.sleep(delay)
+            attempt += 1
+
+    def _retry_delay(self, attempt: int, retry_after: str | None) -> float:
+        if retry_after:
+            try:
+                return min(float(retry_after), 30.0)
+            except ValueError:
+                pass
+        return self.backoff * (2 ** attempt) * random.uniform(0.5, 1.5)
+
+    def _trim(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        """Keep only what the LLM needs: the answer box and the top_k snippets."""
+        if data.get("error"):
+            return {"error": str(data["error"])}
+
+        answer = data.get("answer_box") or {}
+        snippets = []
+        sources = []
+        if answer.get("answer") or answer.get("snippet"):
+            snippets.append(str(answer.get("answer") or answer.get("snippet")))
+        for item in (data.get("organic_results") or [])[: self.top_k]:
+            if item.get("snippet"):
+                snippets.append(item["snippet"])
+                sources.append({"title": item.get("title", ""), "link": item.get("link", "")})
+
+        if not snippets:
+            return {"error": "No results found"}
+        return {"result": "\n".join(snippets[: self.top_k]), "sources": sources}
+
 
 class SearchAgent:
     """
@@ -25,38 +181,24 @@ class SearchAgent:
     No LLM. No reasoning. Pure data retrieval.
     """
 
-    def __init__(self, api_key: str, provider: str = "serpapi"):
+    def __init__(self, api_key: str, provider: str = "mock", **provider_options):
+        """
+        provider: a name registered in PROVIDERS ("mock", "serpapi")
+        provider_options: passed to the provider, e.g. base_url or top_k for serpapi
+        """
         self.api_key = api_key
         self.provider = provider
+        provider_cls = PROVIDERS.get(provider)
+        self.backend = provider_cls(api_key=api_key, **provider_options) if provider_cls else None
 
     def run(self, query: str) -> Dict[str, Any]:
         if not query or not isinstance(query, str):
             return {"error": "Invalid query"}
 
-        try:
-            if self.provider == "serpapi":
-                return self._search_serpapi(query)
-            else:
-                return {"error": f"Unsupported provider: {self.provider}"}
-
-        except Exception as e:
-            return {"error": str(e)}
+        if self.backend is None:
+            return {"error": f"Unsupported provider: {self.provider}"}
 
-    def _search_serpapi(self, query: str) -> Dict[str, Any]:
-        """
-        Perform a web search and return summarized results.
-        For demonstration, this uses a dummy/mocked response.
-        Replace with an actual API like SerpAPI or OpenWeather.
-        """
         try:
-            # Example mock response
-            return {"result": "Bathinda is the capital of France."}
-
-            # Real implementation example with SerpAPI:
-            # API_KEY = "YOUR_SERPAPI_KEY"
-            # url = f"https://serpapi.com/search.json?q={query}&api_key={API_KEY}"
-            # response = requests.get(url).json()
-            # return response["organic_results"][0]["snippet"]
-        
+            return self.backend.search(query)
         except Exception as e:
             return {"error": f"Search tool error: {e}"}
@@ -0,0 +1,78 @@
+import hashlib
+import re
+
+from utils.cache import MISSING, SQLiteCache, TTLCache
+from utils.logger import log_debug
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+class SearchCache:
+    """
+    Result cache for SearchAgent, keyed by provider and normalized query.
+    An in-process LRU tier sits in front of an optional SQLite tier that survives
+    restarts and is shared by worker processes on the same host.
+    Error results are cached too, with a short TTL, so a failing query isn't hammered.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        ttl: float = 3600,
+        error_ttl: float = 60,
+        persist_path: str | None = None,
+    ):
+        """
+        max_entries: size of the in-process LRU tier
+        ttl: seconds a successful result stays fresh
+        error_ttl: seconds an error result is cached
+        persist_path: SQLite file for the persistent tier (None = memory only)
+        """
+        self.ttl = ttl
+        self.error_ttl = error_ttl
+        self.memory = TTLCache(max_entries=max_entries, ttl=ttl)
+        self.persistent = SQLiteCache(persist_path, table="search_cache") if persist_path else None
+
+    @staticmethod
+    def normalize(query: str) -> str:
+        """'  Capital of  FRANCE? ' and 'capital of france' share an entry."""
+        return _WHITESPACE.sub(" ", query).strip().rstrip("?!.").strip().casefold()
+
+    def key(self, provider: str, query: str) -> str:
+        digest = hashlib.sha256(self.normalize(query).encode("utf-8")).hexdigest()
+        return f"{provider}:{digest}"
+
+    def get(self, provider: str, query: str):
+        """Return the cached result dict, or None."""
+        key = self.key(provider, query)
+        result = self.memory.get(key)
+        if result is not MISSING:
+            log_debug("[search-cache] memory hit: %s", query)
+            return result
+
+        if self.persistent is not None:
+            entry = self.persistent.get_entry(key)
+            if entry is not MISSING:
+                result, ttl_left = entry
+                log_debug("[search-cache] persistent hit: %s", query)
+                # Promote without extending the entry's lifetime
+                self.memory.set(key, result, ttl=ttl_left)
+                return result
+        return None
+
+    def set(self, provider: str, query: str, result: dict):
+        key = self.key(provider, query)
+        ttl = self.error_ttl if "error" in result else self.ttl
+        self.memory.set(key, result, ttl=ttl)
+        if self.persistent is not None:
+            self.persistent.set(key, result, ttl=ttl)
+
+    def stats(self) -> dict:
+        stats = {"memory": self.memory.stats()}
+        if self.persistent is not None:
+            stats["persistent"] = self.persistent.stats()
+        return stats
+
+    def close(self):
+        if self.persistent is not None:
+            self.persistent.close()
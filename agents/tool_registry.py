@@ -0,0 +1,249 @@
+"""
+Tools an agent exposes to the LLM: schemas prepared once, executors found by
+name, arguments checked against each tool's JSON schema before they run.
+"""
+import copy
+import inspect
+import json
+import re
+import threading
+import time
+
+from utils.tracing import count
+
+_WORD = re.compile(r"[a-z0-9]+")
+# Too common in tool descriptions and questions to say anything about relevance
+_STOPWORDS = {
+    "the", "and", "for", "use", "this", "that", "with", "like", "from", "into", "your", "you",
+    "what", "which", "when", "how", "are", "was", "can", "must", "one", "each", "all", "give",
+}
+
+_JSON_TYPES = {
+    "string": (str,),
+    "number": (int, float),
+    "integer": (int,),
+    "boolean": (bool,),
+    "array": (list, tuple),
+    "object": (dict,),
+    "null": (type(None),),
+}
+
+
+class ToolArgumentError(ValueError):
+    """Tool call arguments that don't match the tool's parameter schema."""
+
+
+def _keywords(text: str) -> set:
+    return {word for word in _WORD.findall(text.lower()) if len(word) > 2 and word not in _STOPWORDS}
+
+
+def compile_validator(schema: dict, top_level: bool = False):
+    """
+    Turn a JSON schema into check(value, path), which raises ToolArgumentError.
+    Covers what tool schemas use: type (or a list of types), enum, properties,
+    required, additionalProperties and items; other keywords are not checked.
+    At the top level, arguments not in properties are rejected unless
+    additionalProperties allows them, since they become executor keywords.
+    """
+    checks = []
+
+    types = schema.get("type")
+    if types is not None:
+        types = [types] if isinstance(types, str) else list(types)
+        if all(t in _JSON_TYPES for t in types):
+            python_types = tuple(t for name in types for t in _JSON_TYPES[name])
+            numeric_only = "boolean" not in types
+            expected = " or ".join(types)
+
+            def check_type(value, path):
+                # bool is an int subclass, but true is not a number in JSON
+                if not isinstance(value, python_types) or (numeric_only and isinstance(value, bool)):
+                    raise ToolArgumentError(f"{path} must be {expected}, got {type(value).__name__}")
+
+            checks.append(check_type)
+
+    if "enum" in schema:
+        allowed = list(schema["enum"])
+
+        def check_enum(value, path):
+            if value not in allowed:
+                raise ToolArgumentError(f"{path} must be one of {allowed}")
+
+        checks.append(check_enum)
+
+    properties = {name: compile_validator(sub) for name, sub in (schema.get("properties") or {}).items()}
+    required = tuple(schema.get("required") or ())
+    extra = schema.get("additionalProperties", not (top_level and properties))
+    extra_check = compile_validator(extra) if isinstance(extra, dict) else None
+    if properties or required or extra is not True:
+
+        def check_object(value, path):
+            if not isinstance(value, dict):
+                return
+            for name in required:
+                if name not in value:
+                    raise ToolArgumentError(f"{path} is missing required argument {name!r}")
+            for name, item in value.items():
+                check = properties.get(name, extra_check)
+                if check is not None:
+                    check(item, f"{path}.{name}")
+                elif name not in properties and extra is False:
+                    raise ToolArgumentError(f"{path} has unexpected argument {name!r}")
+
+        checks.append(check_object)
+
+    if isinstance(schema.get("items"), dict):
+        item_check = compile_validator(schema["items"])
+
+        def check_items(value, path):
+            if isinstance(value, (list, tuple)):
+                for i, item in enumerate(value):
+                    item_check(item, f"{path}[{i}]")
+
+        checks.append(check_items)
+
+    def check(value, path="arguments"):
+        for c in checks:
+            c(value, path)
+
+    return check
+
+
+class Tool:
+    """One registered tool: its frozen schema, executor, argument check and call stats."""
+
+    __slots__ = ("name", "schema", "schema_json", "executor", "validate", "keywords", "calls", "errors", "seconds", "_lock")
+
+    def __init__(self, descriptor: dict):
+        descriptor = dict(descriptor)
+        self.executor = descriptor.pop("executor")
+        # A private copy, so later edits to the caller's descriptor can't change what is sent
+        self.schema = copy.deepcopy(descriptor)
+        self.schema_json = json.dumps(self.schema, separators=(",", ":"))
+        function = self.schema["function"]
+        self.name = function["name"]
+        self.validate = compile_validator(function.get("parameters") or {}, top_level=True)
+        parameters = (function.get("parameters") or {}).get("properties") or {}
+        self.keywords = _keywords(
+            " ".join(
+                [self.name.replace("_", " "), function.get("description", "")]
+                + [f"{name} {spec.get('description', '')}" for name, spec in parameters.items()]
+            )
+        )
+        self.calls = 0
+        self.errors = 0
+        self.seconds = 0.0
+        self._lock = threading.Lock()
+
+    def _record(self, start, failed):
+        with self._lock:
+            self.calls += 1
+            self.errors += failed
+            self.seconds += time.perf_counter() - start
+        count("agent_tool_calls_total", tool=self.name, status="error" if failed else "ok")
+
+    def run(self, args: dict):
+        """Validate args and call the executor. ToolArgumentError and executor errors propagate."""
+        start = time.perf_counter()
+        failed = True
+        try:
+            self.validate(args)
+            output = self.executor(**args)
+            failed = False
+            return output
+        finally:
+            self._record(start, failed)
+
+    async def arun(self, args: dict):
+        """run() for an executor that may be a coroutine function."""
+        start = time.perf_counter()
+        failed = True
+        try:
+            self.validate(args)
+            output = self.executor(**args)
+            if inspect.isawaitable(output):
+                output = await output
+            failed = False
+            return output
+        finally:
+            self._record(start, failed)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "errors": self.errors,
+                "mean_ms": self.seconds / self.calls * 1000 if self.calls else 0.0,
+            }
+
+
+class ToolRegistry:
+    """
+    Name-indexed tools. schemas() returns the same prepared list on every call,
+    so building a request copies nothing; treat it as read-only. A subset for
+    select() is a fresh list of the same prepared schemas.
+    """
+
+    def __init__(self, tools=()):
+        """tools: descriptors as for the API, each with an "executor" callable"""
+        self._tools = {}
+        self._schemas = None  # Every tool's schema, built on first use
+        for descriptor in tools:
+            self.register(descriptor)
+
+    def register(self, descriptor: dict) -> Tool:
+        tool = Tool(descriptor)
+        if tool.name in self._tools:
+            raise ValueError(f"Tool already registered: {tool.name}")
+        self._tools[tool.name] = tool
+        self._schemas = None
+        return tool
+
+    def get(self, name: str) -> Tool | None:
+        return self._tools.get(name)
+
+    def __contains__(self, name):
+        return name in self._tools
+
+    def __iter__(self):
+        return iter(self._tools.values())
+
+    def __len__(self):
+        return len(self._tools)
+
+    def names(self) -> tuple:
+        return tuple(self._tools)
+
+    def schemas(self, names=None) -> list:
+        """Schemas of the named tools (all by default), in registration order."""
+        if names is None:
+            if self._schemas is None:
+                self._schemas = [tool.schema for tool in self._tools.values()]
+            return self._schemas
+        # Not cached: with a tool_limit the possible subsets are combinatorial
+        return [tool.schema for name, tool in self._tools.items() if name in names]
+
+    def payload_size(self, names=None) -> int:
+        """Characters of JSON the schemas add to a request."""
+        key = self.names() if names is None else names
+        return sum(len(self._tools[name].schema_json) for name in key if name in self._tools)
+
+    def select(self, query: str, limit: int, always=()) -> tuple:
+        """
+        Names of up to `limit` tools whose name, description and parameters share
+        the most words with query, plus `always`. Every tool when none match, so a
+        question phrased unlike any description still reaches the full set.
+        """
+        if len(self._tools) <= limit:
+            return self.names()
+        words = _keywords(query or "")
+        scored = [(len(words & tool.keywords), i, tool.name) for i, tool in enumerate(self._tools.values())]
+        chosen = {name for score, _i, name in sorted(scored, key=lambda s: (-s[0], s[1]))[:limit] if score > 0}
+        if not chosen:
+            return self.names()
+        chosen.update(name for name in always if name in self._tools)
+        return tuple(name for name in self._tools if name in chosen)
+
+    def stats(self) -> dict:
+        """Calls, errors and mean latency per tool, by name."""
+        return {name: tool.stats() for name, tool in self._tools.items()}
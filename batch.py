@@ -0,0 +1,286 @@
+"""
+Batch mode: run a JSONL file of inputs through the orchestrator with bounded
+concurrency, for evaluations and backfills.
+
+    python main.py --batch inputs.jsonl --output results.jsonl --concurrency 16
+
+Each input line is {"input": "...", "id": ..., "conversation": ...}, or just a
+JSON string. "id" defaults to the line number. Lines sharing a "conversation"
+run in file order against one Memory; every other line gets a fresh Memory.
+
+Results are appended to the output file as each input finishes, one JSON line
+per input. Rerunning with the same output file skips inputs already answered,
+so an interrupted run resumes where it stopped (--no-resume starts over). A
+conversation that still has unanswered lines gets its answered turns replayed
+from the output into its Memory first, so later lines keep their context.
+Inputs are streamed, never loaded whole; a conversation's Memory is released
+after its last line.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from collections import Counter
+
+from agents.orchestrator import ERROR_REPLY
+from utils.logger import log_error
+
+
+class BatchStats:
+    def __init__(self):
+        self.succeeded = 0
+        self.failed = 0
+        self.skipped = 0
+        self.latencies = []
+        self.start = time.perf_counter()
+
+    def add(self, record):
+        if record["status"] == "ok":
+            self.succeeded += 1
+        else:
+            self.failed += 1
+        if "latency_ms" in record:
+            self.latencies.append(record["latency_ms"])
+
+    def summary(self) -> dict:
+        elapsed = time.perf_counter() - self.start
+        processed = self.succeeded + self.failed
+        ordered = sorted(self.latencies)
+
+        def pct(p):
+            return ordered[min(len(ordered) - 1, round(p / 100 * (len(ordered) - 1)))] if ordered else None
+
+        return {
+            "processed": processed,
+            "succeeded": self.succeeded,
+            "failed": self.failed,
+            "skipped": self.skipped,
+            "elapsed_sec": elapsed,
+            "items_per_sec": processed / elapsed if elapsed else 0.0,
+            "p50_ms": pct(50),
+            "p95_ms": pct(95),
+            "p99_ms": pct(99),
+        }
+
+
+def read_items(path):
+    """Yield one item dict per non-blank input line; malformed lines carry an "error"."""
+    with open(path) as f:
+        for line_no, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                item = json.loads(line)
+            except json.JSONDecodeError as e:
+                yield {"id": line_no, "error": f"Invalid JSON: {e}"}
+                continue
+            if isinstance(item, str):
+                item = {"input": item}
+            if not isinstance(item, dict) or not isinstance(item.get("input"), str):
+                yield {"id": line_no, "error": 'Expected {"input": "..."} or a JSON string'}
+                continue
+            item.setdefault("id", line_no)
+            yield item
+
+
+def completed_replies(path) -> dict:
+    """
+    Inputs already answered successfully in an earlier run's output, by id key.
+    Conversation lines map to their reply, for replaying; other lines to None.
+    """
+    done = {}
+    if not os.path.exists(path):
+        return done
+    with open(path) as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # A line cut short when the earlier run was killed
+            if record.get("status") == "ok":
+                done[_id_key(record["id"])] = record.get("reply") if "conversation" in record else None
+    return done
+
+
+def conversation_lines(path, done) -> Counter:
+    """
+    Lines per conversation session that have to go through a worker: all of
+    them when any is unanswered (answered ones are replayed), else none.
+    """
+    lines = Counter()
+    pending = set()
+    for item in read_items(path):
+        if item.get("conversation") is None:
+            continue
+        session_id = _session_id(item)
+        lines[session_id] += 1
+        if _id_key(item["id"]) not in done:
+            pending.add(session_id)
+    return Counter({session_id: n for session_id, n in lines.items() if session_id in pending})
+
+
+def _id_key(item_id):
+    # JSON round-trips keep ints and strings apart; compare them the same way
+    return json.dumps(item_id)
+
+
+def _session_id(item) -> str:
+    conversation = item.get("conversation")
+    return f"conversation:{conversation}" if conversation is not None else f"item:{item['id']}"
+
+
+async def _replay_item(sessions, item, reply):
+    """Put a turn answered in an earlier run back into its conversation's Memory."""
+    session = sessions.get(_session_id(item))
+    async with session.lock:
+        session.memory.add_message("user", item["input"])
+        session.memory.add_message("assistant", reply or "")
+
+
+async def _release(sessions, session_id):
+    # Let a pending summary land first; drop() refuses a session that has one
+    session = sessions.sessions.get(session_id)
+    if session is not None:
+        await session.memory.aflush()
+    sessions.drop(session_id)
+
+
+async def _run_item(sessions, item) -> dict:
+    record = {"id": item["id"]}
+    if "error" in item:
+        return {**record, "status": "error", "error": item["error"]}
+
+    conversation = item.get("conversation")
+    session_id = _session_id(item)
+    record["input"] = item["input"]
+    if conversation is not None:
+        record["conversation"] = conversation
+
+    start = time.perf_counter()
+    try:
+        session = sessions.get(session_id)
+        async with session.lock:
+            reply = await session.agent.ask(item["input"])
+        record["latency_ms"] = (time.perf_counter() - start) * 1000
+        record["reply"] = reply
+        record["status"] = "error" if reply == ERROR_REPLY else "ok"
+    except Exception as e:
+        log_error("[batch] Item %s failed: %s", item["id"], e)
+        record["latency_ms"] = (time.perf_counter() - start) * 1000
+        record.update(status="error", error=str(e))
+    finally:
+        if conversation is None:
+            await _release(sessions, session_id)
+    return record
+
+
+async def run_batch(input_path, output_path, sessions, concurrency: int = 8, resume: bool = True) -> dict:
+    """
+    Answer every input in input_path with at most `concurrency` turns in flight,
+    appending result lines to output_path. sessions is a server.SessionManager.
+    Returns the summary from BatchStats.
+    """
+    done = completed_replies(output_path) if resume else {}
+    # Counts down as lines finish; a conversation is released when it reaches zero
+    remaining = conversation_lines(input_path, done)
+    stats = BatchStats()
+    # Holds a few items per worker, so reading never runs far ahead of answering
+    queue = asyncio.Queue(maxsize=concurrency * 2)
+
+    mode = "a" if resume else "w"
+    with open(output_path, mode) as out:
+        if resume and out.tell() > 0:
+            # Don't glue the first new record onto a line cut short by a crash
+            with open(output_path, "rb") as f:
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b"\n":
+                    out.write("\n")
+
+        async def worker():
+            while True:
+                entry = await queue.get()
+                if entry is None:
+                    return
+                item, replay = entry
+                if replay:
+                    await _replay_item(sessions, item, done[_id_key(item["id"])])
+                else:
+                    record = await _run_item(sessions, item)
+                    out.write(json.dumps(record) + "\n")
+                    out.flush()
+                    stats.add(record)
+                if item.get("conversation") is not None:
+                    session_id = _session_id(item)
+                    remaining[session_id] -= 1
+                    if remaining[session_id] == 0:
+                        del remaining[session_id]
+                        await _release(sessions, session_id)
+
+        workers = [asyncio.create_task(worker()) for _ in range(concurrency)]
+        for item in read_items(input_path):
+            replay = _id_key(item["id"]) in done
+            if replay:
+                stats.skipped += 1
+                if item.get("conversation") is None or _session_id(item) not in remaining:
+                    continue
+            await queue.put((item, replay))
+        for _ in workers:
+            await queue.put(None)
+        await asyncio.gather(*workers)
+
+    # Let rolling summaries of long conversations finish before the loop goes away
+    for session in list(sessions.sessions.values()):
+        await session.memory.aflush()
+    return stats.summary()
+
+
+def print_summary(summary, file=None):
+    file = file or sys.stdout
+    print(
+        f"Processed {summary['processed']} ({summary['succeeded']} ok, {summary['failed']} failed, "
+        f"{summary['skipped']} skipped) in {summary['elapsed_sec']:.1f}s, "
+        f"{summary['items_per_sec']:.2f} items/s",
+        file=file,
+    )
+    if summary["p50_ms"] is not None:
+        print(
+            f"Latency p50 {summary['p50_ms']:.0f} ms, p95 {summary['p95_ms']:.0f} ms, p99 {summary['p99_ms']:.0f} ms",
+            file=file,
+        )
+
+
+def main(argv=None, client=None, summary_client=None, **agent_options) -> int:
+    from server import SessionManager, default_agent_options, default_clients
+
+    parser = argparse.ArgumentParser(description="Run a JSONL file of inputs through the agent")
+    parser.add_argument("--batch", required=True, metavar="INPUT", help="JSONL file of inputs")
+    parser.add_argument("--output", required=True, help="JSONL file results are appended to")
+    parser.add_argument("--concurrency", type=int, default=8, help="turns in flight at once")
+    parser.add_argument("--model", default="gpt-4o-mini")
+    parser.add_argument("--token-limit", type=int, default=3000)
+    parser.add_argument("--no-resume", action="store_true", help="overwrite the output instead of resuming")
+    args, _ = parser.parse_known_args(argv)
+
+    if client is None:
+        client, summary_client = default_clients()
+    sessions = SessionManager(
+        client,
+        model=args.model,
+        token_limit=args.token_limit,
+        # The batch releases each conversation after its last line
+        idle_timeout=float("inf"),
+        max_sessions=sys.maxsize,
+        agent_options=default_agent_options(**agent_options),
+        summary_client=summary_client,
+    )
+    summary = asyncio.run(
+        run_batch(args.batch, args.output, sessions, concurrency=args.concurrency, resume=not args.no_resume)
+    )
+    print_summary(summary)
+    return 0 if summary["failed"] == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,316 @@
+"""
+Offline performance benchmarks for the agent pipeline.
+
+Runs the orchestrator against the FakeClient stand-in with configurable LLM
+latency and reply size, and measures Memory pruning and the tokenizer directly.
+Results are printed (or written) as JSON so runs can be compared:
+
+    python -m benchmarks.bench_agent --output bench.json
+    python -m benchmarks.bench_agent --baseline bench.json
+"""
+import argparse
+import contextlib
+import io
+import json
+import logging
+import sys
+import time
+import tracemalloc
+
+import psutil
+
+from agents.calculator_agent import CalculatorAgent, EvaluationPool
+from agents.orchestrator import OrchestratorAgent
+from agents.tool_registry import ToolRegistry
+from memory.memory import Memory
+from memory.message import Message
+from tests.fakes import FakeClient
+
+TURN_INPUTS = ["1+1", "Capital of France?", "2*(3+4)", "Tallest mountain on Earth?"]
+
+# Metrics where a higher value is better; every other numeric metric is a cost
+HIGHER_IS_BETTER = {"turns_per_sec", "saving_pct"}
+
+
+class RSSSampler:
+    """Peak resident set size across the stages that call sample()."""
+
+    def __init__(self):
+        self.process = psutil.Process()
+        self.peak = 0
+
+    def sample(self):
+        self.peak = max(self.peak, self.process.memory_info().rss)
+        return self.peak
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def bench_turns(turns, latency, reply_words, token_limit, rss):
+    """End-to-end orchestrator turns through a real Memory."""
+    client = FakeClient(latency=latency, reply_words=reply_words)
+    memory = Memory(client=client, token_limit=token_limit)
+    agent = OrchestratorAgent(client=client, memory=memory, fast_path=False, summarize="always")
+
+    latencies = []
+    # The orchestrator prints tool calls; keep them out of the JSON on stdout
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        for i in range(turns):
+            turn_start = time.perf_counter()
+            agent.ask(TURN_INPUTS[i % len(TURN_INPUTS)])
+            latencies.append(time.perf_counter() - turn_start)
+            if i % 50 == 0:
+                rss.sample()
+        elapsed = time.perf_counter() - start
+
+    return {
+        "turns": turns,
+        "llm_latency_ms": latency * 1000,
+        "turns_per_sec": turns / elapsed,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "llm_calls": client.calls,
+    }
+
+
+def bench_prune(history_lengths, rss):
+    """Cost of one prune_memory() that evicts half of a history of each length."""
+    results = {}
+    for length in history_lengths:
+        memory = Memory(client=None, token_limit=10 ** 9)
+        for i in range(length):
+            memory.add_message("user" if i % 2 == 0 else "assistant", f"message {i} about the benchmark topic")
+        memory.token_limit = int(memory.token_count() / 2 / 0.75)
+
+        start = time.perf_counter()
+        memory.prune_memory()
+        results[str(length)] = {
+            "prune_ms": (time.perf_counter() - start) * 1000,
+            "evicted": length - len(memory.chat_history),
+        }
+        rss.sample()
+    return results
+
+
+def bench_tokenizer(iterations, rss):
+    """Time to count the tokens of one typical message, as Memory does on append."""
+    memory = Memory(client=None)
+    text = "Summarize the tool results below in one concise response. " * 4
+    start = time.perf_counter()
+    for _ in range(iterations):
+        memory._message_tokens(Message("user", text))
+    per_message = (time.perf_counter() - start) / iterations
+    rss.sample()
+    return {"iterations": iterations, "us_per_message": per_message * 1e6}
+
+
+def _sdk_tool_turn(i):
+    """One routed tool turn as the API returns it: an SDK tool-call object and plain dicts."""
+    from openai.types.chat import ChatCompletionMessageToolCall
+
+    call = ChatCompletionMessageToolCall.model_validate({
+        "id": f"call_{i}",
+        "type": "function",
+        "function": {"name": "search", "arguments": json.dumps({"query": f"question {i}"})},
+    })
+    return [
+        {"role": "user", "content": f"question {i}"},
+        {"role": "assistant", "tool_calls": [call], "content": None},
+        {"role": "tool", "tool_call_id": call.id, "content": f"answer {i}"},
+        {"role": "assistant", "content": f"answer {i}"},
+    ]
+
+
+def _retained_bytes(build, turns):
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        history = [message for i in range(turns) for message in build(i)]
+        retained = tracemalloc.get_traced_memory()[0] - before
+    finally:
+        tracemalloc.stop()
+    del history
+    return retained
+
+
+def bench_history_memory(turns):
+    """Memory one session's history holds per tool turn: raw dicts with SDK objects vs Message records."""
+    _sdk_tool_turn(0)  # Import and warm up the SDK types outside the measurement
+    as_dicts = _retained_bytes(_sdk_tool_turn, turns)
+    as_messages = _retained_bytes(
+        lambda i: [Message.from_dict(m, tokens=0) for m in _sdk_tool_turn(i)], turns
+    )
+    return {
+        "tool_turns": turns,
+        "dict_bytes_per_turn": as_dicts / turns,
+        "message_bytes_per_turn": as_messages / turns,
+        "saving_pct": 100 * (1 - as_messages / as_dicts),
+    }
+
+
+def _time_ms(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def bench_calculator(iterations, rss):
+    """Calculator cost guard: inline, worker-process, refused and timed-out expressions."""
+    calculator = CalculatorAgent()
+    cheap, heavy, hostile = "2*(3+4) - 5 % 3", "(3**200000) % 7", "9**9**9"
+    try:
+        calculator.run(heavy)  # Start the worker outside the measurement
+        results = {
+            "inline_us": _time_ms(lambda: calculator.run(cheap), iterations) * 1000,
+            "process_ms": _time_ms(lambda: calculator.run(heavy), 10),
+            "rejected_us": _time_ms(lambda: calculator.run(hostile), iterations) * 1000,
+        }
+    finally:
+        calculator.close()
+
+    # Compiled-expression cache, and one batch call against a scalar call per row
+    uncached = CalculatorAgent(cache_size=0)
+    results["uncached_inline_us"] = _time_ms(lambda: uncached.run(cheap), iterations) * 1000
+    rows = 1000
+    prices, quantities = list(range(1, rows + 1)), [i % 7 + 1 for i in range(rows)]
+    results["batch_rows"] = rows
+    calculator.run_batch("x", {"x": [1]})  # Import NumPy outside the measurement
+    results["batch_ms"] = _time_ms(
+        lambda: calculator.run_batch("price * qty * (1 - 0.2)", {"price": prices, "qty": quantities}), 10
+    )
+    results["scalar_rows_ms"] = _time_ms(
+        lambda: [uncached.run(f"{p} * {q} * (1 - 0.2)") for p, q in zip(prices, quantities)], 3
+    )
+
+    pool = EvaluationPool(size=1, timeout=0.1)
+    try:
+        runaway = CalculatorAgent(inline_cost=0, pool=pool)
+        results["timeout_kill_ms"] = _time_ms(lambda: runaway.run("(3**5000000) % 7"), 3)
+        results["killed"] = pool.killed
+    finally:
+        pool.close()
+    rss.sample()
+    return results
+
+
+def bench_tool_dispatch(tool_count, iterations, rss):
+    """Per-request tool overhead with tool_count tools: schemas plus finding the last tool's executor."""
+    descriptors = [
+        {
+            "type": "function",
+            "function": {
+                "name": f"tool_{i}",
+                "description": f"Tool number {i} for benchmark topic {i}",
+                "parameters": {"type": "object", "properties": {"query": {"type": "string"}}, "required": ["query"]},
+            },
+            "executor": lambda query: query,
+        }
+        for i in range(tool_count)
+    ]
+    last = f"tool_{tool_count - 1}"
+
+    def rebuild_and_scan():
+        # What every request did before the registry
+        [{k: v for k, v in tool.items() if k != "executor"} for tool in descriptors]
+        next(t for t in descriptors if t["function"]["name"] == last)["executor"](query="x")
+
+    registry = ToolRegistry(descriptors)
+    rss.sample()
+    return {
+        "tools": tool_count,
+        "rebuild_scan_us": _time_ms(rebuild_and_scan, iterations) * 1000,
+        "registry_us": _time_ms(lambda: (registry.schemas(), registry.get(last).run({"query": "x"})), iterations) * 1000,
+        "select_us": _time_ms(lambda: registry.schemas(registry.select("benchmark topic 7", 5)), iterations) * 1000,
+        "full_payload_chars": registry.payload_size(),
+        "selected_payload_chars": registry.payload_size(registry.select("benchmark topic 7", 5)),
+    }
+
+
+def run(args) -> dict:
+    rss = RSSSampler()
+    rss.sample()
+    results = {
+        "turns": bench_turns(args.turns, args.latency_ms / 1000, args.reply_words, args.token_limit, rss),
+        "prune": bench_prune(args.history_lengths, rss),
+        "tokenizer": bench_tokenizer(args.tokenizer_iterations, rss),
+        "history_memory": bench_history_memory(args.memory_turns),
+        "calculator": bench_calculator(args.calculator_iterations, rss),
+        "tool_dispatch": bench_tool_dispatch(args.tool_count, args.calculator_iterations, rss),
+    }
+    results["peak_rss_mb"] = rss.sample() / 1024 ** 2
+    return results
+
+
+def flatten(results, prefix=""):
+    flat = {}
+    for key, value in results.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(flatten(value, f"{name}."))
+        elif isinstance(value, (int, float)):
+            flat[name] = value
+    return flat
+
+
+def compare(results, baseline, tolerance):
+    """Print metric deltas against a baseline. Returns the names of regressed metrics."""
+    current, previous = flatten(results), flatten(baseline)
+    regressions = []
+    for name, value in current.items():
+        old = previous.get(name)
+        if not old:
+            continue
+        change = (value - old) / old
+        worse = -change if name.rsplit(".", 1)[-1] in HIGHER_IS_BETTER else change
+        flag = ""
+        if worse > tolerance and (name.endswith("_ms") or name.endswith("_sec") or name.endswith("_mb")):
+            regressions.append(name)
+            flag = "  <-- regression"
+        print(f"{name:40} {old:12.3f} -> {value:12.3f} ({change:+.1%}){flag}", file=sys.stderr)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline agent pipeline benchmarks")
+    parser.add_argument("--turns", type=int, default=200)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="artificial latency per LLM call")
+    parser.add_argument("--reply-words", type=int, default=0, help="pad LLM text replies to this many words")
+    parser.add_argument("--token-limit", type=int, default=3000)
+    parser.add_argument("--history-lengths", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--tokenizer-iterations", type=int, default=2000)
+    parser.add_argument("--memory-turns", type=int, default=1000, help="tool turns held for the history memory check")
+    parser.add_argument("--calculator-iterations", type=int, default=2000)
+    parser.add_argument("--tool-count", type=int, default=50, help="tools registered for the dispatch check")
+    parser.add_argument("--output", help="write the JSON results here instead of stdout")
+    parser.add_argument("--baseline", help="JSON results of an earlier run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed regression before failing")
+    args = parser.parse_args(argv)
+
+    # Measure the pipeline, not terminal and log-file writes
+    logging.getLogger("agent").setLevel(logging.WARNING)
+    results = run(args)
+    text = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        if regressions:
+            print(f"Regressed: {', '.join(regressions)}", file=sys.stderr)
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,141 @@
+"""
+Startup benchmarks: how long until the CLI is ready, what importing the agent
+modules costs, and what a new Memory (one per server session) costs.
+
+    python -m benchmarks.bench_startup --output startup.json
+    python -m benchmarks.bench_startup --baseline startup.json
+
+Cold starts run `python main.py --demo` in a fresh interpreter and stop the clock
+at the "ready" line, before any LLM call. A dummy OPENAI_API_KEY is used when none
+is set, so no network access is needed.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+from benchmarks.bench_agent import compare, percentile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+READY_LINE = "AI Agent is ready!"
+IMPORT_SNIPPET = (
+    "import time; start = time.perf_counter(); "
+    "import agents.orchestrator, memory.memory, utils.llm_cache; "
+    "print(time.perf_counter() - start)"
+)
+
+
+def _env():
+    env = dict(os.environ)
+    env.setdefault("OPENAI_API_KEY", "sk-benchmark")
+    env["AGENT_LOG_DIR"] = ""  # Keep log files out of the measurement
+    return env
+
+
+def _summary(samples):
+    return {
+        "runs": len(samples),
+        "min_ms": min(samples) * 1000,
+        "p50_ms": percentile(samples, 50) * 1000,
+        "max_ms": max(samples) * 1000,
+    }
+
+
+def bench_cold_start(runs):
+    """Wall time from spawning `main.py --demo` to its ready line."""
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        proc = subprocess.Popen(
+            [sys.executable, "main.py", "--demo"],
+            cwd=ROOT,
+            env=_env(),
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            text=True,
+        )
+        try:
+            for line in proc.stdout:
+                if READY_LINE in line:
+                    samples.append(time.perf_counter() - start)
+                    break
+            else:
+                raise RuntimeError(f"main.py exited with {proc.wait()} before printing {READY_LINE!r}")
+        finally:
+            proc.kill()
+            proc.wait()
+    return _summary(samples)
+
+
+def bench_imports(runs):
+    """Time to import the agent, memory and cache modules in a fresh interpreter."""
+    samples = []
+    for _ in range(runs):
+        out = subprocess.run(
+            [sys.executable, "-c", IMPORT_SNIPPET], cwd=ROOT, env=_env(), capture_output=True, text=True, check=True
+        )
+        samples.append(float(out.stdout.strip()))
+    return _summary(samples)
+
+
+def bench_memory_init(iterations):
+    """Cost of constructing a Memory, and of the one-time tokenizer load it defers."""
+    from memory.memory import Memory
+    from utils import token_monitor
+
+    start = time.perf_counter()
+    for _ in range(iterations):
+        Memory(token_limit=3000)
+    per_memory = (time.perf_counter() - start) / iterations
+
+    results = {"iterations": iterations, "memory_init_us": per_memory * 1e6}
+    token_monitor._encoders.clear()
+    start = time.perf_counter()
+    try:
+        token_monitor.get_encoder()
+        results["tokenizer_load_ms"] = (time.perf_counter() - start) * 1000
+    except Exception as e:
+        # tiktoken downloads its encoding on first use; offline without a cache this fails
+        print(f"Tokenizer load not measured: {e}", file=sys.stderr)
+    return results
+
+
+def run(args) -> dict:
+    return {
+        "cold_start": bench_cold_start(args.runs),
+        "imports": bench_imports(args.runs),
+        "memory": bench_memory_init(args.memory_iterations),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Startup and Memory construction benchmarks")
+    parser.add_argument("--runs", type=int, default=5, help="fresh interpreters per subprocess measurement")
+    parser.add_argument("--memory-iterations", type=int, default=1000)
+    parser.add_argument("--output", help="write the JSON results here instead of stdout")
+    parser.add_argument("--baseline", help="JSON results of an earlier run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed regression before failing")
+    args = parser.parse_args(argv)
+
+    results = run(args)
+    text = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        if regressions:
+            print(f"Regressed: {', '.join(regressions)}", file=sys.stderr)
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
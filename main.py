@@ -3,7 +3,13 @@ import os
 import sys
 from openai import OpenAI
 from memory.memory import Memory
+from memory.session_store import SQLiteSessionStore
 from agents.orchestrator import OrchestratorAgent
+from agents.search_cache import SearchCache
+from utils.llm_cache import CachedLLMClient, DiskLLMCache
+from utils.llm_scheduler import scheduler_from_env
+from utils import tracing
+from utils.logger import configure_logging_from_env
 import logging
 # Suppress console printing for httpx/urllib3
 logging.getLogger("httpx").setLevel(logging.WARNING)
@@ -12,16 +18,84 @@ logging.getLogger("urllib3").setLevel(logging.WARNING)
 
 # Load environment
 load_dotenv()
+# Log files go to AGENT_LOG_DIR (default logs/), written by a background thread
+configure_logging_from_env()
 api_key = os.getenv("OPENAI_API_KEY")
 if api_key:
     os.environ["OPENAI_API_KEY"] = api_key
 
-# Initialize OpenAI client
-client = OpenAI()
+# AGENT_TRACING=1 times each pipeline stage and prints a per-stage summary on exit
+if os.getenv("AGENT_TRACING") == "1":
+    tracing.enable()
+
+# --batch INPUT --output OUTPUT [--concurrency N] answers a JSONL file instead of chatting
+if "--batch" in sys.argv:
+    import batch
+
+    sys.exit(batch.main(sys.argv[1:]))
+
+# Initialize OpenAI client; retries are left to the scheduler
+# Every LLM call goes through one scheduler (LLM_RPM, LLM_TPM, LLM_MAX_CONCURRENCY);
+# memory summaries run at background priority behind the user's turns
+scheduler = scheduler_from_env(OpenAI(max_retries=0))
+client = scheduler.client_for("interactive")
+memory_client = scheduler.client_for("background")
+# LLM_CACHE_PATH caches completions on disk; LLM_CACHE_MODE=replay serves a recording offline
+llm_cache_path = os.getenv("LLM_CACHE_PATH")
+if llm_cache_path:
+    llm_cache = DiskLLMCache(llm_cache_path)
+    llm_cache_mode = os.getenv("LLM_CACHE_MODE", "readwrite")
+    client = CachedLLMClient(client, llm_cache, mode=llm_cache_mode)
+    memory_client = CachedLLMClient(memory_client, llm_cache, mode=llm_cache_mode)
 
 # Initialize memory & orchestrator
-memory = Memory(client=client, token_limit=25)
-agent = OrchestratorAgent(client=client, memory=memory, model="gpt-4o-mini")
+# SESSION_STORE_PATH keeps the conversation across restarts
+session_store_path = os.getenv("SESSION_STORE_PATH")
+# LONG_TERM_MEMORY_PATH indexes pruned turns and recalls the relevant ones into each request
+long_term_path = os.getenv("LONG_TERM_MEMORY_PATH")
+long_term = None
+if long_term_path:
+    from memory.long_term import LongTermMemory
+
+    long_term = LongTermMemory(path=long_term_path)
+memory = Memory(
+    client=memory_client,
+    token_limit=25,
+    background_summary=True,
+    store=SQLiteSessionStore(session_store_path) if session_store_path else None,
+    session_id="cli",
+    long_term=long_term,
+)
+# Set SEARCH_CACHE_PATH to keep search results across restarts
+search_cache = SearchCache(persist_path=os.getenv("SEARCH_CACHE_PATH"))
+# Real web search when a SerpAPI key is configured, canned demo answers otherwise
+serpapi_key = os.getenv("SERPAPI_API_KEY", "")
+agent = OrchestratorAgent(
+    client=client,
+    memory=memory,
+    model="gpt-4o-mini",
+    search_api_key=serpapi_key,
+    search_provider="serpapi" if serpapi_key else "mock",
+    search_cache=search_cache,
+)
+
+
+def print_streamed_reply(user_input):
+    """Print tool calls and then the reply as tokens arrive, instead of after the whole completion."""
+    started = False
+    for chunk in agent.ask_stream(user_input):
+        if chunk["type"] == "tool_call":
+            print(f"🛠 Tool called: {chunk['name']} with args {chunk['arguments']}")
+        elif chunk["type"] == "token":
+            if not started:
+                print("Agent: ", end="", flush=True)
+                started = True
+            print(chunk["content"], end="", flush=True)
+        elif chunk["type"] == "error":
+            print(("" if started else "Agent: ") + chunk["reply"], end="")
+            started = True
+    print()
+
 
 print("AI Agent is ready! Type 'exit' to quit.")
 
@@ -33,12 +107,17 @@ if "--demo" in sys.argv:
     ]
     for user_input in demo_inputs:
         print(f"You: {user_input}")
-        reply = agent.ask(user_input)
-        print("Agent:", reply)
+        print_streamed_reply(user_input)
 else:
     while True:
         user_input = input("You: ")
         if user_input.lower() in ["exit", "quit"]:
             break
-        reply = agent.ask(user_input)
-        print("Agent:", reply)
+        print_streamed_reply(user_input)
+
+# Let any in-flight summary of pruned messages finish before exiting
+memory.close(timeout=10)
+
+if tracing.is_enabled():
+    for name, h in tracing.snapshot()["histograms"].items():
+        print(f"{name}: {h['count']} calls, {h['sum'] / max(h['count'], 1) * 1000:.1f} ms avg")
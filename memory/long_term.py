@@ -0,0 +1,220 @@
+"""
+Long-term memory: turns evicted from Memory are embedded and kept in a vector
+index, and the few most relevant to the current user message are recalled into
+each request within a token budget.
+"""
+import hashlib
+import json
+import os
+import re
+
+import numpy as np
+
+_WORD = re.compile(r"\w+")
+
+
+class Embedder:
+    """Turns texts into an (n, dim) float32 array of unit-length rows."""
+
+    dim: int
+
+    def embed(self, texts: list[str]) -> np.ndarray:
+        raise NotImplementedError
+
+
+class HashingEmbedder(Embedder):
+    """
+    Deterministic, offline feature hashing of words and word bigrams into `dim`
+    signed buckets. No model and no network; similar wording scores high, so it
+    recalls facts by their terms rather than their meaning.
+    """
+
+    def __init__(self, dim: int = 512):
+        self.dim = dim
+
+    def _bucket(self, feature: str):
+        digest = hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest()
+        value = int.from_bytes(digest, "little")
+        return value % self.dim, 1.0 if value >> 63 else -1.0
+
+    def embed(self, texts):
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            words = _WORD.findall(text.casefold())
+            for feature in [*words, *(f"{a} {b}" for a, b in zip(words, words[1:]))]:
+                index, sign = self._bucket(feature)
+                vectors[row, index] += sign
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.where(norms == 0, 1, norms)
+
+
+class OpenAIEmbedder(Embedder):
+    """Embeddings from the API (e.g. text-embedding-3-small, 1536 dims)."""
+
+    def __init__(self, client, model: str = "text-embedding-3-small", dim: int = 1536):
+        self.client = client
+        self.model = model
+        self.dim = dim
+
+    def embed(self, texts):
+        response = self.client.embeddings.create(model=self.model, input=list(texts))
+        vectors = np.array([item.embedding for item in response.data], dtype=np.float32)
+        return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+class VectorIndex:
+    """
+    Contiguous float32 matrix of unit vectors with brute-force cosine top-k.
+    Capacity doubles as rows are appended. With a path, the matrix is a
+    memory-mapped .npy file, so it is paged in on demand and survives restarts.
+    """
+
+    def __init__(self, dim: int, path: str | None = None, count: int = 0, initial_capacity: int = 256):
+        """count: rows already stored in an existing file at path"""
+        self.dim = dim
+        self.path = path
+        self.count = count
+        if path is not None and os.path.exists(path):
+            self._matrix = np.load(path, mmap_mode="r+")
+            if self._matrix.shape[1] != dim:
+                raise ValueError(f"{path} holds {self._matrix.shape[1]}-dim vectors, expected {dim}")
+            self.count = min(count, self._matrix.shape[0])
+        else:
+            self._matrix = self._allocate(max(initial_capacity, count))
+
+    def _allocate(self, capacity: int, path: str | None = None) -> np.ndarray:
+        path = path or self.path
+        if path is None:
+            return np.zeros((capacity, self.dim), dtype=np.float32)
+        return np.lib.format.open_memmap(path, mode="w+", dtype=np.float32, shape=(capacity, self.dim))
+
+    def _grow(self, needed: int):
+        capacity = self._matrix.shape[0]
+        while capacity < needed:
+            capacity *= 2
+        if self.path is None:
+            grown = self._allocate(capacity)
+            grown[: self.count] = self._matrix[: self.count]
+            self._matrix = grown
+            return
+        # Build the larger file beside the old one, then swap it in
+        tmp_path = f"{self.path}.tmp"
+        grown = self._allocate(capacity, tmp_path)
+        grown[: self.count] = self._matrix[: self.count]
+        grown.flush()
+        del self._matrix
+        os.replace(tmp_path, self.path)
+        self._matrix = grown
+
+    def add(self, vectors: np.ndarray) -> range:
+        """Append rows; returns their ids."""
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(-1, self.dim)
+        start = self.count
+        if start + len(vectors) > self._matrix.shape[0]:
+            self._grow(start + len(vectors))
+        self._matrix[start : start + len(vectors)] = vectors
+        self.count += len(vectors)
+        return range(start, self.count)
+
+    def search(self, query: np.ndarray, k: int):
+        """(ids, scores) of the k rows most similar to query, best first."""
+        if self.count == 0 or k <= 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        scores = self._matrix[: self.count] @ np.asarray(query, dtype=np.float32).reshape(self.dim)
+        k = min(k, self.count)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return top, scores[top]
+
+    def flush(self):
+        if isinstance(self._matrix, np.memmap):
+            self._matrix.flush()
+
+
+class LongTermMemory:
+    """
+    Evicted turns plus their vectors. recall() returns the stored turns most
+    similar to a query, best first, that fit in a token budget.
+
+    With a path, vectors live in <path>.npy and turn texts in <path>.jsonl,
+    both appended incrementally; reopening the same path restores the index.
+    """
+
+    def __init__(
+        self,
+        embedder: Embedder | None = None,
+        path: str | None = None,
+        token_budget: int = 300,
+        top_k: int = 3,
+        min_score: float = 0.2,
+    ):
+        """
+        token_budget: most tokens of recalled turns added to one request
+        top_k: most turns recalled per request
+        min_score: cosine similarity below which a turn is not worth recalling
+        """
+        self.embedder = embedder or HashingEmbedder()
+        self.path = path
+        self.token_budget = token_budget
+        self.top_k = top_k
+        self.min_score = min_score
+        self.turns = []  # [(text, tokens)], row i of the index
+        self._records = None
+        if path is not None:
+            records_path = f"{path}.jsonl"
+            good_bytes = 0  # Length of the complete records at the start of the file
+            if os.path.exists(records_path):
+                with open(records_path, "rb") as f:
+                    for line in f:
+                        try:
+                            record = json.loads(line)
+                        except json.JSONDecodeError:
+                            break  # Cut short by a crash; vectors past here are ignored
+                        if not line.endswith(b"\n"):
+                            break
+                        self.turns.append((record["text"], record["tokens"]))
+                        good_bytes += len(line)
+            self._records = open(records_path, "a")
+            # Drop a torn last line, so new records don't get glued onto it
+            self._records.truncate(good_bytes)
+        self.index = VectorIndex(
+            self.embedder.dim, f"{path}.npy" if path is not None else None, count=len(self.turns)
+        )
+        del self.turns[self.index.count :]
+
+    def __len__(self):
+        return len(self.turns)
+
+    def add(self, texts: list[str], tokens: list[int]):
+        """Embed and store turns. tokens: each text's token count, for the recall budget."""
+        if not texts:
+            return
+        self.index.add(self.embedder.embed(texts))
+        self.index.flush()
+        self.turns.extend(zip(texts, tokens))
+        if self._records is not None:
+            # Vectors are written first, so every stored record has its vector
+            self._records.write("".join(json.dumps({"text": t, "tokens": n}) + "\n" for t, n in zip(texts, tokens)))
+            self._records.flush()
+
+    def recall(self, query: str, token_budget: int | None = None) -> list[str]:
+        budget = self.token_budget if token_budget is None else token_budget
+        if not query or not self.turns or budget <= 0:
+            return []
+        ids, scores = self.index.search(self.embedder.embed([query])[0], self.top_k)
+        recalled = []
+        for turn_id, score in zip(ids, scores):
+            if score < self.min_score:
+                break
+            text, tokens = self.turns[turn_id]
+            if tokens > budget:
+                continue
+            recalled.append(text)
+            budget -= tokens
+        return recalled
+
+    def close(self):
+        self.index.flush()
+        if self._records is not None:
+            self._records.close()
+            self._records = None
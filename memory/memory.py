@@ -1,111 +1,418 @@
-import tiktoken
+import asyncio
+import queue
+import threading
+from collections import deque
+
+from memory.message import Message
 from utils.logger import log_debug, log_info
-from openai import OpenAI
+from utils.token_monitor import get_encoder
+from utils.tracing import record_usage, span
+
 
 class Memory:
-    def __init__(self, model="gpt-4o-mini", token_limit=3000, client=None):
+    def __init__(
+        self,
+        model="gpt-4o-mini",
+        token_limit=3000,
+        client=None,
+        background_summary=False,
+        store=None,
+        session_id=None,
+        long_term=None,
+    ):
         """
         model: the GPT model you are using
         token_limit: max total tokens to keep in memory before pruning
         client: OpenAI client instance (required for summarization)
+        background_summary: evict immediately and summarize on a worker thread
+        store: optional SQLiteSessionStore; history and summary are persisted
+               incrementally and reloaded from it for session_id
+        long_term: optional LongTermMemory; pruned turns are indexed in it and
+                   the most relevant ones are recalled for each user message
         """
-        self.chat_history = []
+        # Message records; deque gives O(1) eviction from the head
+        self.chat_history = deque()
         self.model = model
-        self.enc = tiktoken.encoding_for_model(model)
+        self._enc = None  # Shared tokenizer, resolved on first token count
         self.token_limit = token_limit
         self.client = client
-        self.summary = ""  # Holds summary of pruned messages
+        self.summary = ""  # Rolling summary of all pruned messages
+        self.background_summary = background_summary
+        self._summary_message = None  # System message at the head of history holding the summary
+        self._summary_ready = False  # Set by the worker when a new summary awaits swapping in
+        self._lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._worker = None
+        self._pending_batches = 0
+        self._pending_cond = threading.Condition()
+        # Running total of the token counts cached on each message
+        self._total_tokens = 0
+        self.store = store
+        self.session_id = session_id
+        # Messages are numbered for the store; eviction is always from the head,
+        # so the oldest kept message is _first_seq and the rest follow in order
+        self._first_seq = 0
+        self._next_seq = 0
+        self.long_term = long_term
+        self._recalled = (None, 0, None)  # (query, index size, message) of the last recall
+        if store is not None:
+            self._rehydrate()
 
     def add_message(self, role, content):
         """Add a message and prune memory if token limit exceeded"""
-        self.chat_history.append({"role": role, "content": content})
-        log_debug(f"Memory updated. Total messages: {len(self.chat_history)}")
+        self.append(Message(role, content))
+        log_debug("Memory updated. Total messages: %s", len(self.chat_history))
         
         # Check token usage and prune if needed
         self.prune_memory()
-    
+
+    def append(self, message):
+        """
+        Append a Message, or an API-shaped dict (assistant tool calls, tool outputs)
+        converted to one, to history. Its token count is computed once here and
+        cached on the message. Does not prune.
+        """
+        message = Message.from_dict(message)
+        if message.tokens is None:
+            message.tokens = self._message_tokens(message)
+        self._append_counted(message)
+        if self.store is not None:
+            self.store.append(self.session_id, self._next_seq, message, message.tokens)
+        self._next_seq += 1
+
+    def _append_counted(self, message):
+        self.chat_history.append(message)
+        self._total_tokens += message.tokens
+
+    def _rehydrate(self):
+        """Load history, cached token counts and summary from the store. No tokenizing."""
+        summary, summary_tokens, rows = self.store.load(self.session_id)
+        for seq, message, tokens in rows:
+            self._append_counted(Message.from_dict(message, tokens))
+        if rows:
+            self._first_seq = rows[0][0]
+            self._next_seq = rows[-1][0] + 1
+        if summary:
+            self.summary = summary
+            self._attach_summary(summary, summary_tokens)
+
+    @property
+    def enc(self):
+        if self._enc is None:
+            self._enc = get_encoder(self.model)
+        return self._enc
+
+    def _message_tokens(self, message):
+        tokens = len(self.enc.encode(message.content or ""))
+
+        # Count tool arguments if present
+        for call in message.tool_calls:
+            tokens += len(self.enc.encode(call.arguments))
+        return tokens
+
+    def _pop_oldest(self):
+        """Remove the oldest message and subtract its cached token count."""
+        message = self.chat_history.popleft()
+        self._total_tokens -= message.tokens
+        return message
+
+    def _prune_cut(self, target_tokens):
+        """
+        Single pass over cached token counts: return how many head messages must go
+        to get under target_tokens. An assistant tool-call message or a tool message
+        takes the tool messages that follow it along, so no tool output is orphaned.
+        """
+        remaining = self._total_tokens
+        cut = 0
+        absorb_tools = False
+        # Iterate rather than index: deque indexing away from the ends is O(n)
+        for message in self.chat_history:
+            role = message.role
+            if remaining <= target_tokens and not (absorb_tools and role == "tool"):
+                break
+            remaining -= message.tokens
+            cut += 1
+            absorb_tools = role == "tool" or (role == "assistant" and bool(message.tool_calls))
+        return cut
+
     def token_count(self):
-        total_tokens = 0
-        for msg in self.chat_history:
-            content = msg.get("content") or ""
-            total_tokens += len(self.enc.encode(content))
-
-            # Count tool arguments if present
-            if msg.get("tool_calls"):
-                for call in msg["tool_calls"]:
-                    args_str = str(call.function.arguments)
-                    total_tokens += len(self.enc.encode(args_str))
-        return total_tokens
-    
+        return self._total_tokens
+
+    def _attach_summary(self, content, tokens=None):
+        """Put the rolling summary at the head of history, replacing the previous one."""
+        self._detach_summary()
+        message = Message("system", content, tokens=tokens)
+        if tokens is None:
+            message.tokens = self._message_tokens(message)
+        self.chat_history.appendleft(message)
+        self._total_tokens += message.tokens
+        self._summary_message = message
+
+    def _detach_summary(self):
+        """Remove the summary message from the head. Returns its cached token count."""
+        if self._summary_message is None:
+            return None
+        tokens = self._pop_oldest().tokens
+        self._summary_message = None
+        return tokens
+
+    def _persist_summary(self):
+        if self.store is not None:
+            self.store.save_summary(self.session_id, self.summary, self._summary_message.tokens)
+
+    def apply_pending_summary(self):
+        """Swap in a summary finished by the background worker. Runs on the caller's thread."""
+        with self._lock:
+            if self._summary_ready:
+                self._summary_ready = False
+                self._attach_summary(self.summary)
+                self._persist_summary()
+
     def prune_memory(self):
         """Prune or summarize oldest messages until under token limit"""
-        if not self.chat_history:
+        self.apply_pending_summary()
+        target_tokens = int(self.token_limit * 0.75)
+        if self.token_count() <= target_tokens:
             return
 
-        memory_pruned = False
-        target_tokens = int(self.token_limit * 0.75)
-        pruned_messages = []
-
-        # Remove oldest messages until under target
-        while self.token_count() > target_tokens and self.chat_history:
-            removed = self.chat_history.pop(0)
-            log_debug(f"[X] Message pruned: {removed}")
-            pruned_messages.append(removed)
-            memory_pruned = True
-            # If we removed a tool call context, drop associated tool outputs too
-            if removed.get("role") == "assistant" and removed.get("tool_calls"):
-                while self.chat_history and self.chat_history[0].get("role") == "tool":
-                    removed_tool = self.chat_history.pop(0)
-                    log_debug(f"[X] Tool message pruned: {removed_tool}")
-                    pruned_messages.append(removed_tool)
-            # If we removed a tool message, drop any subsequent tool messages to avoid orphans
-            if removed.get("role") == "tool":
-                while self.chat_history and self.chat_history[0].get("role") == "tool":
-                    removed_tool = self.chat_history.pop(0)
-                    log_debug(f"[X] Tool message pruned: {removed_tool}")
-                    pruned_messages.append(removed_tool)
-
-        if memory_pruned and pruned_messages:
-            # Build content safely for summarization
-            content_to_summarize = []
-            for m in pruned_messages:
-                role = m.get("role", "unknown")
-                content = m.get("content") or ""
-                # If tool_calls exist, convert them to string
-                if m.get("tool_calls"):
-                    tool_info = " | ".join(
-                        f"{call.function.name}({call.function.arguments})" 
-                        for call in m["tool_calls"]
-                    )
-                    content += f" | ToolCalls: {tool_info}"
-                content_to_summarize.append(f"{role}: {content}")
-
-            summary_prompt = "Summarize the following conversation briefly, preserving context:\n" + "\n".join(content_to_summarize)
-
-            if self.client:
+        with span("prune_memory"):
+            # The summary stays at the head; only real messages are evicted and folded into it
+            summary_content = self._summary_message.content if self._summary_message else None
+            summary_tokens = self._detach_summary()
+            cut = self._prune_cut(target_tokens)
+
+            # Evict the whole head block at once, O(1) per message
+            pruned_messages = [self._pop_oldest() for _ in range(cut)]
+            if cut and self.store is not None:
+                self.store.delete_through(self.session_id, self._first_seq + cut - 1)
+            self._first_seq += cut
+            for removed in pruned_messages:
+                log_debug("[X] Message pruned: %s", removed)
+            if summary_content is not None:
+                self._attach_summary(summary_content, summary_tokens)
+
+            if not pruned_messages:
+                return
+            if self.long_term is not None:
+                self._index_turns(pruned_messages)
+
+            if not self.client:
+                log_debug("[!] OpenAI client not provided. Pruned messages are dropped.")
+            elif self.background_summary:
+                self._enqueue_for_summary(pruned_messages)
+            else:
+                summary_text = self._summarize(self.summary, pruned_messages)
+                if summary_text is not None:
+                    self.summary = f"\n{summary_text}"
+                    # Keep summary as a system message at the start
+                    self._attach_summary(self.summary)
+                    self._persist_summary()
+
+        log_debug("[X] Memory pruned. Current token count: %s, Total messages: %s", self.token_count(), len(self.chat_history))
+
+    @staticmethod
+    def _message_line(message):
+        content = message.content or ""
+        # If tool_calls exist, convert them to string
+        if message.tool_calls:
+            tool_info = " | ".join(f"{call.name}({call.arguments})" for call in message.tool_calls)
+            content += f" | ToolCalls: {tool_info}"
+        return f"{message.role}: {content}"
+
+    def _index_turns(self, pruned_messages):
+        """Store pruned messages in long-term memory, one entry per user turn."""
+        texts, tokens = [], []
+        for m in pruned_messages:
+            if m.role == "user" or not texts:
+                texts.append([])
+                tokens.append(0)
+            texts[-1].append(self._message_line(m))
+            tokens[-1] += m.tokens
+        with span("long_term_index"):
+            self.long_term.add(["\n".join(lines) for lines in texts], tokens)
+
+    def recall(self):
+        """
+        System message with the long-term turns most relevant to the latest user
+        message, or None. Repeated calls for the same message reuse the result.
+        """
+        if self.long_term is None or not len(self.long_term):
+            return None
+        query = next((m.content for m in reversed(self.chat_history) if m.role == "user"), None)
+        if not query:
+            return None
+        cached_query, cached_size, message = self._recalled
+        if cached_query == query and cached_size == len(self.long_term):
+            return message
+        with span("long_term_recall"):
+            turns = self.long_term.recall(query)
+        message = None
+        if turns:
+            message = Message("system", "Relevant earlier conversation:\n\n" + "\n\n".join(turns))
+        self._recalled = (query, len(self.long_term), message)
+        return message
+
+    def _summary_prompt(self, previous_summary, pruned_messages):
+        # Build content safely for summarization
+        content_to_summarize = [self._message_line(m) for m in pruned_messages]
+
+        if previous_summary.strip():
+            return (
+                "Update the summary of an ongoing conversation with the newer messages below. "
+                "Fold them into the existing summary briefly, preserving context:\n"
+                f"Existing summary:{previous_summary}\n"
+                "Newer messages:\n" + "\n".join(content_to_summarize)
+            )
+        return "Summarize the following conversation briefly, preserving context:\n" + "\n".join(content_to_summarize)
+
+    def _summarize(self, previous_summary, pruned_messages):
+        """Fold pruned messages into the previous summary. Returns None on failure."""
+        summary_prompt = self._summary_prompt(previous_summary, pruned_messages)
+        try:
+            with span("memory_summary"):
+                response = self.client.chat.completions.create(
+                    model=self.model,
+                    messages=[{"role": "user", "content": summary_prompt}],
+                    temperature=0.5
+                )
+            record_usage(response, "memory_summary")
+            summary_text = response.choices[0].message.content
+            log_debug("[X] Generated summary of pruned messages: %s", summary_text)
+            return summary_text
+        except Exception as e:
+            log_info("[!] Failed to summarize pruned messages: %s", e)
+            return None
+
+    # ------------------------
+    # Background summarization
+    # ------------------------
+    def _enqueue_for_summary(self, pruned_messages):
+        with self._pending_cond:
+            self._pending_batches += 1
+        if self._worker is None:
+            self._worker = threading.Thread(target=self._summary_worker, name="memory-summary", daemon=True)
+            self._worker.start()
+        self._queue.put(pruned_messages)
+
+    def _summary_worker(self):
+        while True:
+            batch = self._queue.get()
+            if batch is None:
+                return
+            batches = 1
+            # Fold everything evicted since the last run into a single LLM call
+            while True:
                 try:
-                    response = self.client.chat.completions.create(
-                        model=self.model,
-                        messages=[{"role": "user", "content": summary_prompt}],
-                        temperature=0.5
-                    )
-                    summary_text = response.choices[0].message.content
-                    log_debug(f"[X] Generated summary of pruned messages: {summary_text}")
+                    more = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if more is None:
+                    self._queue.put(None)
+                    break
+                batch = batch + more
+                batches += 1
+
+            summary_text = self._summarize(self.summary, batch)
+            with self._lock:
+                if summary_text is not None:
                     self.summary = f"\n{summary_text}"
+                    self._summary_ready = True
+            with self._pending_cond:
+                self._pending_batches -= batches
+                self._pending_cond.notify_all()
 
-                    # Keep summary as a system message at the start
-                    self.chat_history.insert(0, {"role": "system", "content": self.summary})
-                except Exception as e:
-                    log_info(f"[!] Failed to summarize pruned messages: {e}")
-            else:
-                log_debug("[!] OpenAI client not provided. Pruned messages are dropped.")
+    def summary_in_flight(self):
+        """True while pruned messages are still being summarized in the background."""
+        return self._pending_batches > 0
+
+    def flush(self, timeout=None):
+        """
+        Wait for pending background summaries and apply the result to history.
+        Returns False if the timeout expired first.
+        """
+        with self._pending_cond:
+            done = self._pending_cond.wait_for(lambda: self._pending_batches == 0, timeout)
+        self.apply_pending_summary()
+        return done
+
+    def close(self, timeout=None):
+        """Flush pending summaries and stop the background worker."""
+        done = self.flush(timeout)
+        if self._worker is not None:
+            self._queue.put(None)
+            self._worker.join(timeout)
+            self._worker = None
+        return done
 
-            log_debug(f"[X] Memory pruned. Current token count: {self.token_count()}, Total messages: {len(self.chat_history)}")
-        
     def get_history(self):
+        """Return the live history deque of Message records (not a copy)."""
+        self.apply_pending_summary()
         return self.chat_history
 
     def memory_size(self):
         """Approximate size of memory (number of messages or characters)."""
-        total_chars = sum(len(m["content"]) for m in self.chat_history)
+        total_chars = sum(len(m.content or "") for m in self.chat_history)
         return len(self.chat_history), total_chars
+
+
+class AsyncMemory(Memory):
+    """
+    Memory for an AsyncOpenAI client. Pruning evicts immediately and the summary
+    is produced by an asyncio task on the running loop, folded into the rolling
+    summary. Await aflush() before reading the final summary or shutting down.
+    """
+
+    def __init__(
+        self, model="gpt-4o-mini", token_limit=3000, client=None, store=None, session_id=None, long_term=None
+    ):
+        super().__init__(
+            model=model,
+            token_limit=token_limit,
+            client=client,
+            background_summary=True,
+            store=store,
+            session_id=session_id,
+            long_term=long_term,
+        )
+        self._pending_evictions = []
+        self._summary_task = None
+
+    def _enqueue_for_summary(self, pruned_messages):
+        self._pending_evictions.extend(pruned_messages)
+        if self._summary_task is None or self._summary_task.done():
+            self._summary_task = asyncio.get_running_loop().create_task(self._summary_loop())
+
+    async def _summary_loop(self):
+        # Whatever was evicted while a summary call was in flight is folded in by the next one
+        while self._pending_evictions:
+            batch, self._pending_evictions = self._pending_evictions, []
+            summary_text = await self._asummarize(self.summary, batch)
+            if summary_text is not None:
+                self.summary = f"\n{summary_text}"
+                self._summary_ready = True
+
+    async def _asummarize(self, previous_summary, pruned_messages):
+        summary_prompt = self._summary_prompt(previous_summary, pruned_messages)
+        try:
+            with span("memory_summary"):
+                response = await self.client.chat.completions.create(
+                    model=self.model,
+                    messages=[{"role": "user", "content": summary_prompt}],
+                    temperature=0.5
+                )
+            record_usage(response, "memory_summary")
+            summary_text = response.choices[0].message.content
+            log_debug("[X] Generated summary of pruned messages: %s", summary_text)
+            return summary_text
+        except Exception as e:
+            log_info("[!] Failed to summarize pruned messages: %s", e)
+            return None
+
+    def summary_in_flight(self):
+        return self._summary_task is not None and not self._summary_task.done()
+
+    async def aflush(self):
+        """Wait for pending summaries and apply the result to history."""
+        if self._summary_task is not None:
+            await self._summary_task
+        self.apply_pending_summary()
@@ -0,0 +1,79 @@
+from typing import NamedTuple
+
+
+class ToolCall(NamedTuple):
+    """A function call requested by the assistant, reduced to the three fields we send back."""
+
+    id: str
+    name: str
+    arguments: str
+
+    @classmethod
+    def from_any(cls, call):
+        """From an SDK tool-call object, an API-shaped dict or a ToolCall."""
+        if isinstance(call, cls):
+            return call
+        if isinstance(call, dict):
+            return cls(call["id"], call["function"]["name"], call["function"]["arguments"])
+        return cls(call.id, call.function.name, call.function.arguments)
+
+    def to_dict(self) -> dict:
+        return {"id": self.id, "type": "function", "function": {"name": self.name, "arguments": self.arguments}}
+
+
+class Message:
+    """
+    One history entry. Holds only what the API needs plus its cached token count,
+    so a session keeps no SDK objects alive. to_dict() gives the API shape and is
+    called when a request is built; m["role"] / m.get("tool_calls") read that
+    shape too.
+    """
+
+    __slots__ = ("role", "content", "tool_calls", "tool_call_id", "tokens")
+
+    def __init__(self, role, content=None, tool_calls=(), tool_call_id=None, tokens=None):
+        self.role = role
+        self.content = content
+        self.tool_calls = tool_calls  # Tuple of ToolCall
+        self.tool_call_id = tool_call_id
+        self.tokens = tokens
+
+    @classmethod
+    def from_dict(cls, message, tokens=None):
+        """From an API-shaped dict, whose tool calls may still be SDK objects. Messages pass through."""
+        if isinstance(message, cls):
+            return message
+        tool_calls = message.get("tool_calls")
+        return cls(
+            message["role"],
+            message.get("content"),
+            tuple(ToolCall.from_any(call) for call in tool_calls) if tool_calls else (),
+            message.get("tool_call_id"),
+            tokens,
+        )
+
+    def to_dict(self) -> dict:
+        data = {"role": self.role, "content": self.content}
+        if self.tool_calls:
+            data["tool_calls"] = [call.to_dict() for call in self.tool_calls]
+        if self.tool_call_id is not None:
+            data["tool_call_id"] = self.tool_call_id
+        return data
+
+    def get(self, key, default=None):
+        return self.to_dict().get(key, default)
+
+    def __getitem__(self, key):
+        return self.to_dict()[key]
+
+    def __eq__(self, other):
+        if isinstance(other, Message):
+            other = other.to_dict()
+        if isinstance(other, dict):
+            return self.to_dict() == other
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f"Message({self.to_dict()!r})"
@@ -0,0 +1,85 @@
+import json
+import sqlite3
+import threading
+import time
+
+from memory.message import Message
+
+
+def message_to_record(message) -> dict:
+    """JSON-safe API-shaped dict of a history message (a Message, or a dict whose tool calls may be SDK objects)."""
+    return Message.from_dict(message).to_dict()
+
+
+class SQLiteSessionStore:
+    """
+    Persists conversation memory in SQLite so sessions survive restarts and idle
+    ones can be dropped from RAM. Every change is a small incremental write: one
+    INSERT per appended message, one ranged DELETE per eviction, one UPSERT per
+    summary update. Token counts are stored alongside, so reloading a session
+    doesn't re-tokenize it.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=5, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            "session_id TEXT PRIMARY KEY, summary TEXT NOT NULL DEFAULT '', "
+            "summary_tokens INTEGER NOT NULL DEFAULT 0, updated_at REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS messages ("
+            "session_id TEXT NOT NULL, seq INTEGER NOT NULL, message TEXT NOT NULL, "
+            "tokens INTEGER NOT NULL, PRIMARY KEY (session_id, seq))"
+        )
+
+    def append(self, session_id: str, seq: int, message: dict, tokens: int):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO messages (session_id, seq, message, tokens) VALUES (?, ?, ?, ?)",
+                (session_id, seq, json.dumps(message_to_record(message)), tokens),
+            )
+
+    def delete_through(self, session_id: str, seq: int):
+        """Drop messages up to and including seq (evicted from the head of history)."""
+        with self._lock:
+            self._conn.execute("DELETE FROM messages WHERE session_id = ? AND seq <= ?", (session_id, seq))
+
+    def save_summary(self, session_id: str, summary: str, tokens: int):
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO sessions (session_id, summary, summary_tokens, updated_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(session_id) DO UPDATE SET summary = excluded.summary, "
+                "summary_tokens = excluded.summary_tokens, updated_at = excluded.updated_at",
+                (session_id, summary, tokens, time.time()),
+            )
+
+    def load(self, session_id: str):
+        """
+        Return (summary, summary_tokens, [(seq, message, tokens), ...]) in history order.
+        A session that was never stored loads as empty.
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT summary, summary_tokens FROM sessions WHERE session_id = ?", (session_id,)
+            ).fetchone()
+            rows = self._conn.execute(
+                "SELECT seq, message, tokens FROM messages WHERE session_id = ? ORDER BY seq", (session_id,)
+            ).fetchall()
+        summary, summary_tokens = row if row else ("", 0)
+        return summary, summary_tokens, [(seq, json.loads(message), tokens) for seq, message, tokens in rows]
+
+    def delete(self, session_id: str) -> bool:
+        """Remove a session's history; False if nothing was stored for it."""
+        with self._lock:
+            messages = self._conn.execute("DELETE FROM messages WHERE session_id = ?", (session_id,)).rowcount
+            sessions = self._conn.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,)).rowcount
+        return messages + sessions > 0
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
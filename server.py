@@ -0,0 +1,368 @@
+"""
+Multi-session HTTP serving mode: many conversations on one event loop, sharing
+one AsyncOpenAI client and one tool stack, each with its own lazily created Memory
+(optionally persisted to SQLite with SESSION_STORE_PATH).
+
+Run with a local ASGI server, e.g.:
+    uvicorn --factory server:create_app --port 8000
+
+Routes:
+    POST   /sessions/{session_id}/messages   {"input": "...", "stream": false}
+    DELETE /sessions/{session_id}
+    GET    /health
+    GET    /metrics                           Prometheus text (stage latencies with AGENT_TRACING=1)
+"""
+import asyncio
+import json
+import os
+import time
+from collections import OrderedDict
+
+from agents.calculator_agent import CalculatorAgent
+from agents.orchestrator import AsyncOrchestratorAgent
+from agents.search_agent import SearchAgent
+from agents.search_cache import SearchCache
+from memory.memory import AsyncMemory
+from memory.session_store import SQLiteSessionStore
+from utils import single_flight, tracing
+from utils.llm_scheduler import AsyncLLMScheduler, scheduler_from_env
+from utils.logger import configure_logging_from_env, log_info, log_error
+
+
+class SessionBusyError(RuntimeError):
+    """The session has a turn or a background summary in progress."""
+
+
+class Session:
+    __slots__ = ("session_id", "memory", "agent", "lock", "last_used")
+
+    def __init__(self, session_id, memory, agent, now):
+        self.session_id = session_id
+        self.memory = memory
+        self.agent = agent
+        self.lock = asyncio.Lock()  # One turn at a time per conversation
+        self.last_used = now
+
+
+class SessionManager:
+    """
+    Creates a Memory + orchestrator per session on first use and evicts sessions
+    that sat idle longer than idle_timeout, or the least recently used ones once
+    there are more than max_sessions. Sessions with a turn or a background summary
+    in progress are never evicted.
+    """
+
+    def __init__(
+        self,
+        client,
+        model: str = "gpt-4o-mini",
+        token_limit: int = 3000,
+        idle_timeout: float = 900,
+        max_sessions: int = 1000,
+        agent_options: dict | None = None,
+        store=None,
+        clock=time.monotonic,
+        summary_client=None,
+    ):
+        """
+        agent_options: extra OrchestratorAgent kwargs shared by every session
+                       (calculator, search, search_cache, ...)
+        summary_client: client for memory summaries, e.g. a background-priority
+                        scheduler facade; defaults to client
+        store: optional SQLiteSessionStore. Sessions are then persisted as they
+               change, loaded on first access and safe to evict from RAM.
+        """
+        self.client = client
+        self.model = model
+        self.token_limit = token_limit
+        self.idle_timeout = idle_timeout
+        self.max_sessions = max_sessions
+        self.agent_options = agent_options or {}
+        self.store = store
+        self.clock = clock
+        self.summary_client = summary_client or client
+        self.sessions = OrderedDict()  # session_id -> Session, least recently used first
+        self.created = 0
+        self.evicted = 0
+
+    def get(self, session_id: str) -> Session:
+        now = self.clock()
+        session = self.sessions.get(session_id)
+        if session is None:
+            session = self._create(session_id, now)
+            self.sessions[session_id] = session
+        else:
+            self.sessions.move_to_end(session_id)
+        session.last_used = now
+        self.evict(now)
+        return session
+
+    def _create(self, session_id: str, now: float) -> Session:
+        memory = AsyncMemory(
+            model=self.model,
+            token_limit=self.token_limit,
+            client=self.summary_client,
+            store=self.store,
+            session_id=session_id,
+        )
+        agent = AsyncOrchestratorAgent(client=self.client, memory=memory, model=self.model, **self.agent_options)
+        self.created += 1
+        log_info("[server] Session created: %s", session_id)
+        return Session(session_id, memory, agent, now)
+
+    def evict(self, now: float | None = None):
+        """Drop idle sessions, then LRU sessions beyond max_sessions."""
+        now = self.clock() if now is None else now
+        # Iteration order is last-use order, so idle sessions sit at the front
+        for session_id, session in list(self.sessions.items()):
+            over_cap = len(self.sessions) > self.max_sessions
+            idle = now - session.last_used > self.idle_timeout
+            if not (over_cap or idle):
+                break
+            if session.lock.locked() or session.memory.summary_in_flight():
+                continue
+            # Persist a summary that finished but was not yet swapped in
+            session.memory.apply_pending_summary()
+            del self.sessions[session_id]
+            self.evicted += 1
+            log_info("[server] Session evicted: %s", session_id)
+
+    def drop(self, session_id: str) -> bool:
+        """
+        Forget a session, including its persisted history. Returns whether it
+        existed. Raises SessionBusyError rather than delete rows that a turn or
+        summary in progress would go on writing to.
+        """
+        session = self.sessions.get(session_id)
+        if session is not None and (session.lock.locked() or session.memory.summary_in_flight()):
+            raise SessionBusyError(f"Session {session_id} is busy")
+        found = self.sessions.pop(session_id, None) is not None
+        if self.store is not None:
+            found = self.store.delete(session_id) or found
+        return found
+
+    def __len__(self):
+        return len(self.sessions)
+
+
+class AgentServer:
+    """
+    ASGI app. Turns beyond max_inflight are refused with 503 and Retry-After
+    instead of queuing without bound; request bodies over max_body bytes with 413.
+    """
+
+    def __init__(self, sessions: SessionManager, max_inflight: int = 64, max_body: int = 1 << 20):
+        self.sessions = sessions
+        self.max_inflight = max_inflight
+        self.max_body = max_body
+        self.inflight = 0
+        self.rejected = 0
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+            return
+        if scope["type"] != "http":
+            return
+
+        method = scope["method"]
+        parts = [p for p in scope["path"].split("/") if p]
+
+        if method == "GET" and parts == ["health"]:
+            await self._send_json(send, 200, {
+                "status": "ok",
+                "sessions": len(self.sessions),
+                "inflight": self.inflight,
+                "rejected": self.rejected,
+                "coalesced": single_flight.stats(),
+            })
+        elif method == "GET" and parts == ["metrics"]:
+            tracing.METRICS.set_gauge("agent_sessions", len(self.sessions))
+            tracing.METRICS.set_gauge("agent_inflight_turns", self.inflight)
+            tracing.METRICS.set_gauge("agent_rejected_turns", self.rejected)
+            await self._send_text(send, 200, tracing.prometheus_text())
+        elif len(parts) == 3 and parts[0] == "sessions" and parts[2] == "messages" and method == "POST":
+            await self._handle_message(parts[1], receive, send)
+        elif len(parts) == 2 and parts[0] == "sessions" and method == "DELETE":
+            try:
+                found = self.sessions.drop(parts[1])
+            except SessionBusyError:
+                await self._send_json(send, 409, {"error": "Session has a turn in progress, retry shortly"})
+                return
+            await self._send_json(send, 200 if found else 404, {"deleted": found})
+        else:
+            await self._send_json(send, 404, {"error": "Not found"})
+
+    async def _handle_message(self, session_id, receive, send):
+        raw = await self._read_body(receive, self.max_body)
+        if raw is None:
+            await self._send_json(send, 413, {"error": f"Request body over {self.max_body} bytes"})
+            return
+        try:
+            body = json.loads(raw or b"{}")
+            user_input = body["input"]
+            if not isinstance(user_input, str) or not user_input.strip():
+                raise ValueError
+        except Exception:
+            await self._send_json(send, 400, {"error": 'Expected a JSON body like {"input": "..."}'})
+            return
+
+        if self.inflight >= self.max_inflight:
+            self.rejected += 1
+            await self._send_json(send, 503, {"error": "Server busy, retry shortly"}, [(b"retry-after", b"1")])
+            return
+
+        started = False
+
+        async def tracked_send(message):
+            nonlocal started
+            started = started or message["type"] == "http.response.start"
+            await send(message)
+
+        self.inflight += 1
+        try:
+            session = self.sessions.get(session_id)
+            async with session.lock:
+                if body.get("stream"):
+                    await self._stream_reply(session, user_input, tracked_send)
+                else:
+                    reply = await session.agent.ask(user_input)
+                    await self._send_json(tracked_send, 200, {"session_id": session_id, "reply": reply})
+        except Exception as e:
+            log_error("[server] Error in session %s: %s", session_id, e)
+            if not started:
+                await self._send_json(send, 500, {"error": "Internal error"})
+            else:
+                # The status line is already out; end the stream with an error event instead
+                line = json.dumps({"type": "error", "error": "Internal error"}).encode() + b"\n"
+                await send({"type": "http.response.body", "body": line, "more_body": False})
+        finally:
+            self.inflight -= 1
+
+    async def _stream_reply(self, session, user_input, send):
+        """Newline-delimited JSON, one ask_stream() chunk per line."""
+        await send({
+            "type": "http.response.start",
+            "status": 200,
+            "headers": [(b"content-type", b"application/x-ndjson")],
+        })
+        async for chunk in session.agent.ask_stream(user_input):
+            line = json.dumps(chunk).encode() + b"\n"
+            await send({"type": "http.response.body", "body": line, "more_body": True})
+        await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+    @staticmethod
+    async def _read_body(receive, limit: int) -> bytes | None:
+        """The request body, or None as soon as it grows past limit bytes."""
+        body = bytearray()
+        while True:
+            message = await receive()
+            body += message.get("body", b"")
+            if len(body) > limit:
+                return None
+            if not message.get("more_body"):
+                return bytes(body)
+
+    @staticmethod
+    async def _send_json(send, status, payload, headers=None):
+        body = json.dumps(payload).encode()
+        await send({
+            "type": "http.response.start",
+            "status": status,
+            "headers": [(b"content-type", b"application/json"), *(headers or [])],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+    @staticmethod
+    async def _send_text(send, status, text):
+        await send({
+            "type": "http.response.start",
+            "status": status,
+            "headers": [(b"content-type", b"text/plain; version=0.0.4")],
+        })
+        await send({"type": "http.response.body", "body": text.encode()})
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                # Let in-flight pruning summaries land before the loop goes away
+                for session in list(self.sessions.sessions.values()):
+                    await session.memory.aflush()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+
+def default_clients():
+    """
+    (client, summary_client) built from the environment: one AsyncOpenAI client
+    behind an AsyncLLMScheduler, with memory summaries at background priority.
+    Also configures the agent's logging.
+    """
+    from dotenv import load_dotenv
+    from openai import AsyncOpenAI
+
+    load_dotenv()
+    configure_logging_from_env()
+    scheduler = scheduler_from_env(AsyncOpenAI(max_retries=0), scheduler_cls=AsyncLLMScheduler)
+    return scheduler.client_for("interactive"), scheduler.client_for("background")
+
+
+def default_agent_options(**agent_options) -> dict:
+    """Fill in the calculator, search agent and search cache every session shares."""
+    serpapi_key = os.getenv("SERPAPI_API_KEY", "")
+    agent_options.setdefault("calculator", CalculatorAgent())
+    agent_options.setdefault(
+        "search",
+        SearchAgent(api_key=serpapi_key, provider="serpapi" if serpapi_key else "mock"),
+    )
+    agent_options.setdefault("search_cache", SearchCache(persist_path=os.getenv("SEARCH_CACHE_PATH")))
+    return agent_options
+
+
+def create_app(
+    client=None,
+    model: str = "gpt-4o-mini",
+    token_limit: int = 3000,
+    idle_timeout: float = 900,
+    max_sessions: int = 1000,
+    max_inflight: int = 64,
+    max_body: int = 1 << 20,
+    store=None,
+    **agent_options,
+) -> AgentServer:
+    """
+    Build the ASGI app. Without a client, an AsyncOpenAI client and the agent's
+    logging (AGENT_LOG_DIR, AGENT_LOG_LEVEL) are configured from the environment;
+    all sessions then share one AsyncLLMScheduler (LLM_RPM, LLM_TPM,
+    LLM_MAX_CONCURRENCY) with memory summaries at background priority.
+    The calculator, search agent and search cache are built once and shared by
+    every session unless passed in agent_options.
+    Sessions are persisted in SESSION_STORE_PATH when no store is given and it is set.
+    AGENT_TRACING=1 turns on per-stage latency tracing for /metrics.
+    """
+    if os.getenv("AGENT_TRACING") == "1":
+        tracing.enable()
+
+    summary_client = None
+    if client is None:
+        client, summary_client = default_clients()
+    agent_options = default_agent_options(**agent_options)
+
+    store_path = os.getenv("SESSION_STORE_PATH")
+    if store is None and store_path:
+        store = SQLiteSessionStore(store_path)
+
+    sessions = SessionManager(
+        client,
+        model=model,
+        token_limit=token_limit,
+        idle_timeout=idle_timeout,
+        max_sessions=max_sessions,
+        agent_options=agent_options,
+        store=store,
+        summary_client=summary_client,
+    )
+    return AgentServer(sessions, max_inflight=max_inflight, max_body=max_body)
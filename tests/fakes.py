@@ -0,0 +1,223 @@
+import asyncio
+import json
+import threading
+import time
+
+from memory.message import Message
+
+
+class MemoryStub:
+    def __init__(self):
+        self.chat_history = []
+
+    def add_message(self, role, content):
+        self.chat_history.append(Message(role, content))
+
+    def append(self, message):
+        self.chat_history.append(Message.from_dict(message))
+
+    def get_history(self):
+        return self.chat_history
+
+    def recall(self):
+        return None
+
+
+class FakeFunction:
+    def __init__(self, name, arguments):
+        self.name = name
+        self.arguments = arguments
+
+
+class FakeToolCall:
+    def __init__(self, tool_id, function):
+        self.id = tool_id
+        self.function = function
+
+
+class FakeMessage:
+    def __init__(self, content=None, tool_calls=None):
+        self.content = content
+        self.tool_calls = tool_calls or []
+
+
+class FakeChoice:
+    def __init__(self, message):
+        self.message = message
+
+
+class FakeResponse:
+    def __init__(self, message):
+        self.choices = [FakeChoice(message)]
+
+
+class FakeDelta:
+    def __init__(self, content):
+        self.content = content
+
+
+class FakeStreamChoice:
+    def __init__(self, content):
+        self.delta = FakeDelta(content)
+
+
+class FakeChunk:
+    def __init__(self, content):
+        self.choices = [FakeStreamChoice(content)]
+
+
+def stream_chunks(response):
+    # Split a completed response into word-sized stream chunks, like stream=True does
+    words = (response.choices[0].message.content or "").split(" ")
+    return [FakeChunk(word if i == 0 else " " + word) for i, word in enumerate(words)]
+
+
+class FakeChatCompletions:
+    def __init__(self, parent):
+        self.parent = parent
+
+    def create(self, model, messages, tools=None, tool_choice=None, stream=False, **kwargs):
+        if self.parent.latency:
+            time.sleep(self.parent.latency)
+        response = self._respond(model, messages, tools, tool_choice, **kwargs)
+        return iter(stream_chunks(response)) if stream else response
+
+    def _respond(self, model, messages, tools=None, tool_choice=None, **_kwargs):
+        self.parent.calls += 1
+        if tools and tool_choice == "required":
+            user_text = ""
+            for msg in reversed(messages):
+                if msg.get("role") == "user":
+                    user_text = msg.get("content") or ""
+                    break
+
+            if any(ch.isdigit() for ch in user_text) or any(op in user_text for op in "+-*/"):
+                name = "calculator"
+                args = {"expression": user_text}
+            else:
+                name = "search"
+                args = {"query": user_text}
+
+            self.parent.last_tool_name = name
+            tool_call = FakeToolCall("tool_1", FakeFunction(name, json.dumps(args)))
+            return FakeResponse(FakeMessage(content=None, tool_calls=[tool_call]))
+
+        # Summarization call or no-tools response
+        user_prompt = messages[-1]["content"] if messages else ""
+        lines = [line.strip() for line in user_prompt.splitlines()]
+        items = [line[2:] for line in lines if line.startswith("- ")]
+        summary = items[0] if items else ""
+        if self.parent.reply_words:
+            # Pad to a fixed size to simulate longer completions
+            words = summary.split()
+            summary = " ".join(words + ["lorem"] * max(0, self.parent.reply_words - len(words)))
+        return FakeResponse(FakeMessage(content=summary, tool_calls=[]))
+
+
+class FakeClient:
+    # latency: seconds each create() takes; reply_words: pad text replies to this many words
+    def __init__(self, latency=0.0, reply_words=0):
+        self.last_tool_name = None
+        self.calls = 0
+        self.latency = latency
+        self.reply_words = reply_words
+        self.chat = type("Chat", (), {})()
+        self.chat.completions = FakeChatCompletions(self)
+
+
+class AsyncFakeStream:
+    def __init__(self, chunks):
+        self.chunks = iter(chunks)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        try:
+            return next(self.chunks)
+        except StopIteration:
+            raise StopAsyncIteration
+
+
+class AsyncFakeChatCompletions(FakeChatCompletions):
+    async def create(self, model, messages, tools=None, tool_choice=None, stream=False, **kwargs):
+        if self.parent.latency:
+            await asyncio.sleep(self.parent.latency)
+        response = self._respond(model, messages, tools, tool_choice, **kwargs)
+        return AsyncFakeStream(stream_chunks(response)) if stream else response
+
+
+class AsyncFakeClient(FakeClient):
+    # Same routing and summaries as FakeClient, awaited like AsyncOpenAI.
+    def __init__(self, latency=0.0, reply_words=0):
+        super().__init__(latency=latency, reply_words=reply_words)
+        self.chat.completions = AsyncFakeChatCompletions(self)
+
+
+class FakeRateLimitError(Exception):
+    # Shaped like openai.RateLimitError: status_code plus a response with headers
+    def __init__(self, retry_after=None):
+        super().__init__("Error code: 429 - rate limit exceeded")
+        self.status_code = 429
+        headers = {"retry-after": str(retry_after)} if retry_after is not None else {}
+        self.response = type("Response", (), {"headers": headers})()
+
+
+class ThrottledChatCompletions(FakeChatCompletions):
+    def create(self, **kwargs):
+        parent = self.parent
+        with parent.lock:
+            parent.active += 1
+            parent.max_active = max(parent.max_active, parent.active)
+            parent.order.append(kwargs["messages"][-1]["content"])
+            throttle = parent.throttle > 0
+            if throttle:
+                parent.throttle -= 1
+        try:
+            if parent.latency:
+                time.sleep(parent.latency)
+            if throttle:
+                raise FakeRateLimitError(parent.retry_after)
+            return self._respond(**kwargs)
+        finally:
+            with parent.lock:
+                parent.active -= 1
+
+
+class ThrottledFakeClient(FakeClient):
+    # Answers like FakeClient after raising 429 for the first `throttle` requests.
+    # Tracks peak concurrency and the order requests arrived in.
+    def __init__(self, throttle=0, retry_after=None, latency=0.0):
+        super().__init__(latency=latency)
+        self.throttle = throttle
+        self.retry_after = retry_after
+        self.lock = threading.Lock()
+        self.active = 0
+        self.max_active = 0
+        self.order = []
+        self.chat.completions = ThrottledChatCompletions(self)
+
+
+class AsyncThrottledChatCompletions(ThrottledChatCompletions):
+    async def create(self, **kwargs):
+        parent = self.parent
+        parent.active += 1
+        parent.max_active = max(parent.max_active, parent.active)
+        parent.order.append(kwargs["messages"][-1]["content"])
+        throttle = parent.throttle > 0
+        if throttle:
+            parent.throttle -= 1
+        try:
+            if parent.latency:
+                await asyncio.sleep(parent.latency)
+            if throttle:
+                raise FakeRateLimitError(parent.retry_after)
+            return self._respond(**kwargs)
+        finally:
+            parent.active -= 1
+
+
+class AsyncThrottledFakeClient(ThrottledFakeClient):
+    def __init__(self, throttle=0, retry_after=None, latency=0.0):
+        super().__init__(throttle=throttle, retry_after=retry_after, latency=latency)
+        self.chat.completions = AsyncThrottledChatCompletions(self)
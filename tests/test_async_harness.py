@@ -0,0 +1,58 @@
+import asyncio
+import time
+import unittest
+from unittest import mock
+
+from agents.orchestrator import AsyncOrchestratorAgent
+from memory.memory import AsyncMemory
+from tests.fakes import AsyncFakeClient, MemoryStub
+from tests.test_memory import FakeEncoder
+
+
+class AsyncOrchestratorHarnessTests(unittest.IsolatedAsyncioTestCase):
+    # Async twin of the offline harness: same routing checks against AsyncFakeClient,
+    # plus many conversations sharing one client on one event loop.
+    async def test_calculator_path(self):
+        client = AsyncFakeClient()
+        agent = AsyncOrchestratorAgent(client=client, memory=MemoryStub(), fast_path=False)
+        reply = await agent.ask("1+1")
+        self.assertEqual(client.last_tool_name, "calculator")
+        self.assertEqual(reply, "Result: 2")
+
+    async def test_search_path(self):
+        client = AsyncFakeClient()
+        agent = AsyncOrchestratorAgent(client=client, memory=MemoryStub())
+        reply = await agent.ask("Capital of France?")
+        self.assertEqual(client.last_tool_name, "search")
+        self.assertEqual(reply, "Bathinda is the capital of France.")
+
+    async def test_concurrent_sessions_share_one_client(self):
+        client = AsyncFakeClient(latency=0.05)
+        agents = [
+            AsyncOrchestratorAgent(client=client, memory=MemoryStub(), fast_path=False)
+            for _ in range(200)
+        ]
+
+        start = time.perf_counter()
+        replies = await asyncio.gather(*(agent.ask(f"{i}+1") for i, agent in enumerate(agents)))
+        elapsed = time.perf_counter() - start
+
+        self.assertEqual(replies, [f"Result: {i + 1}" for i in range(200)])
+        # Two LLM round-trips per turn; run serially this would take 20 seconds
+        self.assertLess(elapsed, 5)
+
+
+class AsyncMemoryTests(unittest.IsolatedAsyncioTestCase):
+    async def test_summary_runs_as_task_and_is_applied_on_flush(self):
+        with mock.patch("memory.memory.get_encoder", return_value=FakeEncoder()):
+            memory = AsyncMemory(token_limit=8, client=AsyncFakeClient())
+            for i in range(3):
+                memory.add_message("user", f"message number {i}")
+        self.assertLessEqual(memory.token_count(), 6)
+
+        await memory.aflush()
+        self.assertEqual(memory.chat_history[0]["role"], "system")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,147 @@
+import asyncio
+import io
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import batch
+from server import SessionManager
+from tests.fakes import AsyncFakeClient
+from tests.test_memory import FakeEncoder
+
+
+class BatchTests(unittest.TestCase):
+    def setUp(self):
+        patcher = mock.patch("memory.memory.get_encoder", return_value=FakeEncoder())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.input_path = os.path.join(tmp.name, "inputs.jsonl")
+        self.output_path = os.path.join(tmp.name, "results.jsonl")
+
+    def write_inputs(self, items):
+        with open(self.input_path, "w") as f:
+            for item in items:
+                f.write((item if isinstance(item, str) and item.startswith("{") else json.dumps(item)) + "\n")
+
+    def read_results(self):
+        with open(self.output_path) as f:
+            return [json.loads(line) for line in f if line.strip()]
+
+    def run_batch(self, client=None, concurrency=4, resume=True):
+        client = client or AsyncFakeClient()
+        self.sessions = SessionManager(
+            client, idle_timeout=float("inf"), max_sessions=10 ** 6, agent_options={"fast_path": False}
+        )
+        return asyncio.run(
+            batch.run_batch(self.input_path, self.output_path, self.sessions, concurrency=concurrency, resume=resume)
+        )
+
+    def test_answers_every_line(self):
+        self.write_inputs(["1+1", {"id": "paris", "input": "Capital of France?"}, "{not json"])
+        summary = self.run_batch()
+
+        results = {r["id"]: r for r in self.read_results()}
+        self.assertEqual(results[1]["reply"], "Result: 2")
+        self.assertEqual(results["paris"]["status"], "ok")
+        self.assertEqual(results[3]["status"], "error")
+        self.assertEqual((summary["succeeded"], summary["failed"]), (2, 1))
+        self.assertIsNotNone(summary["p95_ms"])
+        # Independent inputs don't keep a session around
+        self.assertEqual(len(self.sessions), 0)
+
+    def test_concurrency_is_bounded_and_used(self):
+        self.write_inputs([f"{i}+1" for i in range(20)])
+        client = AsyncFakeClient(latency=0.05)
+        peak = 0
+        create = client.chat.completions.create
+
+        async def tracked(**kwargs):
+            nonlocal peak
+            tracked.active += 1
+            peak = max(peak, tracked.active)
+            try:
+                return await create(**kwargs)
+            finally:
+                tracked.active -= 1
+
+        tracked.active = 0
+        client.chat.completions.create = tracked
+        summary = self.run_batch(client, concurrency=5)
+        self.assertEqual(summary["succeeded"], 20)
+        self.assertEqual(peak, 5)
+
+    def test_resume_skips_answered_inputs(self):
+        self.write_inputs([f"{i}+1" for i in range(6)])
+        with open(self.output_path, "w") as f:
+            f.write(json.dumps({"id": 1, "status": "ok", "reply": "Result: 1"}) + "\n")
+            f.write(json.dumps({"id": 2, "status": "error", "error": "boom"}) + "\n")
+            f.write('{"id": 3, "stat')  # Cut short by a crash
+
+        summary = self.run_batch()
+        self.assertEqual((summary["skipped"], summary["succeeded"]), (1, 5))
+        with open(self.output_path) as f:
+            lines = f.read().splitlines()
+        ok_ids = {json.loads(line)["id"] for line in lines[3:]}
+        self.assertEqual(ok_ids, {2, 3, 4, 5, 6})
+
+    def recording_client(self):
+        # Each request's user turns, keyed by the turn being answered
+        client = AsyncFakeClient()
+        client.requests = {}
+        create = client.chat.completions.create
+
+        async def recorded(**kwargs):
+            user_turns = [m["content"] for m in kwargs["messages"] if m["role"] == "user"]
+            client.requests.setdefault(user_turns[-1], user_turns)
+            return await create(**kwargs)
+
+        client.chat.completions.create = recorded
+        return client
+
+    def test_conversation_lines_share_memory_in_order(self):
+        self.write_inputs([
+            {"input": "1+1", "conversation": "a"},
+            {"input": "Capital of France?", "conversation": "b"},
+            {"input": "2+2", "conversation": "a"},
+        ])
+        client = self.recording_client()
+        self.run_batch(client, concurrency=3)
+        self.assertEqual(client.requests["2+2"], ["1+1", "2+2"])
+        # Each conversation is released after its last line
+        self.assertEqual(len(self.sessions), 0)
+
+    def test_resume_replays_answered_turns_of_unfinished_conversations(self):
+        self.write_inputs([
+            {"id": 1, "input": "1+1", "conversation": "a"},
+            {"id": 2, "input": "Capital of France?", "conversation": "b"},
+            {"id": 3, "input": "2+2", "conversation": "a"},
+        ])
+        with open(self.output_path, "w") as f:
+            for item_id, text, conversation, reply in [(1, "1+1", "a", "Result: 2"), (2, "x", "b", "Paris")]:
+                record = {"id": item_id, "input": text, "conversation": conversation, "reply": reply, "status": "ok"}
+                f.write(json.dumps(record) + "\n")
+
+        client = self.recording_client()
+        summary = self.run_batch(client)
+        self.assertEqual((summary["skipped"], summary["succeeded"]), (2, 1))
+        self.assertEqual(client.requests["2+2"], ["1+1", "2+2"])
+        self.assertEqual(self.sessions.created, 1)  # Finished conversation "b" is not rebuilt
+        self.assertEqual(len(self.sessions), 0)
+
+    def test_main_prints_summary(self):
+        self.write_inputs(["1+1"])
+        out = io.StringIO()
+        with mock.patch("sys.stdout", out):
+            code = batch.main(
+                ["--batch", self.input_path, "--output", self.output_path], client=AsyncFakeClient()
+            )
+        self.assertEqual(code, 0)
+        self.assertIn("Processed 1 (1 ok, 0 failed, 0 skipped)", out.getvalue())
+
+
+if __name__ == "__main__":
+    unittest.main()
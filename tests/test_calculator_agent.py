@@ -0,0 +1,146 @@
+import ast
+import json
+import time
+import unittest
+import warnings
+
+from agents.calculator_agent import CalculatorAgent, EvaluationPool
+from agents.orchestrator import OrchestratorAgent
+from tests.fakes import MemoryStub
+
+
+def cost(calculator, expression):
+    return calculator.estimate_cost(ast.parse(expression, mode="eval"))
+
+
+class CostEstimateTests(unittest.TestCase):
+    def test_grows_with_exponent_and_operand_size(self):
+        calculator = CalculatorAgent()
+        self.assertLess(cost(calculator, "2 + 3 * 4"), 10)
+        self.assertLess(cost(calculator, "3**1000"), cost(calculator, "3**100000"))
+        self.assertLess(cost(calculator, "3**100000"), cost(calculator, "123456789**100000"))
+        self.assertEqual(cost(calculator, "9**9**9**9"), float("inf"))
+
+    def test_float_arithmetic_is_cheap(self):
+        calculator = CalculatorAgent()
+        self.assertLess(cost(calculator, "2.5**1000000"), 10)
+        self.assertLess(cost(calculator, "1e300 / 7"), 10)
+
+    def test_tree_limits(self):
+        calculator = CalculatorAgent(max_nodes=50, max_depth=5)
+        with self.assertRaisesRegex(ValueError, "too long"):
+            cost(calculator, "+".join(["1"] * 30))
+        with self.assertRaisesRegex(ValueError, "nested too deeply"):
+            cost(calculator, "((((((1+1)+1)+1)+1)+1)+1)")
+
+
+class CalculatorGuardTests(unittest.TestCase):
+    def setUp(self):
+        self.calculator = CalculatorAgent(timeout=5)
+        self.addCleanup(self.calculator.close)
+
+    def test_cheap_expressions_run_inline(self):
+        self.assertEqual(self.calculator.run("2 + 3 * 4"), "Result: 14")
+        self.assertIsNone(self.calculator._pool)
+
+    def test_over_budget_is_refused_without_evaluating(self):
+        start = time.perf_counter()
+        output = self.calculator.run("9**9**9")
+        self.assertLess(time.perf_counter() - start, 0.1)
+        self.assertIn("too expensive", output)
+        self.assertIsNone(self.calculator._pool)
+
+    def test_expensive_expressions_run_in_a_worker(self):
+        self.assertEqual(self.calculator.run("(3**200000) % 7"), f"Result: {pow(3, 200000, 7)}")
+        self.assertIsNotNone(self.calculator._pool)
+        self.assertEqual(self.calculator.run("(7**200000) % 10"), f"Result: {pow(7, 200000, 10)}")
+        self.assertEqual(len(self.calculator._pool._idle), 1)  # The worker is reused
+
+    def test_worker_errors_are_reported(self):
+        self.assertEqual(self.calculator.run("(3**200000) % 0"), "Calculator error: integer modulo by zero")
+
+    def test_expensive_expressions_skip_the_fast_path(self):
+        self.assertTrue(self.calculator.can_evaluate("2**10"))
+        self.assertFalse(self.calculator.can_evaluate("(3**200000) % 7"))
+        self.assertFalse(self.calculator.can_evaluate("9**9**9"))
+
+
+class CompileCacheTests(unittest.TestCase):
+    def test_compiled_once_and_reused(self):
+        calculator = CalculatorAgent()
+        self.assertEqual(calculator.run("2 * (3 + 4)"), "Result: 14")
+        self.assertEqual(calculator.run("2 * (3 + 4)"), "Result: 14")
+        self.assertTrue(calculator.can_evaluate("2 * (3 + 4)"))
+        self.assertEqual((calculator.cache_misses, calculator.cache_hits), (1, 2))
+
+    def test_least_recently_used_is_evicted(self):
+        calculator = CalculatorAgent(cache_size=2)
+        for expression in ["1+1", "2+2", "1+1", "3+3"]:
+            calculator.compile(expression)
+        self.assertEqual(list(calculator._cache), ["1+1", "3+3"])
+
+    def test_no_deprecated_ast_nodes(self):
+        with warnings.catch_warnings():
+            warnings.simplefilter("error", DeprecationWarning)
+            self.assertEqual(CalculatorAgent().run("1.5 * 4 % 5"), "Result: 1.0")
+
+    def test_parser_limits_are_reported_not_raised(self):
+        calculator = CalculatorAgent()
+        for expression in ["+".join(["1"] * 5000), "-" * 200000 + "1"]:
+            self.assertFalse(calculator.can_evaluate(expression))
+            self.assertEqual(calculator.run(expression), "Calculator error: Expression is too long")
+
+    def test_scalar_run_rejects_variables(self):
+        calculator = CalculatorAgent()
+        self.assertEqual(calculator.run("x + 1"), "Calculator error: Unknown variable: x")
+        self.assertFalse(calculator.can_evaluate("x + 1"))
+
+
+class BatchTests(unittest.TestCase):
+    def batch(self, expression, variables, calculator=None):
+        return json.loads((calculator or CalculatorAgent()).run_batch(expression, variables))
+
+    def test_rows_evaluated_together_with_scalar_broadcast(self):
+        result = self.batch("price * qty * (1 - discount)", {"price": [10, 20, 5], "qty": [1, 2, 4], "discount": 0.5})
+        self.assertEqual(result, {"result": [5.0, 20.0, 10.0]})
+
+    def test_constant_expression_and_bad_rows(self):
+        self.assertEqual(self.batch("2 ** 10", {}), {"result": [1024.0]})
+        self.assertEqual(self.batch("1 / x", {"x": [2, 0]}), {"result": [0.5, None]})
+        self.assertEqual(self.batch("x ** 1000", {"x": [10]}), {"result": [None]})
+
+    def test_constant_expressions_are_float64(self):
+        self.assertEqual(self.batch("2**1000", {}), {"result": [float(2**1000)]})
+        self.assertEqual(self.batch("2**1100", {}), {"result": [None]})
+
+    def test_errors(self):
+        self.assertIn("No values for: y", self.batch("x + y", {"x": [1]})["error"])
+        self.assertIn("same length", self.batch("x + y", {"x": [1, 2], "y": [1, 2, 3]})["error"])
+        self.assertIn("too expensive", self.batch("x + 9**9**9", {"x": [1]})["error"])
+        self.assertIn("Too many rows", self.batch("x", {"x": [1, 2, 3]}, CalculatorAgent(max_batch_rows=2))["error"])
+
+    def test_orchestrator_exposes_the_batch_tool(self):
+        agent = OrchestratorAgent(client=None, memory=MemoryStub())
+        output = agent._find_tool("calculator_batch").run({"expression": "a + b", "variables": {"a": [1, 2], "b": 3}})
+        self.assertEqual(agent._format_tool_output(output), "[4.0, 5.0]")
+
+
+class EvaluationPoolTests(unittest.TestCase):
+    def test_timeout_kills_the_worker_and_the_pool_recovers(self):
+        pool = EvaluationPool(size=1, timeout=0.05)
+        self.addCleanup(pool.close)
+        calculator = CalculatorAgent(inline_cost=0, pool=pool)
+
+        start = time.perf_counter()
+        output = calculator.run("(3**5000000) % 7")
+        self.assertLess(time.perf_counter() - start, 1)
+        self.assertEqual(output, "Calculator error: Evaluation timed out after 0.05s")
+        self.assertEqual(pool.killed, 1)
+        self.assertEqual(pool._idle, [])
+
+        pool.timeout = 5
+        self.assertEqual(calculator.run("2 + 2"), "Result: 4")
+
+
+if __name__ == "__main__":
+    unittest.main()
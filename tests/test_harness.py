@@ -2,83 +2,7 @@ import json
 import unittest
 
 from agents.orchestrator import OrchestratorAgent
-
-
-class MemoryStub:
-    def __init__(self):
-        self.chat_history = []
-
-    def add_message(self, role, content):
-        self.chat_history.append({"role": role, "content": content})
-
-    def get_history(self):
-        return self.chat_history
-
-
-class FakeFunction:
-    def __init__(self, name, arguments):
-        self.name = name
-        self.arguments = arguments
-
-
-class FakeToolCall:
-    def __init__(self, tool_id, function):
-        self.id = tool_id
-        self.function = function
-
-
-class FakeMessage:
-    def __init__(self, content=None, tool_calls=None):
-        self.content = content
-        self.tool_calls = tool_calls or []
-
-
-class FakeChoice:
-    def __init__(self, message):
-        self.message = message
-
-
-class FakeResponse:
-    def __init__(self, message):
-        self.choices = [FakeChoice(message)]
-
-
-class FakeChatCompletions:
-    def __init__(self, parent):
-        self.parent = parent
-
-    def create(self, model, messages, tools=None, tool_choice=None, **_kwargs):
-        if tools and tool_choice == "required":
-            user_text = ""
-            for msg in reversed(messages):
-                if msg.get("role") == "user":
-                    user_text = msg.get("content") or ""
-                    break
-
-            if any(ch.isdigit() for ch in user_text) or any(op in user_text for op in "+-*/"):
-                name = "calculator"
-                args = {"expression": user_text}
-            else:
-                name = "search"
-                args = {"query": user_text}
-
-            self.parent.last_tool_name = name
-            tool_call = FakeToolCall("tool_1", FakeFunction(name, json.dumps(args)))
-            return FakeResponse(FakeMessage(content=None, tool_calls=[tool_call]))
-
-        # Summarization call or no-tools response
-        user_prompt = messages[-1]["content"] if messages else ""
-        lines = [line.strip() for line in user_prompt.splitlines()]
-        items = [line[2:] for line in lines if line.startswith("- ")]
-        summary = items[0] if items else ""
-        return FakeResponse(FakeMessage(content=summary, tool_calls=[]))
-
-
-class FakeClient:
-    def __init__(self):
-        self.last_tool_name = None
-        self.chat = type("Chat", (), {})()
-        self.chat.completions = FakeChatCompletions(self)
+from tests.fakes import FakeClient, MemoryStub
 
 
 class OrchestratorHarnessTests(unittest.TestCase):
@@ -90,7 +14,8 @@ class OrchestratorHarnessTests(unittest.TestCase):
     def setUp(self):
         self.client = FakeClient()
         self.memory = MemoryStub()
-        self.agent = OrchestratorAgent(client=self.client, memory=self.memory)
+        # Fast path off: these tests are about LLM routing
+        self.agent = OrchestratorAgent(client=self.client, memory=self.memory, fast_path=False)
 
     def test_calculator_path(self):
         reply = self.agent.ask("1+1")
@@ -103,5 +28,76 @@ class OrchestratorHarnessTests(unittest.TestCase):
         self.assertEqual(reply, "Bathinda is the capital of France.")
 
 
+class FastPathTests(unittest.TestCase):
+    def setUp(self):
+        self.client = FakeClient()
+        self.memory = MemoryStub()
+        self.agent = OrchestratorAgent(client=self.client, memory=self.memory)
+
+    def test_arithmetic_skips_the_llm(self):
+        reply = self.agent.ask("2 + 2")
+        self.assertEqual(reply, "Result: 4")
+        self.assertEqual(self.client.calls, 0)
+        self.assertEqual(self.agent.fast_path_turns, 1)
+
+    def test_memory_has_the_shape_of_a_tool_turn(self):
+        self.agent.ask("1+1")
+        roles = [m["role"] for m in self.memory.chat_history]
+        self.assertEqual(roles, ["user", "assistant", "tool", "assistant"])
+        tool_call = self.memory.chat_history[1].tool_calls[0]
+        self.assertEqual(tool_call.name, "calculator")
+        self.assertEqual(self.memory.chat_history[2].tool_call_id, tool_call.id)
+
+    def test_surrounding_whitespace_is_stripped_once(self):
+        self.assertEqual(self.agent.ask(" 2+2\n"), "Result: 4")
+        tool_call = self.memory.chat_history[1].tool_calls[0]
+        self.assertEqual(json.loads(tool_call.arguments), {"expression": "2+2"})
+        self.assertEqual(self.memory.chat_history[0]["content"], " 2+2\n")
+
+    def test_unparseable_chains_go_to_the_llm(self):
+        reply = self.agent.ask("+".join(["1"] * 5000))
+        self.assertNotEqual(reply, "Oops! Something went wrong.")
+        self.assertEqual(self.agent.fast_path_turns, 0)
+
+    def test_non_arithmetic_goes_to_the_llm(self):
+        self.agent.ask("Capital of France?")
+        self.agent.ask("42")
+        self.assertEqual(self.agent.fast_path_turns, 0)
+        self.assertGreater(self.client.calls, 0)
+
+
+class SummarizePolicyTests(unittest.TestCase):
+    def make_agent(self, policy):
+        self.client = FakeClient()
+        return OrchestratorAgent(client=self.client, memory=MemoryStub(), fast_path=False, summarize=policy)
+
+    def test_auto_returns_single_short_output_directly(self):
+        agent = self.make_agent("auto")
+        reply = agent.ask("Capital of France?")
+        self.assertEqual(reply, "Bathinda is the capital of France.")
+        self.assertEqual(self.client.calls, 1)
+        self.assertEqual(agent.summaries_skipped, 1)
+
+    def test_auto_summarizes_several_outputs(self):
+        agent = self.make_agent("auto")
+        self.assertEqual(agent._summarize_tool_outputs(["Result: 2", "Result: 4"]), "Result: 2")
+        self.assertEqual(self.client.calls, 1)
+        self.assertEqual(agent.summaries_requested, 1)
+
+    def test_always_calls_the_llm(self):
+        agent = self.make_agent("always")
+        agent.ask("Capital of France?")
+        self.assertEqual(self.client.calls, 2)
+
+    def test_never_joins_outputs(self):
+        agent = self.make_agent("never")
+        self.assertEqual(agent._summarize_tool_outputs(["Result: 2", "Result: 4"]), "Result: 2; Result: 4")
+        self.assertEqual(self.client.calls, 0)
+
+    def test_unknown_policy_is_rejected(self):
+        with self.assertRaises(ValueError):
+            self.make_agent("sometimes")
+
+
 if __name__ == "__main__":
     unittest.main()
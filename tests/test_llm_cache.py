@@ -0,0 +1,117 @@
+import os
+import tempfile
+import unittest
+
+from agents.orchestrator import OrchestratorAgent
+from tests.fakes import AsyncFakeClient, FakeClient, MemoryStub
+from utils.llm_cache import (
+    AsyncCachedLLMClient,
+    CachedLLMClient,
+    DiskLLMCache,
+    LLMCacheMiss,
+    MemoryLLMCache,
+    request_key,
+)
+
+
+def ask_all(client, inputs):
+    agent = OrchestratorAgent(client=client, memory=MemoryStub(), fast_path=False, summarize="always")
+    return [agent.ask(text) for text in inputs]
+
+
+class RequestKeyTests(unittest.TestCase):
+    def test_key_ignores_dict_order_and_unkeyed_params(self):
+        a = request_key({"model": "m", "messages": [{"role": "user", "content": "hi"}], "temperature": 0})
+        b = request_key({"temperature": 0, "messages": [{"content": "hi", "role": "user"}], "model": "m", "timeout": 5})
+        self.assertEqual(a, b)
+
+    def test_sampling_params_change_the_key(self):
+        base = {"model": "m", "messages": []}
+        self.assertNotEqual(request_key(base), request_key({**base, "temperature": 0.5}))
+
+
+class CachedLLMClientTests(unittest.TestCase):
+    def test_identical_requests_hit_the_cache(self):
+        fake = FakeClient()
+        client = CachedLLMClient(fake, MemoryLLMCache())
+        first = ask_all(client, ["Capital of France?"])
+        second = ask_all(client, ["Capital of France?"])
+        self.assertEqual(first, second)
+        self.assertEqual(fake.calls, 2)
+        self.assertEqual(client.hits, 2)
+
+    def test_replay_serves_a_recording_offline(self):
+        inputs = ["1+1", "Capital of France?", "2+2"]
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "llm.sqlite")
+            recorder = CachedLLMClient(FakeClient(), DiskLLMCache(path), mode="record")
+            recorded = ask_all(recorder, inputs)
+            recorder.backend.close()
+
+            # No live client at all: every response must come from the recording
+            replayer = CachedLLMClient(None, DiskLLMCache(path), mode="replay")
+            self.assertEqual(ask_all(replayer, inputs), recorded)
+            self.assertEqual(replayer.misses, 0)
+
+            with self.assertRaises(LLMCacheMiss):
+                replayer.chat.completions.create(model="gpt-4o-mini", messages=[{"role": "user", "content": "new"}])
+            replayer.backend.close()
+
+
+class StreamingCacheTests(unittest.TestCase):
+    def stream_all(self, client, inputs):
+        agent = OrchestratorAgent(client=client, memory=MemoryStub(), fast_path=False, summarize="always")
+        return [list(agent.ask_stream(text))[-1]["reply"] for text in inputs]
+
+    def test_streamed_turns_are_cached(self):
+        fake = FakeClient()
+        client = CachedLLMClient(fake, MemoryLLMCache())
+        first = self.stream_all(client, ["Capital of France?"])
+        second = self.stream_all(client, ["Capital of France?"])
+        self.assertEqual(first, second)
+        self.assertEqual(fake.calls, 2)  # Routing and the streamed summary, once each
+
+    def test_replay_serves_streamed_turns_offline(self):
+        inputs = ["Capital of France?", "2+2"]
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "llm.sqlite")
+            recorder = CachedLLMClient(FakeClient(), DiskLLMCache(path), mode="record")
+            recorded = self.stream_all(recorder, inputs)
+            recorder.backend.close()
+
+            replayer = CachedLLMClient(None, DiskLLMCache(path), mode="replay")
+            self.assertEqual(self.stream_all(replayer, inputs), recorded)
+            self.assertEqual(replayer.misses, 0)
+            with self.assertRaises(LLMCacheMiss):
+                replayer.chat.completions.create(
+                    model="gpt-4o-mini", messages=[{"role": "user", "content": "new"}], stream=True
+                )
+            replayer.backend.close()
+
+    def test_partly_read_stream_is_not_stored(self):
+        fake = FakeClient()
+        client = CachedLLMClient(fake, MemoryLLMCache())
+        request = {"model": "m", "messages": [{"role": "user", "content": "- Paris is lovely"}]}
+        stream = client.chat.completions.create(**request, stream=True)
+        next(stream)
+        stream.close()
+        self.assertEqual(client.backend.stats()["size"], 0)
+        client.chat.completions.create(**request)
+        self.assertEqual(fake.calls, 2)
+
+
+class AsyncStreamingCacheTests(unittest.IsolatedAsyncioTestCase):
+    async def test_streamed_reply_is_stored_and_served_as_chunks(self):
+        fake = AsyncFakeClient()
+        client = AsyncCachedLLMClient(fake, MemoryLLMCache())
+        request = {"model": "m", "messages": [{"role": "user", "content": "- Paris is lovely"}], "stream": True}
+        replies = []
+        for _ in range(2):
+            stream = await client.chat.completions.create(**request)
+            replies.append("".join([chunk.choices[0].delta.content async for chunk in stream if chunk.choices]))
+        self.assertEqual(replies, ["Paris is lovely"] * 2)
+        self.assertEqual((fake.calls, client.hits), (1, 1))
+
+
+if __name__ == "__main__":
+    unittest.main()
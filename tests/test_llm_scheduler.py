@@ -0,0 +1,218 @@
+import asyncio
+import contextlib
+import io
+import threading
+import time
+import unittest
+
+from agents.orchestrator import OrchestratorAgent
+from tests.fakes import (
+    AsyncFakeClient,
+    AsyncThrottledFakeClient,
+    FakeClient,
+    FakeRateLimitError,
+    MemoryStub,
+    ThrottledFakeClient,
+)
+from utils.llm_scheduler import AsyncLLMScheduler, LLMScheduler, TokenBucket
+
+
+def request(text):
+    return {"model": "gpt-4o-mini", "messages": [{"role": "user", "content": f"- {text}"}]}
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TokenBucketTests(unittest.TestCase):
+    def test_wait_covers_debt_and_refills_over_time(self):
+        clock = FakeClock()
+        bucket = TokenBucket(60, clock)  # One token per second, burst of 60
+        self.assertEqual(bucket.reserve(60), 0.0)
+        self.assertAlmostEqual(bucket.reserve(2), 2.0)
+        clock.now = 5.0
+        self.assertEqual(bucket.reserve(1), 0.0)
+
+    def test_refund_corrects_estimate(self):
+        bucket = TokenBucket(100, FakeClock())
+        bucket.reserve(100)
+        bucket.refund(40)  # Used 60 of the 100 estimated
+        self.assertEqual(bucket.reserve(40), 0.0)
+
+
+class LLMSchedulerTests(unittest.TestCase):
+    def test_retries_429_with_backoff_and_shrinks_concurrency(self):
+        client = ThrottledFakeClient(throttle=2)
+        scheduler = LLMScheduler(client, max_concurrency=8, backoff=0.001)
+        response = scheduler.client_for("interactive").chat.completions.create(**request("Paris"))
+
+        self.assertEqual(response.choices[0].message.content, "Paris")
+        stats = scheduler.stats()
+        self.assertEqual((stats["retries"], stats["throttled"], stats["requests"]), (2, 2, 1))
+        self.assertLess(stats["concurrency_limit"], 8)
+
+    def test_gives_up_after_max_retries(self):
+        scheduler = LLMScheduler(ThrottledFakeClient(throttle=10), max_retries=2, backoff=0.001)
+        with self.assertRaises(FakeRateLimitError):
+            scheduler.client_for().chat.completions.create(**request("x"))
+        self.assertEqual(scheduler.stats()["failures"], 1)
+
+    def test_non_retryable_errors_raise_immediately(self):
+        client = ThrottledFakeClient()
+        client.chat.completions.create = lambda **_kwargs: (_ for _ in ()).throw(ValueError("bad request"))
+        scheduler = LLMScheduler(client, backoff=0.001)
+        with self.assertRaises(ValueError):
+            scheduler.client_for().chat.completions.create(**request("x"))
+        self.assertEqual(scheduler.stats()["retries"], 0)
+
+    def test_retry_after_is_honored(self):
+        scheduler = LLMScheduler(ThrottledFakeClient(throttle=1, retry_after=0.2), backoff=0.001)
+        start = time.perf_counter()
+        scheduler.client_for().chat.completions.create(**request("x"))
+        self.assertGreaterEqual(time.perf_counter() - start, 0.2)
+
+    def test_concurrency_limit_is_respected(self):
+        client = ThrottledFakeClient(latency=0.05)
+        scheduler = LLMScheduler(client, max_concurrency=2)
+        threads = [
+            threading.Thread(target=scheduler.client_for().chat.completions.create, kwargs=request(str(i)))
+            for i in range(6)
+        ]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(client.max_active, 2)
+
+    def test_interactive_calls_go_ahead_of_background(self):
+        client = ThrottledFakeClient(latency=0.1)
+        scheduler = LLMScheduler(client, max_concurrency=1)
+        blocker = threading.Thread(target=scheduler.client_for().chat.completions.create, kwargs=request("first"))
+        blocker.start()
+        time.sleep(0.03)
+
+        background = threading.Thread(
+            target=scheduler.client_for("background").chat.completions.create, kwargs=request("summary")
+        )
+        background.start()
+        time.sleep(0.02)
+        interactive = threading.Thread(target=scheduler.client_for().chat.completions.create, kwargs=request("route"))
+        interactive.start()
+        for t in (blocker, background, interactive):
+            t.join()
+
+        self.assertEqual(client.order, ["- first", "- route", "- summary"])
+
+    def test_orchestrator_survives_a_burst_of_429s(self):
+        scheduler = LLMScheduler(ThrottledFakeClient(throttle=3), backoff=0.001)
+        agent = OrchestratorAgent(
+            client=scheduler.client_for("interactive"), memory=MemoryStub(), fast_path=False, summarize="always"
+        )
+        with contextlib.redirect_stdout(io.StringIO()):
+            reply = agent.ask("Capital of France?")
+        self.assertNotEqual(reply, "Oops! Something went wrong.")
+        self.assertEqual(scheduler.stats()["throttled"], 3)
+
+    def test_interrupted_waiter_leaves_the_queue(self):
+        scheduler = LLMScheduler(ThrottledFakeClient(), max_concurrency=1)
+        scheduler._acquire(0)  # Hold the only slot
+        interrupted = threading.Thread(target=self.interrupted_acquire, args=(scheduler,))
+        interrupted.start()
+        interrupted.join()
+        scheduler._release()
+
+        response = scheduler.client_for().chat.completions.create(**request("next"))
+        self.assertEqual(response.choices[0].message.content, "next")
+        self.assertEqual((scheduler.stats()["waiting"], scheduler.stats()["in_flight"]), (0, 0))
+
+    @staticmethod
+    def interrupted_acquire(scheduler):
+        def interrupt(_timeout=None):
+            raise KeyboardInterrupt
+
+        scheduler._cond.wait = interrupt
+        try:
+            scheduler._acquire(0)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            del scheduler._cond.wait
+
+    def test_stream_holds_its_slot_until_read(self):
+        scheduler = LLMScheduler(FakeClient(), max_concurrency=1)
+        create = scheduler.client_for().chat.completions.create
+        stream = create(**request("Paris"), stream=True)
+        self.assertEqual(scheduler.stats()["in_flight"], 1)
+        self.assertEqual("".join(chunk.choices[0].delta.content or "" for chunk in stream), "Paris")
+        self.assertEqual(scheduler.stats()["in_flight"], 0)
+
+        stream = create(**request("Paris"), stream=True)
+        stream.close()
+        stream.close()
+        self.assertEqual(scheduler.stats()["in_flight"], 0)
+
+    def test_unknown_priority_is_rejected(self):
+        with self.assertRaises(ValueError):
+            LLMScheduler(ThrottledFakeClient()).client_for("urgent")
+
+
+class AsyncLLMSchedulerTests(unittest.IsolatedAsyncioTestCase):
+    async def test_retries_and_limits_concurrency(self):
+        client = AsyncThrottledFakeClient(throttle=2, latency=0.02)
+        scheduler = AsyncLLMScheduler(client, max_concurrency=3, backoff=0.001)
+        create = scheduler.client_for().chat.completions.create
+        responses = await asyncio.gather(*(create(**request(str(i))) for i in range(10)))
+
+        self.assertEqual([r.choices[0].message.content for r in responses], [str(i) for i in range(10)])
+        self.assertLessEqual(client.max_active, 3)
+        self.assertEqual(scheduler.stats()["throttled"], 2)
+
+    async def test_interactive_calls_go_ahead_of_background(self):
+        client = AsyncThrottledFakeClient(latency=0.05)
+        scheduler = AsyncLLMScheduler(client, max_concurrency=1)
+        first = asyncio.create_task(scheduler.client_for().chat.completions.create(**request("first")))
+        await asyncio.sleep(0.01)
+        background = asyncio.create_task(
+            scheduler.client_for("background").chat.completions.create(**request("summary"))
+        )
+        await asyncio.sleep(0)
+        interactive = asyncio.create_task(scheduler.client_for().chat.completions.create(**request("route")))
+        await asyncio.gather(first, background, interactive)
+
+        self.assertEqual(client.order, ["- first", "- route", "- summary"])
+
+    async def test_cancelled_waiter_does_not_block_later_calls(self):
+        scheduler = AsyncLLMScheduler(AsyncThrottledFakeClient(latency=0.05), max_concurrency=1)
+        create = scheduler.client_for().chat.completions.create
+        first = asyncio.create_task(create(**request("first")))
+        await asyncio.sleep(0.01)
+        cancelled = asyncio.create_task(create(**request("cancelled")))
+        await asyncio.sleep(0)
+        cancelled.cancel()
+        await first
+
+        response = await asyncio.wait_for(create(**request("third")), 1)
+        self.assertEqual(response.choices[0].message.content, "third")
+        self.assertEqual((scheduler.stats()["waiting"], scheduler.stats()["in_flight"]), (0, 0))
+
+    async def test_stream_holds_its_slot_until_read(self):
+        scheduler = AsyncLLMScheduler(AsyncFakeClient(), max_concurrency=1)
+        create = scheduler.client_for().chat.completions.create
+        stream = await create(**request("Paris"), stream=True)
+        self.assertEqual(scheduler.stats()["in_flight"], 1)
+        chunks = [chunk.choices[0].delta.content or "" async for chunk in stream]
+        self.assertEqual("".join(chunks), "Paris")
+        self.assertEqual(scheduler.stats()["in_flight"], 0)
+
+        stream = await create(**request("Paris"), stream=True)
+        await stream.aclose()
+        self.assertEqual(scheduler.stats()["in_flight"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,89 @@
+import logging
+import os
+import tempfile
+import threading
+import unittest
+from logging.handlers import QueueHandler
+from unittest import mock
+
+from utils import logger
+
+
+class CountingStr:
+    def __init__(self):
+        self.calls = 0
+
+    def __str__(self):
+        self.calls += 1
+        return "formatted"
+
+
+class LoggerTests(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.addCleanup(logger.shutdown_logging)
+
+    def read(self, name):
+        with open(os.path.join(self.tmp.name, name)) as f:
+            return f.read()
+
+    def test_queued_handlers_write_on_listener_thread(self):
+        logger.configure_logging(log_dir=self.tmp.name, console_level=None, debug_file=True)
+        writers = []
+        original_emit = logging.FileHandler.emit
+
+        def emit(handler, record):
+            writers.append(threading.current_thread())
+            original_emit(handler, record)
+
+        logging.FileHandler.emit = emit
+        try:
+            logger.log_info("User: %s", "hello")
+            logger.log_debug("[X] Message pruned: %s", {"role": "user"})
+            logger.shutdown_logging()  # Drains the queue
+        finally:
+            logging.FileHandler.emit = original_emit
+
+        self.assertTrue(writers)
+        self.assertNotIn(threading.current_thread(), writers)
+        self.assertIn("INFO - User: hello", self.read("agent.log"))
+        self.assertNotIn("Message pruned", self.read("agent.log"))
+        self.assertIn("DEBUG - [X] Message pruned: {'role': 'user'}", self.read("agent_debug.log"))
+
+    def test_disabled_level_skips_formatting(self):
+        logger.configure_logging(log_dir=self.tmp.name, console_level=None)
+        value = CountingStr()
+        logger.log_debug("[X] Message pruned: %s", value)
+        logger.log_info("User: %s", value)
+        logger.shutdown_logging()
+        self.assertEqual(value.calls, 1)
+        self.assertNotIn("pruned", self.read("agent.log"))
+
+    def test_env_enables_the_debug_file(self):
+        env = {"AGENT_LOG_DIR": self.tmp.name, "AGENT_LOG_LEVEL": "ERROR"}
+        with mock.patch.dict(os.environ, env):
+            logger.configure_logging_from_env()
+            self.assertFalse(logger.agent_logger.isEnabledFor(logging.DEBUG))
+            with mock.patch.dict(os.environ, {"AGENT_LOG_DEBUG_FILE": "1"}):
+                logger.configure_logging_from_env()
+        self.assertTrue(logger.agent_logger.isEnabledFor(logging.DEBUG))
+        logger.log_debug("[X] Message pruned: %s", "hello")
+        logger.shutdown_logging()
+        self.assertIn("Message pruned: hello", self.read("agent_debug.log"))
+
+    def test_reconfigure_replaces_handlers(self):
+        logger.configure_logging(log_dir=self.tmp.name, console_level=None)
+        logger.configure_logging(log_dir=None, console_level=None, queued=False)
+        ours = [h for h in logger.agent_logger.handlers if isinstance(h, (logging.FileHandler, QueueHandler))]
+        self.assertEqual(ours, [])
+        self.assertFalse(logger.agent_logger.isEnabledFor(logging.INFO))
+
+    def test_synchronous_mode(self):
+        logger.configure_logging(log_dir=self.tmp.name, console_level=None, queued=False)
+        logger.log_error("[server] Error in session %s: %s", "alice", "boom")
+        self.assertIn("ERROR - [server] Error in session alice: boom", self.read("agent.log"))
+
+
+if __name__ == "__main__":
+    unittest.main()
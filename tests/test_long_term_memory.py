@@ -0,0 +1,148 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from agents.base_agent import BaseAgent
+from memory.long_term import HashingEmbedder, LongTermMemory, VectorIndex
+from memory.memory import Memory
+from tests.test_memory import FakeEncoder
+
+
+class HashingEmbedderTests(unittest.TestCase):
+    def test_deterministic_unit_vectors(self):
+        embedder = HashingEmbedder(dim=64)
+        first = embedder.embed(["my cat is called Miso", ""])
+        second = HashingEmbedder(dim=64).embed(["my cat is called Miso", ""])
+        np.testing.assert_array_equal(first, second)
+        self.assertAlmostEqual(float(np.linalg.norm(first[0])), 1.0, places=5)
+        self.assertFalse(first[1].any())
+
+    def test_shared_words_score_higher(self):
+        cat, related, unrelated = HashingEmbedder().embed(
+            ["my cat is called Miso", "what is my cat called?", "the weather in Paris tomorrow"]
+        )
+        self.assertGreater(cat @ related, cat @ unrelated)
+
+
+class VectorIndexTests(unittest.TestCase):
+    def random_unit(self, n, dim=16, seed=0):
+        vectors = np.random.default_rng(seed).normal(size=(n, dim)).astype(np.float32)
+        return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+    def test_top_k_matches_brute_force_across_growth(self):
+        vectors = self.random_unit(300)
+        index = VectorIndex(16, initial_capacity=4)
+        for start in range(0, 300, 7):
+            index.add(vectors[start : start + 7])
+        self.assertEqual(index.count, 300)
+
+        query = vectors[42]
+        ids, scores = index.search(query, 5)
+        expected = np.argsort(-(vectors @ query))[:5]
+        np.testing.assert_array_equal(ids, expected)
+        self.assertEqual(ids[0], 42)
+        self.assertTrue(np.all(np.diff(scores) <= 0))
+
+    def test_empty_index_finds_nothing(self):
+        ids, _scores = VectorIndex(16).search(np.ones(16), 3)
+        self.assertEqual(len(ids), 0)
+
+    def test_memmap_survives_reopen_and_growth(self):
+        vectors = self.random_unit(10)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "index.npy")
+            index = VectorIndex(16, path, initial_capacity=4)
+            index.add(vectors)
+            index.flush()
+            self.assertIsInstance(index._matrix, np.memmap)
+            del index
+
+            reopened = VectorIndex(16, path, count=10)
+            np.testing.assert_array_equal(reopened._matrix[:10], vectors)
+            self.assertEqual(reopened.search(vectors[3], 1)[0][0], 3)
+
+
+class LongTermMemoryTests(unittest.TestCase):
+    def test_recall_ranks_and_respects_budget(self):
+        long_term = LongTermMemory(token_budget=10, min_score=0.1)
+        long_term.add(
+            ["user: my cat is called Miso", "user: I work in Berlin", "user: my cat likes tuna very much indeed"],
+            [6, 5, 8],
+        )
+        self.assertEqual(long_term.recall("what is my cat called?"), ["user: my cat is called Miso"])
+        self.assertEqual(len(long_term.recall("what is my cat called?", token_budget=20)), 2)
+        self.assertEqual(long_term.recall("quantum chromodynamics"), [])
+
+    def test_persists_texts_and_vectors(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "long_term")
+            long_term = LongTermMemory(path=path)
+            long_term.add(["user: my cat is called Miso"], [6])
+            long_term.close()
+
+            reopened = LongTermMemory(path=path)
+            self.assertEqual(len(reopened), 1)
+            self.assertEqual(reopened.recall("my cat"), ["user: my cat is called Miso"])
+            reopened.add(["user: I work in Berlin"], [5])
+            reopened.close()
+            self.assertEqual(len(LongTermMemory(path=path)), 2)
+
+    def test_torn_last_record_is_dropped_on_reopen(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "long_term")
+            long_term = LongTermMemory(path=path)
+            long_term.add(["user: my cat is called Miso"], [6])
+            long_term.close()
+            with open(f"{path}.jsonl", "a") as f:
+                f.write('{"text": "user: I work in')  # A crash mid-write
+
+            reopened = LongTermMemory(path=path)
+            self.assertEqual(len(reopened), 1)
+            reopened.add(["user: I work in Berlin"], [5])
+            reopened.add(["user: I like tea"], [4])
+            reopened.close()
+
+            again = LongTermMemory(path=path)
+            self.assertEqual(len(again), 3)
+            self.assertEqual(again.recall("where do I work?"), ["user: I work in Berlin"])
+            again.close()
+
+
+class MemoryRecallTests(unittest.TestCase):
+    def setUp(self):
+        patcher = mock.patch("memory.memory.get_encoder", return_value=FakeEncoder())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_pruned_turns_are_recalled_into_the_request(self):
+        memory = Memory(token_limit=20, long_term=LongTermMemory(min_score=0.1))
+        memory.add_message("user", "my cat is called Miso")
+        memory.add_message("assistant", "Nice name!")
+        memory.add_message("user", "the weather in Paris is sunny today")
+        memory.add_message("assistant", "Good to know.")
+        memory.add_message("user", "what is my cat called?")
+
+        # Evicted one message per prune; each prune indexes what it evicted
+        self.assertEqual(memory.long_term.turns, [("user: my cat is called Miso", 5), ("assistant: Nice name!", 2)])
+
+        agent = BaseAgent(name="test", client=None, memory=memory, system_prompt="sys")
+        messages = agent._build_request()["messages"]
+        self.assertEqual(messages[0]["content"], "sys")
+        self.assertEqual(messages[1]["role"], "system")
+        self.assertIn("user: my cat is called Miso", messages[1]["content"])
+        self.assertNotIn("weather", messages[1]["content"])
+        self.assertEqual(messages[-1]["content"], "what is my cat called?")
+        self.assertIs(memory.recall(), memory.recall())
+
+    def test_no_long_term_adds_nothing(self):
+        memory = Memory(token_limit=20)
+        memory.add_message("user", "hello")
+        agent = BaseAgent(name="test", client=None, memory=memory, system_prompt="sys")
+        self.assertEqual(len(agent._build_request()["messages"]), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,167 @@
+import threading
+import unittest
+from unittest import mock
+
+from memory.memory import Memory
+from memory.message import Message, ToolCall
+from utils import token_monitor
+
+
+class FakeEncoder:
+    # One token per whitespace-separated word keeps the numbers easy to reason about.
+    def __init__(self):
+        self.calls = 0
+
+    def encode(self, text):
+        self.calls += 1
+        return text.split()
+
+
+class SummaryClient:
+    # Records summary prompts; optionally holds each call until released.
+    def __init__(self, gate=None):
+        self.prompts = []
+        self.gate = gate
+        self.chat = mock.Mock()
+        self.chat.completions.create.side_effect = self._create
+
+    def _create(self, model, messages, **_kwargs):
+        if self.gate is not None:
+            self.gate.wait(5)
+        self.prompts.append(messages[-1]["content"])
+        message = mock.Mock(content=f"summary {len(self.prompts)}")
+        return mock.Mock(choices=[mock.Mock(message=message)])
+
+
+class MemoryTokenAccountingTests(unittest.TestCase):
+    def setUp(self):
+        self.encoder = FakeEncoder()
+        patcher = mock.patch("memory.memory.get_encoder", return_value=self.encoder)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_running_total_matches_messages(self):
+        memory = Memory(token_limit=1000)
+        memory.add_message("user", "one two three")
+        memory.append({"role": "tool", "tool_call_id": "t1", "content": "four five"})
+        self.assertEqual(memory.token_count(), 5)
+
+    def test_token_count_does_not_re_encode(self):
+        memory = Memory(token_limit=1000)
+        memory.add_message("user", "one two three")
+        calls = self.encoder.calls
+        memory.token_count()
+        memory.token_count()
+        self.assertEqual(self.encoder.calls, calls)
+
+    def test_prune_keeps_total_in_sync(self):
+        memory = Memory(token_limit=8)
+        for i in range(5):
+            memory.add_message("user", f"message number {i}")
+        self.assertLessEqual(memory.token_count(), 6)
+        self.assertEqual(
+            memory.token_count(),
+            sum(len(m["content"].split()) for m in memory.chat_history),
+        )
+
+    def test_prune_drops_tool_outputs_with_their_call(self):
+        memory = Memory(token_limit=8)
+        call = mock.Mock()
+        call.function.arguments = "{}"
+        memory.append({"role": "assistant", "tool_calls": [call], "content": "calling tools now"})
+        memory.append({"role": "tool", "tool_call_id": "t1", "content": "first"})
+        memory.append({"role": "tool", "tool_call_id": "t2", "content": "second"})
+        memory.add_message("user", "a fresh question")
+        self.assertEqual([m["role"] for m in memory.chat_history], ["user"])
+        self.assertEqual(memory.token_count(), 3)
+
+
+class MessageRecordTests(unittest.TestCase):
+    def setUp(self):
+        patcher = mock.patch("memory.memory.get_encoder", return_value=FakeEncoder())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_sdk_tool_calls_are_normalized(self):
+        from openai.types.chat import ChatCompletionMessageToolCall
+
+        sdk_call = ChatCompletionMessageToolCall.model_validate(
+            {"id": "c1", "type": "function", "function": {"name": "search", "arguments": '{"query": "x"}'}}
+        )
+        memory = Memory(token_limit=1000)
+        memory.append({"role": "assistant", "tool_calls": [sdk_call], "content": None})
+
+        message = memory.chat_history[-1]
+        self.assertIsInstance(message, Message)
+        self.assertEqual(message.tool_calls, (ToolCall("c1", "search", '{"query": "x"}'),))
+        self.assertEqual(message.tokens, 2)
+        self.assertEqual(message.to_dict(), {
+            "role": "assistant",
+            "content": None,
+            "tool_calls": [{"id": "c1", "type": "function", "function": {"name": "search", "arguments": '{"query": "x"}'}}],
+        })
+
+    def test_messages_use_slots(self):
+        message = Message("user", "hi")
+        self.assertFalse(hasattr(message, "__dict__"))
+        self.assertEqual(message, {"role": "user", "content": "hi"})
+        self.assertEqual(message["role"], "user")
+        self.assertIsNone(message.get("tool_calls"))
+
+
+class EncoderRegistryTests(unittest.TestCase):
+    def setUp(self):
+        self.addCleanup(token_monitor._encoders.clear)
+        token_monitor._encoders.clear()
+
+    def test_encoder_is_built_once_and_shared(self):
+        with mock.patch("tiktoken.encoding_for_model", return_value=FakeEncoder()) as build:
+            first, second = Memory(), Memory()
+            first.add_message("user", "one two")
+            second.add_message("user", "three")
+            self.assertEqual(token_monitor.count_text_tokens("four five six"), 3)
+        build.assert_called_once_with("gpt-4o-mini")
+        self.assertIs(first.enc, second.enc)
+
+    def test_memory_construction_does_not_load_tokenizer(self):
+        with mock.patch("tiktoken.encoding_for_model") as build:
+            Memory(token_limit=100)
+        build.assert_not_called()
+
+
+class MemorySummaryTests(unittest.TestCase):
+    def setUp(self):
+        patcher = mock.patch("memory.memory.get_encoder", return_value=FakeEncoder())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_rolling_summary_folds_previous_summary(self):
+        client = SummaryClient()
+        memory = Memory(token_limit=8, client=client)
+        for i in range(4):
+            memory.add_message("user", f"message number {i}")
+        self.assertGreaterEqual(len(client.prompts), 2)
+        self.assertIn("summary 1", client.prompts[1])
+        self.assertEqual(memory.chat_history[0]["role"], "system")
+        self.assertEqual(sum(1 for m in memory.chat_history if m["role"] == "system"), 1)
+
+    def test_background_summary_does_not_block_eviction(self):
+        gate = threading.Event()
+        client = SummaryClient(gate=gate)
+        memory = Memory(token_limit=8, client=client, background_summary=True)
+        self.addCleanup(memory.close, 5)
+        for i in range(3):
+            memory.add_message("user", f"message number {i}")
+
+        # Eviction already happened even though the summary call is still blocked
+        self.assertLessEqual(memory.token_count(), 6)
+        self.assertNotEqual(memory.chat_history[0]["role"], "system")
+
+        gate.set()
+        self.assertTrue(memory.flush(timeout=5))
+        self.assertEqual(memory.chat_history[0]["role"], "system")
+        self.assertIn("summary", memory.chat_history[0]["content"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,102 @@
+import json
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from agents.search_agent import PROVIDERS, SearchAgent, SearchProvider, register_provider
+
+
+class StandInSerpAPI(BaseHTTPRequestHandler):
+    # Local stand-in for serpapi.com; fails the first `failures` requests with a 503.
+    failures = 0
+    requests = []
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = parse_qs(url.query)
+        type(self).requests.append((url.path, params))
+        if type(self).failures > 0:
+            type(self).failures -= 1
+            self.send_response(503)
+            self.end_headers()
+            return
+
+        body = json.dumps({
+            "organic_results": [
+                {"title": f"Result {i}", "link": f"https://example.com/{i}", "snippet": f"snippet {i}"}
+                for i in range(10)
+            ]
+        }).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *_args):
+        pass
+
+
+class SerpAPIProviderTests(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), StandInSerpAPI)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.base_url = f"http://127.0.0.1:{cls.server.server_address[1]}"
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        StandInSerpAPI.failures = 0
+        StandInSerpAPI.requests = []
+
+    def make_agent(self, **options):
+        return SearchAgent(api_key="test-key", provider="serpapi", base_url=self.base_url, backoff=0.01, **options)
+
+    def test_trims_to_top_k_snippets(self):
+        result = self.make_agent(top_k=2).run("capital of france")
+        self.assertEqual(result["result"], "snippet 0\nsnippet 1")
+        self.assertEqual(len(result["sources"]), 2)
+        path, params = StandInSerpAPI.requests[0]
+        self.assertEqual(path, "/search.json")
+        self.assertEqual(params["q"], ["capital of france"])
+        self.assertEqual(params["api_key"], ["test-key"])
+
+    def test_retries_transient_failures(self):
+        StandInSerpAPI.failures = 2
+        result = self.make_agent(max_retries=2).run("query")
+        self.assertIn("result", result)
+        self.assertEqual(len(StandInSerpAPI.requests), 3)
+
+    def test_gives_up_after_max_retries(self):
+        StandInSerpAPI.failures = 5
+        result = self.make_agent(max_retries=1).run("query")
+        self.assertIn("503", result["error"])
+        self.assertEqual(len(StandInSerpAPI.requests), 2)
+
+    def test_missing_key_is_an_error(self):
+        agent = SearchAgent(api_key="", provider="serpapi", base_url=self.base_url)
+        self.assertIn("error", agent.run("query"))
+        self.assertEqual(StandInSerpAPI.requests, [])
+
+
+class ProviderRegistryTests(unittest.TestCase):
+    def test_registered_provider_is_used(self):
+        @register_provider("echo")
+        class EchoProvider(SearchProvider):
+            def search(self, query):
+                return {"result": query}
+
+        self.addCleanup(PROVIDERS.pop, "echo")
+        self.assertEqual(SearchAgent(api_key="", provider="echo").run("hi"), {"result": "hi"})
+
+    def test_unknown_provider(self):
+        self.assertEqual(SearchAgent(api_key="", provider="nope").run("hi"), {"error": "Unsupported provider: nope"})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,85 @@
+import os
+import tempfile
+import unittest
+
+from agents.orchestrator import OrchestratorAgent
+from agents.search_cache import SearchCache
+from tests.fakes import MemoryStub
+from utils.cache import MISSING, TTLCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TTLCacheTests(unittest.TestCase):
+    def test_lru_eviction(self):
+        cache = TTLCache(max_entries=2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+        self.assertIs(cache.get("b"), MISSING)
+        self.assertEqual(cache.get("a"), 1)
+        self.assertEqual(cache.stats()["evictions"], 1)
+
+    def test_entries_expire(self):
+        clock = FakeClock()
+        cache = TTLCache(ttl=10, clock=clock)
+        cache.set("a", 1)
+        cache.set("b", 2, ttl=1)
+        clock.now = 5
+        self.assertEqual(cache.get("a"), 1)
+        self.assertIs(cache.get("b"), MISSING)
+        self.assertEqual(cache.stats()["expirations"], 1)
+
+
+class SearchCacheTests(unittest.TestCase):
+    def test_normalized_queries_share_an_entry(self):
+        cache = SearchCache()
+        cache.set("serpapi", "Capital of France?", {"result": "Paris"})
+        self.assertEqual(cache.get("serpapi", "  capital of   FRANCE "), {"result": "Paris"})
+        self.assertIsNone(cache.get("other", "capital of france"))
+
+    def test_errors_use_the_short_ttl(self):
+        cache = SearchCache(ttl=100, error_ttl=5)
+        clock = FakeClock()
+        cache.memory.clock = clock
+        cache.set("serpapi", "q", {"error": "rate limited"})
+        clock.now = 6
+        self.assertIsNone(cache.get("serpapi", "q"))
+
+    def test_persistent_tier_survives_a_new_instance(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "search.sqlite")
+            first = SearchCache(persist_path=path)
+            first.set("serpapi", "capital of france", {"result": "Paris"})
+            first.close()
+
+            second = SearchCache(persist_path=path)
+            self.assertEqual(second.get("serpapi", "Capital of France?"), {"result": "Paris"})
+            self.assertEqual(second.stats()["persistent"]["hits"], 1)
+            # Promoted into the memory tier
+            self.assertEqual(second.get("serpapi", "capital of france"), {"result": "Paris"})
+            self.assertEqual(second.stats()["memory"]["hits"], 1)
+            second.close()
+
+    def test_orchestrator_only_calls_provider_on_miss(self):
+        cache = SearchCache()
+        agent = OrchestratorAgent(client=None, memory=MemoryStub(), search_cache=cache)
+        calls = []
+        original = agent.search.run
+        agent.search.run = lambda query: calls.append(query) or original(query)
+
+        first = agent._run_search("Capital of France?")
+        second = agent._run_search("capital of france")
+        self.assertEqual(first, second)
+        self.assertEqual(calls, ["Capital of France?"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,158 @@
+import asyncio
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from memory.session_store import SQLiteSessionStore
+from server import SessionManager, create_app
+from tests.fakes import AsyncFakeClient
+from tests.test_memory import FakeEncoder
+
+
+async def request(app, method, path, body=None):
+    """Drive the ASGI app directly; returns (status, headers, decoded body lines)."""
+    payload = json.dumps(body).encode() if body is not None else b""
+    received = [{"type": "http.request", "body": payload, "more_body": False}]
+    sent = []
+
+    async def receive():
+        return received.pop(0)
+
+    async def send(message):
+        sent.append(message)
+
+    await app({"type": "http", "method": method, "path": path}, receive, send)
+    start = sent[0]
+    raw = b"".join(m.get("body", b"") for m in sent[1:])
+    lines = [json.loads(line) for line in raw.splitlines() if line]
+    return start["status"], dict(start["headers"]), lines
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class ServerTests(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        patcher = mock.patch("memory.memory.get_encoder", return_value=FakeEncoder())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def test_sessions_keep_separate_memory(self):
+        app = create_app(client=AsyncFakeClient(), fast_path=False)
+        status, _, [body] = await request(app, "POST", "/sessions/a/messages", {"input": "1+1"})
+        self.assertEqual(status, 200)
+        self.assertEqual(body["reply"], "Result: 2")
+        await request(app, "POST", "/sessions/b/messages", {"input": "Capital of France?"})
+        await request(app, "POST", "/sessions/a/messages", {"input": "2+2"})
+
+        sessions = app.sessions.sessions
+        self.assertEqual(len(sessions["a"].memory.chat_history), 8)
+        self.assertEqual(len(sessions["b"].memory.chat_history), 4)
+        # One tool stack for everyone
+        self.assertIs(sessions["a"].agent.search, sessions["b"].agent.search)
+
+    async def test_stream_returns_ndjson_chunks(self):
+        app = create_app(client=AsyncFakeClient())
+        status, headers, chunks = await request(app, "POST", "/sessions/a/messages", {"input": "2+2", "stream": True})
+        self.assertEqual(status, 200)
+        self.assertEqual(headers[b"content-type"], b"application/x-ndjson")
+        self.assertEqual(chunks[-1]["type"], "done")
+        self.assertEqual(chunks[-1]["reply"], "Result: 4")
+
+    async def test_saturated_server_answers_busy(self):
+        app = create_app(client=AsyncFakeClient(latency=0.1), max_inflight=2, fast_path=False)
+        results = await asyncio.gather(*(
+            request(app, "POST", f"/sessions/s{i}/messages", {"input": "Capital of France?"})
+            for i in range(5)
+        ))
+        statuses = sorted(status for status, _, _ in results)
+        self.assertEqual(statuses, [200, 200, 503, 503, 503])
+        busy = next(headers for status, headers, _ in results if status == 503)
+        self.assertEqual(busy[b"retry-after"], b"1")
+
+    async def test_bad_request_and_unknown_route(self):
+        app = create_app(client=AsyncFakeClient())
+        self.assertEqual((await request(app, "POST", "/sessions/a/messages", {"text": "hi"}))[0], 400)
+        self.assertEqual((await request(app, "GET", "/nope"))[0], 404)
+
+    async def test_oversized_body_is_refused(self):
+        app = create_app(client=AsyncFakeClient(), max_body=64)
+        self.assertEqual((await request(app, "POST", "/sessions/a/messages", {"input": "x" * 100}))[0], 413)
+        self.assertEqual((await request(app, "POST", "/sessions/a/messages", {"input": "1+1"}))[0], 200)
+
+    async def test_error_after_stream_start_ends_the_stream(self):
+        app = create_app(client=AsyncFakeClient())
+
+        async def broken_stream(_user_input):
+            yield {"type": "token", "content": "Par"}
+            raise RuntimeError("boom")
+
+        app.sessions.get("a").agent.ask_stream = broken_stream
+        sent = []
+        received = [{"type": "http.request", "body": b'{"input": "hi", "stream": true}'}]
+
+        async def receive():
+            return received.pop(0)
+
+        async def send(message):
+            sent.append(message)
+
+        await app({"type": "http", "method": "POST", "path": "/sessions/a/messages"}, receive, send)
+        self.assertEqual([m["type"] for m in sent].count("http.response.start"), 1)
+        self.assertEqual(sent[0]["status"], 200)
+        self.assertFalse(sent[-1]["more_body"])
+        self.assertEqual(json.loads(sent[-1]["body"]), {"type": "error", "error": "Internal error"})
+
+    async def test_delete_reports_missing_and_busy_sessions(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            store = SQLiteSessionStore(os.path.join(tmp, "sessions.sqlite"))
+            self.addCleanup(store.close)
+            app = create_app(client=AsyncFakeClient(), store=store, fast_path=False)
+            self.assertEqual((await request(app, "DELETE", "/sessions/nobody"))[0], 404)
+
+            await request(app, "POST", "/sessions/a/messages", {"input": "Capital of France?"})
+            session = app.sessions.get("a")
+            async with session.lock:
+                self.assertEqual((await request(app, "DELETE", "/sessions/a"))[0], 409)
+            self.assertEqual(len(store.load("a")[2]), 4)
+
+            status, _, [body] = await request(app, "DELETE", "/sessions/a")
+            self.assertEqual((status, body), (200, {"deleted": True}))
+            self.assertEqual(store.load("a")[2], [])
+
+
+class SessionManagerTests(unittest.TestCase):
+    def setUp(self):
+        patcher = mock.patch("memory.memory.get_encoder", return_value=FakeEncoder())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.clock = FakeClock()
+
+    def test_idle_sessions_are_evicted(self):
+        manager = SessionManager(AsyncFakeClient(), idle_timeout=10, clock=self.clock)
+        manager.get("old")
+        self.clock.now = 5
+        manager.get("recent")
+        self.clock.now = 12
+        manager.evict()
+        self.assertEqual(list(manager.sessions), ["recent"])
+
+    def test_session_cap_evicts_least_recently_used(self):
+        manager = SessionManager(AsyncFakeClient(), max_sessions=2, clock=self.clock)
+        manager.get("a")
+        manager.get("b")
+        manager.get("a")
+        manager.get("c")
+        self.assertEqual(list(manager.sessions), ["a", "c"])
+        self.assertEqual(manager.evicted, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
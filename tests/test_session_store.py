@@ -0,0 +1,68 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from memory.memory import Memory
+from memory.session_store import SQLiteSessionStore
+from tests.fakes import FakeFunction, FakeToolCall
+from tests.test_memory import FakeEncoder, SummaryClient
+
+
+class SessionStoreTests(unittest.TestCase):
+    def setUp(self):
+        self.encoder = FakeEncoder()
+        patcher = mock.patch("memory.memory.get_encoder", return_value=self.encoder)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.path = os.path.join(tmp.name, "sessions.sqlite")
+
+    def open_store(self):
+        store = SQLiteSessionStore(self.path)
+        self.addCleanup(store.close)
+        return store
+
+    def test_history_reloads_without_re_tokenizing(self):
+        memory = Memory(token_limit=1000, store=self.open_store(), session_id="s1")
+        memory.add_message("user", "one two three")
+        memory.append({
+            "role": "assistant",
+            "content": None,
+            "tool_calls": [FakeToolCall("t1", FakeFunction("calculator", '{"expression": "1+1"}'))],
+        })
+        memory.append({"role": "tool", "tool_call_id": "t1", "content": "Result: 2"})
+
+        calls = self.encoder.calls
+        reloaded = Memory(token_limit=1000, store=self.open_store(), session_id="s1")
+        self.assertEqual(self.encoder.calls, calls)
+        self.assertEqual(reloaded.token_count(), memory.token_count())
+        self.assertEqual([m["role"] for m in reloaded.chat_history], ["user", "assistant", "tool"])
+        self.assertEqual(reloaded.chat_history[1]["tool_calls"][0]["function"]["name"], "calculator")
+
+    def test_eviction_and_summary_are_persisted(self):
+        memory = Memory(token_limit=8, client=SummaryClient(), store=self.open_store(), session_id="s1")
+        for i in range(4):
+            memory.add_message("user", f"message number {i}")
+
+        reloaded = Memory(token_limit=8, store=self.open_store(), session_id="s1")
+        self.assertEqual(list(reloaded.chat_history), list(memory.chat_history))
+        self.assertEqual(reloaded.summary, memory.summary)
+        self.assertEqual(reloaded.token_count(), memory.token_count())
+
+        # Appends continue the sequence after a reload
+        reloaded.add_message("user", "after restart")
+        again = Memory(token_limit=8, store=self.open_store(), session_id="s1")
+        self.assertEqual(again.chat_history[-1]["content"], "after restart")
+
+    def test_sessions_are_independent(self):
+        store = self.open_store()
+        Memory(store=store, session_id="a").add_message("user", "for a")
+        self.assertEqual(len(Memory(store=store, session_id="b").chat_history), 0)
+        store.delete("a")
+        self.assertEqual(len(Memory(store=store, session_id="a").chat_history), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
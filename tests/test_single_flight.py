@@ -0,0 +1,147 @@
+import asyncio
+import contextlib
+import io
+import threading
+import time
+import unittest
+
+from agents.orchestrator import AsyncOrchestratorAgent, OrchestratorAgent
+from tests.fakes import AsyncFakeClient, FakeClient, MemoryStub
+from utils.single_flight import SingleFlight
+
+
+class CountingSearch:
+    provider = "mock"
+
+    def __init__(self, delay=0.1):
+        self.delay = delay
+        self.calls = 0
+
+    def run(self, query):
+        self.calls += 1
+        time.sleep(self.delay)
+        return {"result": f"answer to {query}"}
+
+
+class SingleFlightTests(unittest.TestCase):
+    def test_concurrent_calls_share_one_execution(self):
+        flights = SingleFlight("test")
+        calls = []
+
+        def work(x):
+            calls.append(x)
+            time.sleep(0.1)
+            return x * 2
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(flights.do("k", work, 21))) for _ in range(5)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        self.assertEqual(results, [42] * 5)
+        self.assertEqual(calls, [21])
+        self.assertEqual(flights.stats(), {"executed": 1, "coalesced": 4, "in_flight": 0})
+        # Finished calls aren't cached
+        flights.do("k", work, 1)
+        self.assertEqual(len(calls), 2)
+
+    def test_waiters_share_the_exception(self):
+        flights = SingleFlight("test")
+        started = threading.Event()
+
+        def fail():
+            started.set()
+            time.sleep(0.1)
+            raise RuntimeError("boom")
+
+        errors = []
+
+        def call():
+            try:
+                flights.do("k", fail)
+            except RuntimeError as e:
+                errors.append(str(e))
+
+        leader = threading.Thread(target=call)
+        leader.start()
+        started.wait(1)
+        follower = threading.Thread(target=call)
+        follower.start()
+        leader.join()
+        follower.join()
+        self.assertEqual(errors, ["boom", "boom"])
+        self.assertEqual(flights.coalesced, 1)
+
+    def test_async_calls_share_one_task(self):
+        flights = SingleFlight("test")
+        calls = 0
+
+        async def work():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.05)
+            return "done"
+
+        async def main():
+            return await asyncio.gather(*(flights.ado("k", work) for _ in range(10)))
+
+        self.assertEqual(asyncio.run(main()), ["done"] * 10)
+        self.assertEqual(calls, 1)
+        self.assertEqual(flights.stats(), {"executed": 1, "coalesced": 9, "in_flight": 0})
+
+
+class OrchestratorCoalescingTests(unittest.TestCase):
+    def test_sessions_share_search_and_summary(self):
+        search = CountingSearch()
+        client = AsyncFakeClient(latency=0.05)
+        agents = [
+            AsyncOrchestratorAgent(client=client, memory=MemoryStub(), search=search, summarize="always")
+            for _ in range(5)
+        ]
+        before = agents[0].summary_flights.coalesced
+
+        async def main():
+            return await asyncio.gather(*(agent.ask("Capital of France?") for agent in agents))
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            replies = asyncio.run(main())
+
+        self.assertEqual(len(set(replies)), 1)
+        self.assertEqual(search.calls, 1)
+        # 5 routing calls, then one summary for everyone
+        self.assertEqual(client.calls, 6)
+        self.assertEqual(agents[0].summary_flights.coalesced - before, 4)
+
+    def test_threaded_turns_share_search(self):
+        search = CountingSearch()
+        agents = [
+            OrchestratorAgent(client=FakeClient(), memory=MemoryStub(), search=search, summarize="never")
+            for _ in range(4)
+        ]
+        with contextlib.redirect_stdout(io.StringIO()):
+            threads = [threading.Thread(target=agent.ask, args=("Tallest mountain?",)) for agent in agents]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+        self.assertEqual(search.calls, 1)
+
+    def test_coalescing_can_be_disabled(self):
+        search = CountingSearch(delay=0.05)
+        agents = [
+            OrchestratorAgent(client=FakeClient(), memory=MemoryStub(), search=search, summarize="never", coalesce=False)
+            for _ in range(3)
+        ]
+        with contextlib.redirect_stdout(io.StringIO()):
+            threads = [threading.Thread(target=agent.ask, args=("Tallest mountain?",)) for agent in agents]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+        self.assertEqual(search.calls, 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,53 @@
+import unittest
+
+from agents.orchestrator import AsyncOrchestratorAgent, OrchestratorAgent
+from tests.fakes import AsyncFakeClient, FakeClient, MemoryStub
+
+
+class AskStreamTests(unittest.TestCase):
+    def setUp(self):
+        self.client = FakeClient()
+        self.memory = MemoryStub()
+
+    def test_tool_turn_streams_events_then_commits_reply(self):
+        agent = OrchestratorAgent(client=self.client, memory=self.memory, fast_path=False, summarize="always")
+        chunks = list(agent.ask_stream("Capital of France?"))
+        types = [c["type"] for c in chunks]
+
+        self.assertEqual(types[:2], ["tool_call", "tool_output"])
+        self.assertEqual(chunks[0]["name"], "search")
+        self.assertGreater(types.count("token"), 1)
+        self.assertEqual(types[-1], "done")
+
+        reply = "".join(c["content"] for c in chunks if c["type"] == "token")
+        self.assertEqual(reply, "Bathinda is the capital of France.")
+        self.assertEqual(chunks[-1]["reply"], reply)
+        self.assertIsNotNone(chunks[-1]["ttft"])
+        self.assertEqual(self.memory.chat_history[-1], {"role": "assistant", "content": reply})
+
+    def test_fast_path_streams_result(self):
+        agent = OrchestratorAgent(client=self.client, memory=self.memory)
+        chunks = list(agent.ask_stream("2+2"))
+        self.assertEqual(chunks[-1]["reply"], "Result: 4")
+        self.assertEqual(self.client.calls, 0)
+
+    def test_errors_end_the_stream(self):
+        agent = OrchestratorAgent(client=None, memory=self.memory, fast_path=False)
+        chunks = list(agent.ask_stream("Capital of France?"))
+        self.assertEqual(chunks[-1]["type"], "error")
+
+
+class AsyncAskStreamTests(unittest.IsolatedAsyncioTestCase):
+    async def test_async_iterator_matches_sync_chunks(self):
+        memory = MemoryStub()
+        agent = AsyncOrchestratorAgent(client=AsyncFakeClient(), memory=memory, fast_path=False, summarize="always")
+        chunks = [chunk async for chunk in agent.ask_stream("Capital of France?")]
+
+        self.assertEqual(chunks[0]["type"], "tool_call")
+        self.assertEqual(chunks[-1]["type"], "done")
+        self.assertEqual(chunks[-1]["reply"], "Bathinda is the capital of France.")
+        self.assertEqual(memory.chat_history[-1]["content"], chunks[-1]["reply"])
+
+
+if __name__ == "__main__":
+    unittest.main()
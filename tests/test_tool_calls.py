@@ -0,0 +1,136 @@
+import asyncio
+import json
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+from agents.base_agent import AsyncBaseAgent, BaseAgent
+from tests.fakes import FakeFunction, FakeMessage, FakeToolCall, MemoryStub
+
+
+def make_tool(name, executor):
+    return {
+        "type": "function",
+        "function": {"name": name, "parameters": {"type": "object", "properties": {}}},
+        "executor": executor,
+    }
+
+
+def slow(value, delay=0.2):
+    def run(**_args):
+        time.sleep(delay)
+        return value
+    return run
+
+
+def broken(**_args):
+    raise RuntimeError("boom")
+
+
+def tool_turn(*names):
+    calls = [FakeToolCall(f"call_{i}", FakeFunction(name, json.dumps({}))) for i, name in enumerate(names)]
+    return FakeMessage(tool_calls=calls)
+
+
+class ConcurrentToolCallTests(unittest.TestCase):
+    def make_agent(self, tools, **kwargs):
+        self.memory = MemoryStub()
+        return BaseAgent("test", client=None, memory=self.memory, system_prompt="", tools=tools, **kwargs)
+
+    def test_tools_run_concurrently_and_record_in_order(self):
+        agent = self.make_agent([make_tool("a", slow("A", 0.3)), make_tool("b", slow("B", 0.1))])
+        start = time.perf_counter()
+        outputs = agent.handle_tool_calls(tool_turn("a", "b", "a"))
+        elapsed = time.perf_counter() - start
+
+        self.assertEqual(outputs, ["A", "B", "A"])
+        self.assertEqual([m["tool_call_id"] for m in self.memory.chat_history], ["call_0", "call_1", "call_2"])
+        self.assertLess(elapsed, 0.55)
+
+    def test_failing_and_slow_tools_become_error_outputs(self):
+        agent = self.make_agent(
+            [make_tool("ok", slow("fine", 0)), make_tool("bad", broken), make_tool("hang", slow("late", 1))],
+            tool_timeout=0.2,
+        )
+        outputs = agent.handle_tool_calls(tool_turn("hang", "bad", "ok"))
+
+        self.assertIn("timed out", outputs[0])
+        self.assertIn("boom", outputs[1])
+        self.assertEqual(outputs[2], "fine")
+
+    def test_timeout_starts_when_the_tool_does(self):
+        pool = ThreadPoolExecutor(max_workers=1)
+        self.addCleanup(pool.shutdown, wait=False)
+        agent = self.make_agent([make_tool("a", slow("A", 0.15))], tool_pool=pool, tool_timeout=0.25)
+        # The second call queues behind the first; only its own 0.15s counts
+        self.assertEqual(agent.handle_tool_calls(tool_turn("a", "a")), ["A", "A"])
+
+    def test_call_that_never_gets_a_thread_is_cancelled(self):
+        pool = ThreadPoolExecutor(max_workers=1)
+        self.addCleanup(pool.shutdown, wait=False)
+        ran = []
+        agent = self.make_agent(
+            [make_tool("hang", slow("late", 0.5)), make_tool("ok", lambda: ran.append(1) or "fine")],
+            tool_pool=pool,
+            tool_timeout=0.1,
+        )
+        outputs = agent.handle_tool_calls(tool_turn("hang", "ok"))
+
+        self.assertIn("timed out", outputs[0])
+        self.assertIn("did not start", outputs[1])
+        time.sleep(0.5)
+        self.assertEqual(ran, [])
+
+
+class AsyncConcurrentToolCallTests(unittest.IsolatedAsyncioTestCase):
+    async def test_async_tools_gather_with_timeout(self):
+        async def fast(**_args):
+            await asyncio.sleep(0.1)
+            return "fast"
+
+        async def hang(**_args):
+            await asyncio.sleep(5)
+
+        memory = MemoryStub()
+        agent = AsyncBaseAgent(
+            "test", client=None, memory=memory, system_prompt="",
+            tools=[make_tool("fast", fast), make_tool("hang", hang), make_tool("bad", broken)],
+            tool_timeout=0.3,
+        )
+        start = time.perf_counter()
+        outputs = await agent.handle_tool_calls(tool_turn("hang", "fast", "bad", "fast"))
+
+        self.assertLess(time.perf_counter() - start, 1)
+        self.assertIn("timed out", outputs[0])
+        self.assertEqual(outputs[1], "fast")
+        self.assertIn("boom", outputs[2])
+        self.assertEqual([m["tool_call_id"] for m in memory.chat_history], ["call_0", "call_1", "call_2", "call_3"])
+
+    def pooled_agent(self, tools, **kwargs):
+        pool = ThreadPoolExecutor(max_workers=1)
+        self.addCleanup(pool.shutdown, wait=False)
+        agent = AsyncBaseAgent("test", client=None, memory=MemoryStub(), system_prompt="", tool_pool=pool, **kwargs)
+        for name, fn in tools:
+            agent.tools.register(make_tool(name, lambda fn=fn: agent._run_blocking(fn)))
+        return agent
+
+    async def test_timeout_starts_when_blocking_work_does(self):
+        agent = self.pooled_agent([("a", slow("A", 0.15))], tool_timeout=0.25)
+        # The second call queues behind the first for a thread; only its own 0.15s counts
+        self.assertEqual(await agent.handle_tool_calls(tool_turn("a", "a")), ["A", "A"])
+
+    async def test_call_that_never_gets_a_thread_is_cancelled(self):
+        ran = []
+        agent = self.pooled_agent(
+            [("hang", slow("late", 0.5)), ("ok", lambda: ran.append(1) or "fine")], tool_timeout=0.1
+        )
+        outputs = await agent.handle_tool_calls(tool_turn("hang", "ok"))
+
+        self.assertIn("timed out", outputs[0])
+        self.assertIn("did not start", outputs[1])
+        await asyncio.sleep(0.5)
+        self.assertEqual(ran, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,112 @@
+import copy
+import json
+import re
+import unittest
+
+from agents.base_agent import BaseAgent
+from agents.calculator_agent import calculator_batch_descriptor, calculator_descriptor
+from agents.search_agent import search_schema
+from agents.tool_registry import ToolArgumentError, ToolRegistry, compile_validator
+from memory.message import Message
+from tests.fakes import FakeFunction, FakeMessage, FakeToolCall, MemoryStub
+
+
+def registry():
+    return ToolRegistry([
+        {**calculator_descriptor, "executor": lambda expression: f"calc {expression}"},
+        {**calculator_batch_descriptor, "executor": lambda expression, variables: "batch"},
+        {**search_schema, "executor": lambda query: f"search {query}"},
+    ])
+
+
+class ValidatorTests(unittest.TestCase):
+    def test_checks_required_types_and_unexpected_arguments(self):
+        validate = registry().get("calculator_batch").validate
+        validate({"expression": "x + 1", "variables": {"x": [1, 2.5], "y": 3}})
+
+        cases = {
+            "missing required argument 'variables'": {"expression": "x"},
+            "arguments.expression must be string, got int": {"expression": 1, "variables": {}},
+            "arguments.variables.x[1] must be number, got str": {"expression": "x", "variables": {"x": [1, "2"]}},
+            "arguments.variables.x must be array or number, got bool": {"expression": "x", "variables": {"x": True}},
+            "unexpected argument 'precision'": {"expression": "x", "variables": {}, "precision": 2},
+        }
+        for message, args in cases.items():
+            with self.subTest(message), self.assertRaisesRegex(ToolArgumentError, re.escape(message)):
+                validate(args)
+
+    def test_enum_and_nested_objects_allow_extras_by_default(self):
+        validate = compile_validator(
+            {"type": "object", "properties": {"unit": {"enum": ["c", "f"]}, "meta": {"type": "object"}}},
+            top_level=True,
+        )
+        validate({"unit": "c", "meta": {"anything": 1}})
+        with self.assertRaises(ToolArgumentError):
+            validate({"unit": "k"})
+
+
+class ToolRegistryTests(unittest.TestCase):
+    def test_schemas_are_prepared_once_and_isolated(self):
+        descriptor = {**copy.deepcopy(search_schema), "executor": lambda query: query}
+        tools = ToolRegistry([descriptor])
+        schemas = tools.schemas()
+
+        self.assertIs(tools.schemas(), schemas)
+        self.assertNotIn("executor", schemas[0])
+        descriptor["function"]["description"] = "changed"
+        self.assertEqual(schemas[0]["function"]["description"], search_schema["function"]["description"])
+        self.assertEqual(tools.payload_size(), len(json.dumps(schemas[0], separators=(",", ":"))))
+
+    def test_duplicate_names_are_rejected(self):
+        tools = registry()
+        with self.assertRaises(ValueError):
+            tools.register({**search_schema, "executor": print})
+
+    def test_stats_count_calls_errors_and_latency(self):
+        tools = registry()
+        tool = tools.get("calculator")
+        self.assertEqual(tool.run({"expression": "1+1"}), "calc 1+1")
+        with self.assertRaises(ToolArgumentError):
+            tool.run({})
+        stats = tools.stats()["calculator"]
+        self.assertEqual((stats["calls"], stats["errors"]), (2, 1))
+        self.assertGreater(stats["mean_ms"], 0)
+        self.assertEqual(tools.stats()["search"]["calls"], 0)
+
+    def test_select_picks_relevant_tools(self):
+        tools = registry()
+        self.assertEqual(tools.select("search the web for the tallest mountain", 1), ("search",))
+        self.assertEqual(
+            tools.select("evaluate this formula for many values", 1, always=("calculator",)),
+            ("calculator", "calculator_batch"),
+        )
+        # Nothing in common with any description: fall back to every tool
+        self.assertEqual(tools.select("hello there", 1), tools.names())
+        # Subsets aren't cached, but share the prepared per-tool schemas
+        self.assertIs(tools.schemas(("search",))[0], tools.schemas()[2])
+        self.assertIs(tools._schemas, tools.schemas())
+
+
+class AgentToolRegistryTests(unittest.TestCase):
+    def test_tool_limit_sends_relevant_subset(self):
+        memory = MemoryStub()
+        memory.append(Message("user", "search the web for the capital of France"))
+        agent = BaseAgent("test", client=None, memory=memory, system_prompt="", tools=registry(), tool_limit=1)
+        request = agent._build_request()
+        self.assertEqual([t["function"]["name"] for t in request["tools"]], ["search"])
+
+        agent.tool_limit = None
+        self.assertEqual(len(agent._build_request()["tools"]), 3)
+
+    def test_invalid_arguments_become_tool_errors(self):
+        memory = MemoryStub()
+        agent = BaseAgent("test", client=None, memory=memory, system_prompt="", tools=registry())
+        call = FakeToolCall("call_0", FakeFunction("calculator", json.dumps({"expr": "1+1"})))
+        outputs = agent.handle_tool_calls(FakeMessage(tool_calls=[call]))
+        self.assertEqual(
+            outputs, ["Tool error: calculator failed: arguments is missing required argument 'expression'"]
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
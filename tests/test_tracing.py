@@ -0,0 +1,121 @@
+import asyncio
+import contextlib
+import io
+import unittest
+from unittest import mock
+
+from agents.orchestrator import AsyncOrchestratorAgent, OrchestratorAgent
+from tests.fakes import AsyncFakeClient, FakeClient, MemoryStub
+from utils import tracing
+
+
+class TracingTests(unittest.TestCase):
+    def setUp(self):
+        tracing.METRICS.reset()
+        tracing.RECENT_TRACES.clear()
+        tracing.enable()
+        self.addCleanup(tracing.disable)
+
+    def stage_counts(self):
+        return {
+            name: h["count"]
+            for name, h in tracing.METRICS.snapshot()["histograms"].items()
+            if name.startswith("agent_stage_seconds")
+        }
+
+    def test_disabled_spans_record_nothing(self):
+        tracing.disable()
+        with tracing.span("turn") as s:
+            s.set(note="ignored")
+        tracing.record_usage(object(), "routing")
+        self.assertEqual(tracing.METRICS.snapshot()["histograms"], {})
+        self.assertEqual(tracing.METRICS.snapshot()["counters"], {})
+        self.assertEqual(len(tracing.RECENT_TRACES), 0)
+
+    def test_turn_trace_nests_stages(self):
+        agent = OrchestratorAgent(client=FakeClient(), memory=MemoryStub(), fast_path=False, summarize="always")
+        with contextlib.redirect_stdout(io.StringIO()):
+            agent.ask("Capital of France?")
+
+        trace = tracing.RECENT_TRACES[-1]
+        self.assertEqual(trace["name"], "turn")
+        children = [child["name"] for child in trace["children"]]
+        self.assertEqual(children, ["call_llm", "handle_tool_calls", "summarize_tool_outputs"])
+        # The tool ran on a pool thread but still nests under handle_tool_calls
+        tool_span = trace["children"][1]["children"][0]
+        self.assertEqual((tool_span["name"], tool_span["tool"]), ("tool", "search"))
+
+        counts = self.stage_counts()
+        self.assertEqual(counts["agent_stage_seconds{agent=orchestrator,stage=call_llm}"], 1)
+        self.assertEqual(counts["agent_stage_seconds{stage=tool,tool=search}"], 1)
+        counters = tracing.METRICS.snapshot()["counters"]
+        self.assertEqual(counters["agent_llm_calls_total{stage=routing}"], 1)
+        self.assertEqual(counters["agent_llm_calls_total{stage=summarize}"], 1)
+
+    def test_async_turn_trace(self):
+        agent = AsyncOrchestratorAgent(
+            client=AsyncFakeClient(), memory=MemoryStub(), fast_path=False, summarize="always"
+        )
+        with contextlib.redirect_stdout(io.StringIO()):
+            asyncio.run(agent.ask("2*3"))
+
+        trace = tracing.RECENT_TRACES[-1]
+        tool_span = trace["children"][1]["children"][0]
+        self.assertEqual((tool_span["name"], tool_span["tool"]), ("tool", "calculator"))
+
+    def test_streamed_turn_trace_matches_ask(self):
+        agent = OrchestratorAgent(client=FakeClient(), memory=MemoryStub(), fast_path=False, summarize="always")
+        with contextlib.redirect_stdout(io.StringIO()):
+            list(agent.ask_stream("Capital of France?"))
+        # The no-tool reply is streamed the same way
+        list(agent._stream_completion(agent._build_request(use_tools=False), "reply"))
+
+        tool_turn, reply = list(tracing.RECENT_TRACES)
+        self.assertEqual(tool_turn["name"], "turn")
+        self.assertEqual(
+            [child["name"] for child in tool_turn["children"]],
+            ["call_llm", "handle_tool_calls", "summarize_tool_outputs"],
+        )
+        self.assertEqual(reply["name"], "call_llm")
+        counters = tracing.METRICS.snapshot()["counters"]
+        self.assertEqual(counters["agent_llm_calls_total{stage=summarize}"], 1)
+        self.assertEqual(counters["agent_llm_calls_total{stage=reply}"], 1)
+
+    def test_async_streamed_turn_trace(self):
+        agent = AsyncOrchestratorAgent(
+            client=AsyncFakeClient(), memory=MemoryStub(), fast_path=False, summarize="always"
+        )
+
+        async def turn():
+            return [chunk async for chunk in agent.ask_stream("Capital of France?")]
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            asyncio.run(turn())
+        [trace] = tracing.RECENT_TRACES
+        self.assertEqual(
+            [child["name"] for child in trace["children"]],
+            ["call_llm", "handle_tool_calls", "summarize_tool_outputs"],
+        )
+
+    def test_failed_stage_counts_error(self):
+        with self.assertRaises(ValueError):
+            with tracing.span("tool", tool="broken"):
+                raise ValueError("boom")
+        counters = tracing.METRICS.snapshot()["counters"]
+        self.assertEqual(counters["agent_stage_errors_total{stage=tool,tool=broken}"], 1)
+        self.assertEqual(tracing.RECENT_TRACES[-1]["error"], "ValueError")
+
+    def test_prometheus_text(self):
+        with tracing.span("call_llm", agent="orchestrator"):
+            pass
+        with mock.patch("utils.system_stats_monitor.resident_memory_bytes", return_value=1024):
+            text = tracing.prometheus_text()
+
+        self.assertIn("# TYPE agent_stage_seconds histogram", text)
+        self.assertIn('agent_stage_seconds_bucket{agent="orchestrator",stage="call_llm",le="+Inf"} 1', text)
+        self.assertIn('agent_stage_seconds_count{agent="orchestrator",stage="call_llm"} 1', text)
+        self.assertIn("process_resident_memory_bytes 1024", text)
+
+
+if __name__ == "__main__":
+    unittest.main()
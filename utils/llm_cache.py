@@ -0,0 +1,270 @@
+import hashlib
+import inspect
+import json
+from collections import deque
+from types import SimpleNamespace
+
+from utils.cache import MISSING, SQLiteCache, TTLCache
+from utils.logger import log_debug
+
+# Request kwargs that don't change the completion and stay out of the cache key.
+# A streamed request gets the same reply as the whole one, so they share an entry.
+_UNKEYED_PARAMS = {"timeout", "extra_headers", "extra_query", "user", "stream", "stream_options"}
+
+CACHE_MODES = ("readwrite", "record", "replay")
+
+
+class LLMCacheMiss(LookupError):
+    """Raised in replay mode when a request has no recorded response."""
+
+
+def _jsonable(value):
+    if isinstance(value, dict):
+        return {str(k): _jsonable(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple, deque)):
+        return [_jsonable(v) for v in value]
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    if hasattr(value, "function") and hasattr(value, "id"):
+        # Tool calls: SDK objects, fakes and replayed namespaces must hash alike
+        return {
+            "id": value.id,
+            "type": "function",
+            "function": {"name": value.function.name, "arguments": value.function.arguments},
+        }
+    if hasattr(value, "model_dump"):
+        return _jsonable(value.model_dump(exclude_none=True))
+    if hasattr(value, "__dict__"):
+        return _jsonable(vars(value))
+    return str(value)
+
+
+def request_key(kwargs: dict) -> str:
+    """Stable hash of model, messages, tools and sampling params."""
+    keyed = {k: v for k, v in kwargs.items() if k not in _UNKEYED_PARAMS and v is not None}
+    canonical = json.dumps(_jsonable(keyed), sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def dump_response(response) -> dict:
+    """Serialize a completion: OpenAI SDK objects in full, anything else by the fields we read."""
+    if hasattr(response, "model_dump"):
+        return {"format": "openai", "data": response.model_dump(mode="json")}
+    choices = []
+    for choice in response.choices:
+        message = choice.message
+        tool_calls = [
+            {
+                "id": call.id,
+                "type": "function",
+                "function": {"name": call.function.name, "arguments": call.function.arguments},
+            }
+            for call in (getattr(message, "tool_calls", None) or [])
+        ]
+        choices.append({"message": {"role": "assistant", "content": message.content, "tool_calls": tool_calls}})
+    return {"format": "plain", "data": {"choices": choices}}
+
+
+def load_response(entry: dict):
+    if entry["format"] == "openai":
+        from openai.types.chat import ChatCompletion
+        return ChatCompletion.model_validate(entry["data"])
+    return json.loads(json.dumps(entry["data"]), object_hook=lambda d: SimpleNamespace(**d))
+
+
+def stream_chunks(response) -> list:
+    """A completion as the chunks stream=True would yield: its content, then its usage."""
+    content = response.choices[0].message.content or ""
+    delta = SimpleNamespace(role="assistant", content=content, tool_calls=None)
+    chunks = [SimpleNamespace(choices=[SimpleNamespace(index=0, delta=delta, finish_reason="stop")], usage=None)]
+    usage = getattr(response, "usage", None)
+    if usage is not None:
+        chunks.append(SimpleNamespace(choices=[], usage=usage))
+    return chunks
+
+
+class _StreamRecorder:
+    """Collects the chunks of a streamed reply into a completion that can be cached."""
+
+    def __init__(self):
+        self.parts = []
+        self.usage = None
+        self.cacheable = True
+
+    def add(self, chunk):
+        if getattr(chunk, "usage", None) is not None:
+            self.usage = chunk.usage
+        for choice in chunk.choices or ():
+            delta = choice.delta
+            if getattr(delta, "tool_calls", None):
+                self.cacheable = False  # Only text replies are reassembled
+            if delta.content:
+                self.parts.append(delta.content)
+
+    def response(self):
+        message = SimpleNamespace(role="assistant", content="".join(self.parts), tool_calls=None)
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=self.usage)
+
+
+async def _aiterate(chunks):
+    for chunk in chunks:
+        yield chunk
+
+
+class MemoryLLMCache:
+    """In-process LRU backend. Keeps the response objects themselves."""
+
+    def __init__(self, max_entries: int = 1024, ttl: float | None = None):
+        self.cache = TTLCache(max_entries=max_entries, ttl=ttl)
+
+    def get(self, key):
+        return self.cache.get(key)
+
+    def set(self, key, response):
+        self.cache.set(key, response)
+
+    def stats(self) -> dict:
+        return self.cache.stats()
+
+
+class DiskLLMCache:
+    """
+    SQLite backend with LRU trimming. Survives restarts, so it doubles as a
+    recording that replay mode can serve offline.
+    """
+
+    def __init__(self, path: str, max_entries: int = 100_000, ttl: float | None = None):
+        self.ttl = ttl
+        self.cache = SQLiteCache(path, max_entries=max_entries, table="llm_cache")
+
+    def get(self, key):
+        entry = self.cache.get(key)
+        return entry if entry is MISSING else load_response(entry)
+
+    def set(self, key, response):
+        self.cache.set(key, dump_response(response), ttl=self.ttl)
+
+    def stats(self) -> dict:
+        return self.cache.stats()
+
+    def close(self):
+        self.cache.close()
+
+
+class _CachedCompletions:
+    def __init__(self, owner):
+        self._owner = owner
+
+    def create(self, **kwargs):
+        owner = self._owner
+        key = request_key(kwargs)
+        cached = owner._get(key)
+        if kwargs.get("stream"):
+            if cached is not MISSING:
+                return iter(stream_chunks(cached))
+            return self._record(key, owner.client.chat.completions.create(**kwargs))
+        if cached is not MISSING:
+            return cached
+        response = owner.client.chat.completions.create(**kwargs)
+        owner._store(key, response)
+        return response
+
+    def _record(self, key, stream):
+        # Stored only once the stream has been read to the end
+        recorder = _StreamRecorder()
+        try:
+            for chunk in stream:
+                recorder.add(chunk)
+                yield chunk
+        finally:
+            close = getattr(stream, "close", None)
+            if close is not None:
+                close()
+        if recorder.cacheable:
+            self._owner._store(key, recorder.response())
+
+
+class _AsyncCachedCompletions(_CachedCompletions):
+    async def create(self, **kwargs):
+        owner = self._owner
+        key = request_key(kwargs)
+        cached = owner._get(key)
+        if kwargs.get("stream"):
+            if cached is not MISSING:
+                return _aiterate(stream_chunks(cached))
+            return self._arecord(key, await owner.client.chat.completions.create(**kwargs))
+        if cached is not MISSING:
+            return cached
+        response = await owner.client.chat.completions.create(**kwargs)
+        owner._store(key, response)
+        return response
+
+    async def _arecord(self, key, stream):
+        recorder = _StreamRecorder()
+        try:
+            async for chunk in stream:
+                recorder.add(chunk)
+                yield chunk
+        finally:
+            close = getattr(stream, "aclose", None) or getattr(stream, "close", None)
+            if close is not None and inspect.isawaitable(result := close()):
+                await result
+        if recorder.cacheable:
+            self._owner._store(key, recorder.response())
+
+
+class CachedLLMClient:
+    """
+    Wraps an OpenAI client so identical chat.completions.create requests are
+    served from a cache. Hand it to agents and Memory in place of the client.
+
+    mode:
+      "readwrite"  serve hits, call the API on misses and store the response
+      "record"     always call the API and store the response
+      "replay"     serve recorded responses only; a miss raises LLMCacheMiss
+    Streaming requests share entries with the same request unstreamed: a hit
+    is served as synthesized chunks, and a streamed text reply is stored once
+    it has been read to the end.
+    """
+
+    _completions_cls = _CachedCompletions
+
+    def __init__(self, client, backend=None, mode: str = "readwrite"):
+        if mode not in CACHE_MODES:
+            raise ValueError(f"mode must be one of {CACHE_MODES}, got {mode!r}")
+        self.client = client
+        self.backend = backend if backend is not None else MemoryLLMCache()
+        self.mode = mode
+        self.hits = 0
+        self.misses = 0
+        self.chat = SimpleNamespace(completions=self._completions_cls(self))
+
+    def _get(self, key):
+        if self.mode == "record":
+            self.misses += 1
+            return MISSING
+        cached = self.backend.get(key)
+        if cached is MISSING:
+            self.misses += 1
+            if self.mode == "replay":
+                raise LLMCacheMiss(f"No recorded response for request {key[:12]}")
+            return MISSING
+        self.hits += 1
+        log_debug("[llm-cache] hit %s", key[:12])
+        return cached
+
+    def _store(self, key, response):
+        self.backend.set(key, response)
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses, "backend": self.backend.stats()}
+
+    def __getattr__(self, name):
+        # Everything else (models, embeddings, ...) goes to the wrapped client
+        return getattr(self.client, name)
+
+
+class AsyncCachedLLMClient(CachedLLMClient):
+    """CachedLLMClient for an AsyncOpenAI client."""
+
+    _completions_cls = _AsyncCachedCompletions
@@ -0,0 +1,440 @@
+import asyncio
+import heapq
+import inspect
+import itertools
+import os
+import random
+import threading
+import time
+from types import SimpleNamespace
+
+from utils.logger import log_debug, log_info
+from utils.tracing import count
+
+# Lower runs first. Routing and replies the user is waiting on go ahead of
+# rolling memory summaries, which nobody is waiting on.
+PRIORITIES = {"interactive": 0, "background": 10}
+
+# Throttling and transient server errors worth another attempt
+RETRY_STATUSES = {408, 409, 429, 500, 502, 503, 504}
+_RETRY_ERRORS = {"APIConnectionError", "APITimeoutError"}
+
+
+def _status_code(error):
+    return getattr(error, "status_code", None)
+
+
+def _is_retryable(error) -> bool:
+    return _status_code(error) in RETRY_STATUSES or type(error).__name__ in _RETRY_ERRORS
+
+
+def _retry_after(error):
+    """Seconds the server asked us to wait (retry-after-ms / retry-after headers), or None."""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    for name, scale in (("retry-after-ms", 0.001), ("retry-after", 1.0)):
+        value = headers.get(name)
+        if value is not None:
+            try:
+                return float(value) * scale
+            except ValueError:
+                pass
+    return None
+
+
+def estimate_tokens(kwargs, completion_tokens: int) -> int:
+    """Rough request size for the tokens/min budget: ~4 characters per prompt token."""
+    chars = 0
+    for message in kwargs.get("messages") or ():
+        content = message.get("content") if isinstance(message, dict) else getattr(message, "content", None)
+        chars += len(content) if isinstance(content, str) else 0
+    return chars // 4 + (kwargs.get("max_tokens") or completion_tokens)
+
+
+class TokenBucket:
+    """
+    Refills at per_minute / 60 per second up to per_minute. reserve() always
+    takes the amount, going into debt if needed, and returns how long the caller
+    must wait for that debt to be repaid. Not thread-safe; the scheduler locks.
+    """
+
+    def __init__(self, per_minute: float, clock=time.monotonic):
+        self.capacity = per_minute
+        self.rate = per_minute / 60.0
+        self.tokens = per_minute
+        self.clock = clock
+        self.updated = clock()
+
+    def _refill(self):
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, amount: float) -> float:
+        self._refill()
+        self.tokens -= amount
+        return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    def refund(self, amount: float):
+        """Give back (or, if negative, take more of) a reservation once the real cost is known."""
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens + amount)
+
+
+class _ScheduledCompletions:
+    def __init__(self, scheduler, priority):
+        self._scheduler = scheduler
+        self._priority = priority
+
+    def create(self, **kwargs):
+        return self._scheduler.submit(self._priority, kwargs)
+
+
+class _SlotStream:
+    """
+    A streamed completion that keeps its scheduler slot until it is read to the
+    end or closed: the request is in flight for as long as chunks arrive.
+    """
+
+    def __init__(self, stream, release):
+        self._stream = stream
+        self._release = release
+
+    def __iter__(self):
+        try:
+            yield from self._stream
+        finally:
+            self.close()
+
+    def close(self):
+        release, self._release = self._release, None
+        if release is None:
+            return
+        try:
+            close = getattr(self._stream, "close", None)
+            if close is not None:
+                close()
+        finally:
+            release()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __del__(self):
+        # A stream dropped unread must not hold its slot forever
+        self.close()
+
+    def __getattr__(self, name):
+        return getattr(self._stream, name)
+
+
+class _AsyncSlotStream:
+    """_SlotStream for an async stream; close it with aclose()."""
+
+    def __init__(self, stream, release):
+        self._stream = stream
+        self._release = release  # Coroutine function
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        try:
+            async for chunk in self._stream:
+                yield chunk
+        finally:
+            await self.aclose()
+
+    async def aclose(self):
+        release, self._release = self._release, None
+        if release is None:
+            return
+        try:
+            close = getattr(self._stream, "close", None)
+            if close is not None and inspect.isawaitable(result := close()):
+                await result
+        finally:
+            await release()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.aclose()
+
+    def __getattr__(self, name):
+        return getattr(self._stream, name)
+
+
+class ScheduledClient:
+    """Client facade whose chat.completions.create goes through a scheduler at a fixed priority."""
+
+    def __init__(self, scheduler, priority):
+        self.scheduler = scheduler
+        self.priority = priority
+        self.chat = SimpleNamespace(completions=_ScheduledCompletions(scheduler, priority))
+
+    def __getattr__(self, name):
+        # Everything else (models, embeddings, ...) goes to the wrapped client
+        return getattr(self.scheduler.client, name)
+
+
+class LLMScheduler:
+    """
+    One gate for every chat completion in the process:
+      - requests/min and tokens/min token buckets, so bursts queue instead of 429ing
+      - priorities: "interactive" calls are admitted before "background" ones
+      - retries with jittered exponential backoff, honoring retry-after; a
+        retry-after pauses all callers, since the limit is shared
+      - AIMD concurrency: the in-flight limit halves on throttling and grows
+        back by about one per limit successes
+    Give each component its own facade, e.g. client_for("background") for Memory.
+    Disable the SDK's own retries (OpenAI(max_retries=0)) so attempts aren't doubled.
+    """
+
+    def __init__(
+        self,
+        client,
+        requests_per_minute: float | None = None,
+        tokens_per_minute: float | None = None,
+        max_concurrency: int = 8,
+        min_concurrency: int = 1,
+        max_retries: int = 4,
+        backoff: float = 0.5,
+        max_retry_after: float = 60.0,
+        completion_tokens: int = 256,
+        clock=time.monotonic,
+    ):
+        """
+        requests_per_minute / tokens_per_minute: account limits, None for no limit
+        completion_tokens: completion size assumed for the token budget when a
+                           request sets no max_tokens; corrected from usage after
+        """
+        self.client = client
+        self.rpm = TokenBucket(requests_per_minute, clock) if requests_per_minute else None
+        self.tpm = TokenBucket(tokens_per_minute, clock) if tokens_per_minute else None
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min_concurrency
+        self.limit = float(max_concurrency)
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_retry_after = max_retry_after
+        self.completion_tokens = completion_tokens
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._paused_until = 0.0
+        self._in_flight = 0
+        self._waiting = []  # Heap of (priority, seq) tickets
+        self._seq = itertools.count()
+        self._cond = threading.Condition(self._lock)
+        self.requests = 0
+        self.retries = 0
+        self.throttled = 0
+        self.failures = 0
+
+    def client_for(self, priority: str = "interactive") -> ScheduledClient:
+        if priority not in PRIORITIES:
+            raise ValueError(f"priority must be one of {tuple(PRIORITIES)}, got {priority!r}")
+        return ScheduledClient(self, PRIORITIES[priority])
+
+    # ------------------------
+    # Shared policy (called with no slot lock held)
+    # ------------------------
+    def _reserve(self, tokens: int) -> float:
+        """Charge one request against the buckets; returns the wait before sending it."""
+        with self._lock:
+            wait = max(0.0, self._paused_until - self.clock())
+            if self.rpm is not None:
+                wait = max(wait, self.rpm.reserve(1))
+            if self.tpm is not None:
+                wait = max(wait, self.tpm.reserve(tokens))
+            return wait
+
+    def _on_success(self, response, estimated: int):
+        with self._lock:
+            self.requests += 1
+            self.limit = min(self.max_concurrency, self.limit + 1 / self.limit)
+            usage = getattr(response, "usage", None)
+            actual = getattr(usage, "total_tokens", None)
+            if self.tpm is not None and isinstance(actual, int):
+                self.tpm.refund(estimated - actual)
+            self._cond.notify_all()
+
+    def _on_error(self, error, attempt: int):
+        """Returns the delay before retrying, or None to give up and re-raise."""
+        if not _is_retryable(error) or attempt >= self.max_retries:
+            with self._lock:
+                self.failures += 1
+            return None
+
+        retry_after = _retry_after(error)
+        if retry_after is not None:
+            delay = min(retry_after, self.max_retry_after)
+        else:
+            delay = self.backoff * (2 ** attempt) * random.uniform(0.5, 1.5)
+
+        with self._lock:
+            self.retries += 1
+            if _status_code(error) == 429:
+                self.throttled += 1
+                self.limit = max(float(self.min_concurrency), self.limit / 2)
+                if retry_after is not None:
+                    self._paused_until = max(self._paused_until, self.clock() + delay)
+        count("agent_llm_retries_total", status=str(_status_code(error)))
+        log_debug("[scheduler] attempt %s failed (%s), retrying in %.2fs", attempt + 1, error, delay)
+        return delay
+
+    def _has_slot(self, ticket) -> bool:
+        return self._waiting[0] == ticket and self._in_flight < max(1, int(self.limit))
+
+    def _abandon(self, ticket):
+        """Drop the ticket of a caller that stopped waiting, so it can't block the queue."""
+        self._waiting.remove(ticket)
+        heapq.heapify(self._waiting)
+
+    # ------------------------
+    # Threaded execution
+    # ------------------------
+    def _acquire(self, priority: int):
+        with self._cond:
+            ticket = (priority, next(self._seq))
+            heapq.heappush(self._waiting, ticket)
+            try:
+                while not self._has_slot(ticket):
+                    self._cond.wait()
+            except BaseException:
+                self._abandon(ticket)
+                self._cond.notify_all()
+                raise
+            heapq.heappop(self._waiting)
+            self._in_flight += 1
+            self._cond.notify_all()
+
+    def _release(self):
+        with self._cond:
+            self._in_flight -= 1
+            self._cond.notify_all()
+
+    def submit(self, priority: int, kwargs: dict):
+        estimated = estimate_tokens(kwargs, self.completion_tokens)
+        self._acquire(priority)
+        held = False  # True once a stream owns the slot
+        try:
+            attempt = 0
+            while True:
+                wait = self._reserve(estimated)
+                if wait:
+                    time.sleep(wait)
+                try:
+                    response = self.client.chat.completions.create(**kwargs)
+                except Exception as e:
+                    delay = self._on_error(e, attempt)
+                    if delay is None:
+                        raise
+                    time.sleep(delay)
+                    attempt += 1
+                    continue
+                self._on_success(response, estimated)
+                if kwargs.get("stream"):
+                    held = True
+                    return _SlotStream(response, self._release)
+                return response
+        finally:
+            if not held:
+                self._release()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "retries": self.retries,
+                "throttled": self.throttled,
+                "failures": self.failures,
+                "concurrency_limit": self.limit,
+                "in_flight": self._in_flight,
+                "waiting": len(self._waiting),
+            }
+
+
+class AsyncLLMScheduler(LLMScheduler):
+    """
+    LLMScheduler for an AsyncOpenAI client. Waiting callers suspend on the event
+    loop instead of blocking a thread; use it from a single loop.
+    """
+
+    def __init__(self, client, **options):
+        super().__init__(client, **options)
+        self._async_cond = None  # Created on first use, inside the running loop
+
+    def _condition(self) -> asyncio.Condition:
+        if self._async_cond is None:
+            self._async_cond = asyncio.Condition()
+        return self._async_cond
+
+    async def _aacquire(self, priority: int):
+        cond = self._condition()
+        async with cond:
+            ticket = (priority, next(self._seq))
+            heapq.heappush(self._waiting, ticket)
+            try:
+                await cond.wait_for(lambda: self._has_slot(ticket))
+            except BaseException:
+                # Cancelled while queued; wait_for re-acquired the lock before raising
+                self._abandon(ticket)
+                cond.notify_all()
+                raise
+            heapq.heappop(self._waiting)
+            self._in_flight += 1
+            cond.notify_all()
+
+    async def _arelease(self):
+        cond = self._condition()
+        async with cond:
+            self._in_flight -= 1
+            cond.notify_all()
+
+    async def submit(self, priority: int, kwargs: dict):
+        estimated = estimate_tokens(kwargs, self.completion_tokens)
+        await self._aacquire(priority)
+        held = False  # True once a stream owns the slot
+        try:
+            attempt = 0
+            while True:
+                wait = self._reserve(estimated)
+                if wait:
+                    await asyncio.sleep(wait)
+                try:
+                    response = await self.client.chat.completions.create(**kwargs)
+                except Exception as e:
+                    delay = self._on_error(e, attempt)
+                    if delay is None:
+                        raise
+                    await asyncio.sleep(delay)
+                    attempt += 1
+                    continue
+                self._on_success(response, estimated)
+                if kwargs.get("stream"):
+                    held = True
+                    return _AsyncSlotStream(response, self._arelease)
+                return response
+        finally:
+            if not held:
+                await self._arelease()
+
+
+def scheduler_from_env(client, env=None, scheduler_cls=LLMScheduler):
+    """Build a scheduler from LLM_RPM, LLM_TPM and LLM_MAX_CONCURRENCY."""
+    env = os.environ if env is None else env
+    rpm = env.get("LLM_RPM")
+    tpm = env.get("LLM_TPM")
+    scheduler = scheduler_cls(
+        client,
+        requests_per_minute=float(rpm) if rpm else None,
+        tokens_per_minute=float(tpm) if tpm else None,
+        max_concurrency=int(env.get("LLM_MAX_CONCURRENCY", 8)),
+    )
+    log_info("[scheduler] rpm=%s tpm=%s max_concurrency=%s", rpm, tpm, scheduler.max_concurrency)
+    return scheduler
@@ -1,42 +1,127 @@
+import atexit
 import logging
+import logging.handlers
 import os
-
-# Create logs directory if it doesn't exist
-os.makedirs("logs", exist_ok=True)
+import queue
 
 # ------------------------
 # Agent Logger
 # ------------------------
+# No handlers until configure_logging() is called; until then only warnings and
+# errors reach stderr (through logging's last-resort handler).
 agent_logger = logging.getLogger("agent")
-agent_logger.setLevel(logging.DEBUG)  # Capture all levels
 
 # Formatter
 formatter = logging.Formatter("%(asctime)s - %(levelname)s - %(message)s")
 
-# File handler → INFO+ messages
-info_handler = logging.FileHandler("logs/agent.log")
-info_handler.setLevel(logging.INFO)
-info_handler.setFormatter(formatter)
-agent_logger.addHandler(info_handler)
+_listener = None
+_handlers = []
+
+
+def configure_logging(
+    log_dir: str | None = "logs",
+    console_level: int | str = logging.INFO,
+    file_level: int | str = logging.INFO,
+    debug_file: bool = False,
+    queued: bool = True,
+):
+    """
+    Attach the agent's handlers. Safe to call again; earlier handlers are replaced.
+
+    log_dir: where agent.log (file_level+) and agent_debug.log (DEBUG+, if debug_file)
+             are written; None disables file logging.
+    debug_file: off by default, since it lowers the logger to DEBUG and every
+                log_debug() call is then formatted and written.
+    console_level: level for stderr output, or None for no console output.
+    queued: when True, handlers run on a background QueueListener thread, so the
+            calling thread only enqueues records and never blocks on disk I/O.
+    """
+    shutdown_logging()
+
+    handlers = []
+    if log_dir:
+        os.makedirs(log_dir, exist_ok=True)
+
+        # File handler → INFO+ messages
+        info_handler = logging.FileHandler(os.path.join(log_dir, "agent.log"))
+        info_handler.setLevel(file_level)
+        handlers.append(info_handler)
+
+        # File handler → DEBUG+ messages
+        if debug_file:
+            debug_handler = logging.FileHandler(os.path.join(log_dir, "agent_debug.log"))
+            debug_handler.setLevel(logging.DEBUG)
+            handlers.append(debug_handler)
+
+    # Console handler → INFO+ messages
+    if console_level is not None:
+        console_handler = logging.StreamHandler()
+        console_handler.setLevel(console_level)
+        handlers.append(console_handler)
+
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    # The logger level is the lowest handler level, so disabled levels are
+    # rejected by isEnabledFor() before any formatting happens
+    agent_logger.setLevel(min((h.level for h in handlers), default=logging.WARNING))
+    agent_logger.propagate = False
+
+    global _listener
+    if queued and handlers:
+        records = queue.SimpleQueue()
+        _listener = logging.handlers.QueueListener(records, *handlers, respect_handler_level=True)
+        _listener.start()
+        _handlers.append(logging.handlers.QueueHandler(records))
+        _handlers.extend(handlers)
+        agent_logger.addHandler(_handlers[0])
+    else:
+        _handlers.extend(handlers)
+        for handler in handlers:
+            agent_logger.addHandler(handler)
+
+
+def configure_logging_from_env():
+    """
+    configure_logging() driven by AGENT_LOG_DIR (empty disables log files),
+    AGENT_LOG_LEVEL (console level), AGENT_LOG_DEBUG_FILE=1 (also write
+    agent_debug.log) and AGENT_LOG_QUEUED=0 (write synchronously).
+    """
+    configure_logging(
+        log_dir=os.getenv("AGENT_LOG_DIR", "logs") or None,
+        console_level=os.getenv("AGENT_LOG_LEVEL", "INFO").upper(),
+        debug_file=os.getenv("AGENT_LOG_DEBUG_FILE", "0") == "1",
+        queued=os.getenv("AGENT_LOG_QUEUED", "1") != "0",
+    )
+
+
+def shutdown_logging():
+    """Drain queued records, then detach and close the agent's handlers."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()  # Processes everything already enqueued
+        _listener = None
+    for handler in _handlers:
+        agent_logger.removeHandler(handler)
+        handler.close()
+    _handlers.clear()
+
 
-# File handler → DEBUG+ messages
-debug_handler = logging.FileHandler("logs/agent_debug.log")
-debug_handler.setLevel(logging.DEBUG)
-debug_handler.setFormatter(formatter)
-agent_logger.addHandler(debug_handler)
+atexit.register(shutdown_logging)
 
-# Console handler → INFO+ messages
-console_handler = logging.StreamHandler()
-console_handler.setLevel(logging.INFO)
-console_handler.setFormatter(formatter)
-agent_logger.addHandler(console_handler)
 
 # Logging helpers
-def log_info(message):
-    agent_logger.info(message)
+# Pass values as arguments rather than pre-formatting them, e.g.
+#     log_debug("[X] Message pruned: %s", removed)
+# so nothing is formatted when the level is disabled.
+def log_info(message, *args, **kwargs):
+    if agent_logger.isEnabledFor(logging.INFO):
+        agent_logger.info(message, *args, **kwargs)
 
-def log_debug(message):
-    agent_logger.debug(message)
+def log_debug(message, *args, **kwargs):
+    if agent_logger.isEnabledFor(logging.DEBUG):
+        agent_logger.debug(message, *args, **kwargs)
 
-def log_error(message):
-    agent_logger.error(message)
+def log_error(message, *args, **kwargs):
+    if agent_logger.isEnabledFor(logging.ERROR):
+        agent_logger.error(message, *args, **kwargs)
@@ -0,0 +1,108 @@
+import asyncio
+import threading
+
+from utils.tracing import count
+
+
+class _Call:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Coalesces identical concurrent calls: while a call for a key is running,
+    other callers with the same key wait for it and share its result (or its
+    exception) instead of starting their own. Nothing is kept once it finishes;
+    pair it with a cache for that.
+
+    do() is for threads, ado() for coroutines on an event loop; both share the
+    group's counters.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self._calls = {}  # key -> _Call, for threads
+        self._tasks = {}  # (loop, key) -> Task, for coroutines
+        self.executed = 0  # Calls that actually ran
+        self.coalesced = 0  # Calls answered by another caller's execution
+
+    def do(self, key, fn, *args, **kwargs):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.executed += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            count("agent_coalesced_calls_total", group=self.name)
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn(*args, **kwargs)
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    async def ado(self, key, fn, *args, **kwargs):
+        """Like do(), for a coroutine function. A cancelled caller doesn't cancel the shared call."""
+        loop = asyncio.get_running_loop()
+        task_key = (loop, key)
+        with self._lock:
+            task = self._tasks.get(task_key)
+            if task is None:
+                task = self._tasks[task_key] = loop.create_task(fn(*args, **kwargs))
+                task.add_done_callback(lambda _task: self._forget(task_key))
+                self.executed += 1
+            else:
+                self.coalesced += 1
+                count("agent_coalesced_calls_total", group=self.name)
+        return await asyncio.shield(task)
+
+    def _forget(self, task_key):
+        with self._lock:
+            self._tasks.pop(task_key, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "executed": self.executed,
+                "coalesced": self.coalesced,
+                "in_flight": len(self._calls) + len(self._tasks),
+            }
+
+
+_groups = {}
+_groups_lock = threading.Lock()
+
+
+def flight_group(name: str) -> SingleFlight:
+    """Process-wide SingleFlight for a kind of call ("search", "tool_summary", ...)."""
+    with _groups_lock:
+        group = _groups.get(name)
+        if group is None:
+            group = _groups[name] = SingleFlight(name)
+        return group
+
+
+def stats() -> dict:
+    """Counters of every group, by name."""
+    with _groups_lock:
+        groups = list(_groups.values())
+    return {group.name: group.stats() for group in groups}
@@ -1,7 +1,11 @@
-import psutil
 from utils.logger import log_debug
 
+
+def resident_memory_bytes():
+    import psutil
+
+    return psutil.Process().memory_info().rss
+
+
 def log_system_usage():
-    process = psutil.Process()
-    mem = process.memory_info()
-    log_debug(f"Memory usage: {mem.rss / 1024 ** 2:.2f} MB")
+    log_debug("Memory usage: %.2f MB", resident_memory_bytes() / 1024 ** 2)
@@ -1,17 +1,48 @@
-import tiktoken
+import threading
+
 from utils.logger import log_debug
 
-# Choose tokenizer based on model
-ENCODER = tiktoken.encoding_for_model("gpt-4o-mini")
+# Process-wide tokenizer registry: model name -> tiktoken encoder.
+# tiktoken is imported and each encoding built on first use, then shared by
+# every Memory instance and count_tokens().
+_encoders = {}
+_encoders_lock = threading.Lock()
+
+DEFAULT_MODEL = "gpt-4o-mini"
+
+
+def get_encoder(model=DEFAULT_MODEL):
+    """Shared tiktoken encoder for a model, built on first request."""
+    encoder = _encoders.get(model)
+    if encoder is not None:
+        return encoder
+    with _encoders_lock:
+        encoder = _encoders.get(model)
+        if encoder is None:
+            import tiktoken
 
-def count_tokens(messages):
+            try:
+                encoder = tiktoken.encoding_for_model(model)
+            except KeyError:
+                # Model tiktoken doesn't know yet; the gpt-4o encoding is the closest default
+                encoder = tiktoken.get_encoding("o200k_base")
+            _encoders[model] = encoder
+    return encoder
+
+
+def count_tokens(messages, model=DEFAULT_MODEL):
     """
     Count tokens for a list of messages (role + content)
     """
+    encoder = get_encoder(model)
     total_tokens = 0
     for m in messages:
-        total_tokens += len(ENCODER.encode(m["role"]))  # Role token
+        total_tokens += len(encoder.encode(m["role"]))  # Role token
         content = m.get("content") or ""
-        total_tokens += len(ENCODER.encode(content))  # Content token
-    log_debug(f"Total tokens in conversation: {total_tokens}")
+        total_tokens += len(encoder.encode(content))  # Content token
+    log_debug("Total tokens in conversation: %s", total_tokens)
     return total_tokens
+
+def count_text_tokens(text, model=DEFAULT_MODEL):
+    """Count tokens in a single string."""
+    return len(get_encoder(model).encode(text))
@@ -0,0 +1,246 @@
+import contextvars
+import threading
+import time
+from collections import deque
+
+# Tracing is off by default; span() then returns a shared no-op object,
+# so instrumented code pays one function call and a flag check.
+_enabled = False
+
+# Upper bounds (seconds) of the latency histogram buckets
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_current_span = contextvars.ContextVar("agent_current_span", default=None)
+
+
+def enable():
+    global _enabled
+    _enabled = True
+
+
+def disable():
+    global _enabled
+    _enabled = False
+
+
+def is_enabled() -> bool:
+    return _enabled
+
+
+class Histogram:
+    __slots__ = ("counts", "total", "count")
+
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS) + 1)  # last slot is +Inf
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        else:
+            self.counts[-1] += 1
+        self.total += value
+        self.count += 1
+
+
+class Metrics:
+    """In-process counters, gauges and latency histograms, keyed by name and labels."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters = {}
+        self.gauges = {}
+        self.histograms = {}
+
+    @staticmethod
+    def _key(name, labels):
+        return name, tuple(sorted(labels.items()))
+
+    def inc(self, name: str, value: float = 1, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def set_gauge(self, name: str, value: float, **labels):
+        with self._lock:
+            self.gauges[self._key(name, labels)] = value
+
+    def observe(self, name: str, value: float, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram()
+            histogram.observe(value)
+
+    def reset(self):
+        with self._lock:
+            self.counters.clear()
+            self.gauges.clear()
+            self.histograms.clear()
+
+    def snapshot(self) -> dict:
+        def label_str(name, labels):
+            return name + ("{" + ",".join(f"{k}={v}" for k, v in labels) + "}" if labels else "")
+
+        with self._lock:
+            return {
+                "counters": {label_str(n, l): v for (n, l), v in self.counters.items()},
+                "gauges": {label_str(n, l): v for (n, l), v in self.gauges.items()},
+                "histograms": {
+                    label_str(n, l): {
+                        "count": h.count,
+                        "sum": h.total,
+                        "buckets": dict(zip([*map(str, LATENCY_BUCKETS), "+Inf"], h.counts)),
+                    }
+                    for (n, l), h in self.histograms.items()
+                },
+            }
+
+    def prometheus_text(self) -> str:
+        def fmt(labels, extra=()):
+            items = [*labels, *extra]
+            if not items:
+                return ""
+            return "{" + ",".join(f'{k}="{v}"' for k, v in items) + "}"
+
+        lines = []
+        with self._lock:
+            for kind, series in (("counter", self.counters), ("gauge", self.gauges)):
+                typed = set()
+                for (name, labels), value in sorted(series.items()):
+                    if name not in typed:
+                        lines.append(f"# TYPE {name} {kind}")
+                        typed.add(name)
+                    lines.append(f"{name}{fmt(labels)} {value}")
+
+            typed = set()
+            for (name, labels), h in sorted(self.histograms.items()):
+                if name not in typed:
+                    lines.append(f"# TYPE {name} histogram")
+                    typed.add(name)
+                cumulative = 0
+                for bound, count in zip([*map(str, LATENCY_BUCKETS), "+Inf"], h.counts):
+                    cumulative += count
+                    lines.append(f"{name}_bucket{fmt(labels, [('le', bound)])} {cumulative}")
+                lines.append(f"{name}_sum{fmt(labels)} {h.total}")
+                lines.append(f"{name}_count{fmt(labels)} {h.count}")
+        return "\n".join(lines) + "\n"
+
+
+METRICS = Metrics()
+
+# Most recent finished root spans (whole turns), as nested dicts
+RECENT_TRACES = deque(maxlen=100)
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, **attrs):
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class Span:
+    """
+    Times a block and records it in the agent_stage_seconds histogram, labeled with
+    the stage name and the span's labels. Spans nest through a context variable,
+    so a finished turn is kept as a tree in RECENT_TRACES.
+    """
+
+    __slots__ = ("name", "labels", "attrs", "children", "start", "duration", "_token", "_parent")
+
+    def __init__(self, name, labels):
+        self.name = name
+        self.labels = labels
+        self.attrs = {}
+        self.children = []
+        self.duration = None
+
+    def set(self, **attrs):
+        """Attach extra details (not metric labels) to the trace."""
+        self.attrs.update(attrs)
+
+    def __enter__(self):
+        self._parent = _current_span.get()
+        self._token = _current_span.set(self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.duration = time.perf_counter() - self.start
+        _current_span.reset(self._token)
+        if exc_type is not None:
+            self.attrs["error"] = exc_type.__name__
+            METRICS.inc("agent_stage_errors_total", stage=self.name, **self.labels)
+        METRICS.observe("agent_stage_seconds", self.duration, stage=self.name, **self.labels)
+        if self._parent is not None:
+            self._parent.children.append(self)
+        else:
+            RECENT_TRACES.append(self.to_dict())
+        return False
+
+    def to_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "ms": round(self.duration * 1000, 3) if self.duration is not None else None,
+            **self.labels,
+            **self.attrs,
+            "children": [child.to_dict() for child in self.children],
+        }
+
+
+def span(name: str, **labels):
+    """
+    Context manager timing one pipeline stage:
+        with span("call_llm", agent="orchestrator"):
+            ...
+    Keep labels low-cardinality (agent and tool names); they become metric labels.
+    """
+    if not _enabled:
+        return _NOOP_SPAN
+    return Span(name, labels)
+
+
+def record_usage(response, stage: str):
+    """Count an API call and its prompt/completion tokens, if the response reports usage."""
+    if not _enabled:
+        return
+    METRICS.inc("agent_llm_calls_total", stage=stage)
+    usage = getattr(response, "usage", None)
+    if usage is None:
+        return
+    METRICS.inc("agent_llm_prompt_tokens_total", getattr(usage, "prompt_tokens", 0) or 0, stage=stage)
+    METRICS.inc("agent_llm_completion_tokens_total", getattr(usage, "completion_tokens", 0) or 0, stage=stage)
+
+
+def count(name: str, value: float = 1, **labels):
+    if _enabled:
+        METRICS.inc(name, value, **labels)
+
+
+def snapshot() -> dict:
+    """Metrics plus the most recent traces, with process RSS refreshed."""
+    from utils.system_stats_monitor import resident_memory_bytes
+
+    METRICS.set_gauge("process_resident_memory_bytes", resident_memory_bytes())
+    return {**METRICS.snapshot(), "traces": list(RECENT_TRACES)}
+
+
+def prometheus_text() -> str:
+    from utils.system_stats_monitor import resident_memory_bytes
+
+    METRICS.set_gauge("process_resident_memory_bytes", resident_memory_bytes())
+    return METRICS.prometheus_text()